@@ -0,0 +1,160 @@
+# Per-click cost of the app before and after splitting it into fragments. Clicking a widget
+# inside a fragment reruns only that fragment instead of the whole script. Each interaction
+# is timed twice against a synthetic ledger and fake worksheets: as a full script run (what
+# every click cost before) and as the fragment-only rerun the browser requests now.
+# AppTest always reruns the whole script, so the fragment-only rerun is sent by hand with
+# the fragment's id, which is picked up from the render.<section> span it runs in.
+#
+#   python benchmarks/bench_fragment_reruns.py --invoices 20000 --products 2000 --clicks 20
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from contextlib import contextmanager
+from functools import partial
+from unittest import mock
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+import metrics
+import sheets_client
+import invoice_ledger
+from fake_sheets import FakeWorksheet, FakeSpreadsheet
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.runtime.scriptrunner_utils.script_run_context import ThreadState
+
+# Each interaction and the fragment it lands in
+SECTIONS = [
+    ("Add Product", "render.product_form"),
+    ("Delete line in grid", "render.selected_products"),
+    ("Filter Previous Invoices", "render.previous_invoices"),
+    ("Analytics period", "render.analytics"),
+    ("Company Settings", "render.company_settings"),
+]
+
+# span name -> id of the fragment it ran in
+fragment_ids = {}
+
+# Function to wrap metrics.observe so every span run inside a fragment records that fragment's id
+def record_fragment_ids(observe):
+    def wrapper(name, seconds, started_at=None):
+        fragment_id = ThreadState.get().fragment_id
+        if fragment_id:
+            fragment_ids.setdefault(name, fragment_id)
+        return observe(name, seconds, started_at)
+    return wrapper
+
+# Function to make the next AppTest run a fragment-only rerun of fragment_id, as the browser
+# requests when a widget inside that fragment changes
+@contextmanager
+def fragment_rerun(fragment_id):
+    with mock.patch.object(local_script_runner, "RerunData", partial(RerunData, fragment_id_queue=[fragment_id])):
+        yield
+
+def click(app, label):
+    for button in app.button:
+        if button.label == label:
+            button.click()
+            return
+    raise LookupError(label)
+
+# Function to delete one row of the line-item grid as the browser does: st.data_editor sends its
+# edits as a JSON widget state, which AppTest has no helper for, so the state is added by hand
+def delete_grid_row(app, row):
+    editor = next(frame for frame in app.dataframe if frame.key and frame.key.startswith("line_grid_"))
+    states = app._tree.get_widget_states()
+    state = states.widgets.add()
+    state.id = editor.proto.id
+    state.string_value = json.dumps({"edited_rows": {}, "added_rows": [], "deleted_rows": [row]})
+    app._run(states)
+
+def add_product(app, n):
+    click(app, "Add Product")
+    app.run()
+
+def filter_invoices(app, n):
+    app.text_input(key="filter_name").input(f"Customer {n}").run()
+
+def analytics_period(app, n):
+    app.radio(key="analytics_period").set_value("Monthly" if n % 2 else "Daily").run()
+
+def save_company_settings(app, n):
+    terms = next(area for area in app.text_area if area.label == "Invoice Terms & Conditions")
+    terms.input(f"Payment due within {n + 7} days")
+    click(app, "Save Company Settings")
+    app.run()
+
+INTERACTIONS = {
+    "Add Product": add_product,
+    "Delete line in grid": lambda app, n: delete_grid_row(app, 0),
+    "Filter Previous Invoices": filter_invoices,
+    "Analytics period": analytics_period,
+    "Company Settings": save_company_settings,
+}
+
+def timed_run(interact, app, n):
+    start = time.perf_counter()
+    interact(app, n)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=20000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--clicks", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        rows = synthetic.catalogue_rows(args.products, args.seed)
+        catalogue = synthetic.Catalogue.from_rows(rows)
+        synthetic.build_ledger(args.invoices, catalogue, invoice_ledger.LEDGER_PATH, args.seed)
+        frame = invoice_ledger.load_invoices()
+        sheet_rows = [invoice_ledger.INVOICE_COLUMNS] + frame.fillna("").astype(str).values.tolist()
+        worksheets = [FakeWorksheet("Catalogue", rows=rows), FakeWorksheet("Invoices", rows=sheet_rows)]
+
+        class Client:
+            def open(self, name):
+                return FakeSpreadsheet(worksheets)
+        sheets_client._default_client_factory = lambda info: Client()
+
+        metrics.enable()
+        metrics.observe = record_fragment_ids(metrics.observe)
+        app = AppTest.from_file(os.path.join(REPO, "invoice_claude_dis.py"), default_timeout=300)
+        app.secrets["gcp_service_account"] = {"type": "service_account"}
+        app.run()
+        # Seed the grid so the first delete has a line to remove
+        add_product(app, 0)
+
+        full_runs = {label: [] for label, _ in SECTIONS}
+        fragment_runs = {label: [] for label, _ in SECTIONS}
+        for n in range(args.clicks):
+            for label, span in SECTIONS:
+                interact = INTERACTIONS[label]
+                full_runs[label].append(timed_run(interact, app, n))
+                with fragment_rerun(fragment_ids[span]):
+                    fragment_runs[label].append(timed_run(interact, app, n))
+                # A fragment-only run returns just the fragment's elements; rerun the whole
+                # script (untimed) so the next interaction finds every widget again
+                app.run()
+                assert not app.exception, app.exception
+
+        print(f"{args.invoices} invoices, {args.products} products, {args.clicks} clicks per interaction")
+        print(f"{'interaction':28s} {'full run p50':>14s} {'fragment run p50':>17s} {'saving':>8s}")
+        for label, _ in SECTIONS:
+            full = statistics.median(full_runs[label]) * 1000
+            fragment = statistics.median(fragment_runs[label]) * 1000
+            saving = 1 - fragment / full if full else 0.0
+            print(f"{label:28s} {full:11.2f} ms {fragment:14.2f} ms {saving:7.0%}")
+        os.chdir(REPO)
+
+if __name__ == "__main__":
+    main()
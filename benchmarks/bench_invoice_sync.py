@@ -0,0 +1,52 @@
+# Per-keystroke cost of loading the Previous Invoices table: a full get_all_values and
+# DataFrame rebuild on every rerun versus the incremental InvoiceSheetCache.
+#
+#   python benchmarks/bench_invoice_sync.py --rows 50000
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_sheets import FakeWorksheet
+from invoice_ledger import INVOICE_COLUMNS
+from invoice_sync import InvoiceSheetCache
+
+def synthetic_row(i):
+    return [f"INV-{i:08d}", "2025-01-01 10:00:00", f"07AAGCI{i % 9999:04d}N1ZA", f"Customer {i % 5000}",
+            f"customer{i % 5000}@example.com", f"98{i:08d}"[:10], "New Delhi", "['Handwash 5L']",
+            "[2]", "[500.0]", "[50.0]", "[250.0]", "500.0", "0.0", "500.0"]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--keystrokes", type=int, default=20)
+    args = parser.parse_args()
+
+    ws = FakeWorksheet(rows=[INVOICE_COLUMNS] + [synthetic_row(i) for i in range(args.rows)])
+
+    start = time.perf_counter()
+    for _ in range(args.keystrokes):
+        values = ws.get_all_values()
+        pd.DataFrame(values[1:], columns=values[0])
+    full = (time.perf_counter() - start) / args.keystrokes
+
+    cache = InvoiceSheetCache(min_interval=0.0)
+    start = time.perf_counter()
+    cache.sync(ws)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(args.keystrokes):
+        ws.append_row(synthetic_row(args.rows + i))
+        cache.sync(ws)
+    incremental = (time.perf_counter() - start) / args.keystrokes
+
+    print(f"rows: {args.rows}")
+    print(f"full reload per keystroke:        {full * 1000:.2f} ms")
+    print(f"incremental cold load:            {cold * 1000:.2f} ms")
+    print(f"incremental sync per keystroke:   {incremental * 1000:.2f} ms (one new row each)")
+    print(f"full refreshes: {cache.full_refreshes}, incremental fetches: {cache.incremental_fetches}")
+
+if __name__ == "__main__":
+    main()
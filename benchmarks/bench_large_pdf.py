@@ -0,0 +1,64 @@
+# Render time and peak RSS of one large invoice against its line count, with the items
+# as a single table (the old layout) and laid out page by page. Each render runs in a fresh
+# interpreter so ru_maxrss is the peak of that render alone; the PDF goes to a file.
+#
+#   python benchmarks/bench_large_pdf.py --lines 100 1000 5000 20000
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import sys, time, json, resource
+sys.path.insert(0, BENCHMARKS)
+from bench_pdf_render import synthetic_invoice, COMPANY_SETTINGS
+import invoice_pdf
+invoice_pdf.create_pdf_invoice(synthetic_invoice(0, 10), COMPANY_SETTINGS)  # warm the template
+invoice = synthetic_invoice(1, LINES)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+invoice_pdf.create_pdf_invoice(invoice, COMPANY_SETTINGS, OUTPUT)
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with open(OUTPUT, "rb") as f:
+    pages = f.read().count(b"/Type /Page\\n")
+print(json.dumps({"seconds": elapsed, "rss_kb": peak, "rss_growth_kb": peak - before, "pages": pages}))
+"""
+
+# Function to render one invoice of lines lines in a fresh interpreter; paged=False forces one table
+def run_probe(lines, paged, output):
+    prelude = (f"BENCHMARKS = {os.path.dirname(os.path.abspath(__file__))!r}\n"
+               f"LINES = {lines}\nOUTPUT = {output!r}\n")
+    env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               INVOICE_PDF_LARGE_LINES="100" if paged else str(10 ** 9))
+    out = subprocess.run([sys.executable, "-c", prelude + PROBE], env=env,
+                         capture_output=True, text=True, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result['bytes'] = os.path.getsize(output)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    parser.add_argument("--skip-single-above", type=int, default=20000,
+                        help="skip the single-table layout above this many lines (it grows quadratically)")
+    args = parser.parse_args()
+
+    print(f"{'lines':>6s} {'layout':>7s} {'seconds':>8s} {'peak RSS':>9s} {'growth':>8s} {'pages':>6s} {'size':>9s}")
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, "invoice.pdf")
+        for lines in args.lines:
+            for paged in (False, True):
+                if not paged and lines > args.skip_single_above:
+                    continue
+                r = run_probe(lines, paged, output)
+                print(f"{lines:6d} {'paged' if paged else 'single':>7s} {r['seconds']:8.2f} "
+                      f"{r['rss_kb'] / 1024:6.0f} MB {r['rss_growth_kb'] / 1024:5.0f} MB {r['pages']:6d} "
+                      f"{r['bytes'] / 1024:6.0f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Render time of the Selected Products section as orders grow. The lines are one
+# st.data_editor grid, so the cost should stay roughly flat from 10 to 1000 lines
+# (the old layout created a row of seven widgets per line).
+#
+#   python benchmarks/bench_line_grid.py --lines 10 100 300 1000 --runs 10
+import os
+import sys
+import argparse
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+import metrics
+import sheets_client
+import invoice_core
+import invoice_ledger
+from fake_sheets import FakeWorksheet, FakeSpreadsheet
+from streamlit.testing.v1 import AppTest
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, nargs="+", default=[10, 100, 300, 1000])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        rows = synthetic.catalogue_rows(args.products)
+        catalogue = synthetic.Catalogue.from_rows(rows)
+        worksheets = [FakeWorksheet("Catalogue", rows=rows), FakeWorksheet("Invoices", rows=[invoice_ledger.INVOICE_COLUMNS])]
+
+        class Client:
+            def open(self, name):
+                return FakeSpreadsheet(worksheets)
+        sheets_client._default_client_factory = lambda info: Client()
+
+        print(f"{'lines':>6s} {'section p50':>12s} {'section p95':>12s} {'full run p50':>13s}")
+        for line_count in args.lines:
+            items = [{'product': catalogue.product_names[i % len(catalogue)], 'quantity': 1 + i % 20}
+                     for i in range(line_count)]
+            line_items, _ = invoice_core.price_items(items, catalogue)
+            app = AppTest.from_file(os.path.join(REPO, "invoice_claude_dis.py"), default_timeout=300)
+            app.secrets["gcp_service_account"] = {"type": "service_account"}
+            app.run()
+            app.session_state.selected_products = line_items
+            metrics.enable()
+            metrics.reset()
+            for _ in range(args.runs):
+                app.run()
+            assert not app.exception, app.exception
+            metrics.disable()
+            timings = {row['span']: row for row in metrics.summary()}
+            section = timings["render.selected_products"]
+            print(f"{line_count:6d} {section['p50_ms']:9.2f} ms {section['p95_ms']:9.2f} ms "
+                  f"{timings['render.app']['p50_ms']:10.2f} ms")
+        os.chdir(REPO)
+
+if __name__ == "__main__":
+    main()
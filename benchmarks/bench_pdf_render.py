@@ -0,0 +1,62 @@
+# Per-PDF render time for a batch of invoices with create_pdf_invoice.
+# Reports the uncached path (template rebuilt for every invoice, as before the
+# template cache) and the cached path side by side.
+#
+#   python benchmarks/bench_pdf_render.py --invoices 1000 --lines 10 [--logo path.png]
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import invoice_pdf
+from invoice_models import LineItem, new_invoice
+
+COMPANY_SETTINGS = {
+    "company_gst": "07AAGCI0069N1ZA",
+    "company_name": "Inglo Imex Private Limited",
+    "company_address": "Sector 8 Dwarka, New Delhi 110077",
+    "company_phone": "(+91) 87006-01262",
+    "company_email": "ingloimexsales@gmail.com",
+    "company_website": "www.yourcompany.com",
+    "company_logo_path": None,
+    "invoice_terms": "Payment is due within 30 days of the order date."
+}
+
+def synthetic_invoice(i, lines):
+    items = []
+    for n in range(lines):
+        price = 250.0 + n
+        items.append(LineItem(str(n), f"Product {n}", price * 2, 50.0, price, 2, 18.0, price * 2 * 0.18, price * 2))
+    return new_invoice(
+        f"INV-{i:06d}", "2025-01-01 10:00:00", items, customer_gst="07ABCDE1234F1Z5",
+        customer_name=f"Customer {i}", customer_email="c@example.com", customer_phone="9800000000",
+        customer_address="New Delhi"
+    )
+
+def run(invoices, settings, uncached):
+    clear = getattr(invoice_pdf, "clear_template_cache", None)
+    start = time.perf_counter()
+    for invoice in invoices:
+        if uncached and clear is not None:
+            clear()
+        invoice_pdf.create_pdf_invoice(invoice, settings)
+    return (time.perf_counter() - start) / len(invoices)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("--logo", default=None)
+    args = parser.parse_args()
+
+    settings = dict(COMPANY_SETTINGS, company_logo_path=args.logo)
+    invoices = [synthetic_invoice(i, args.lines) for i in range(args.invoices)]
+    uncached = run(invoices, settings, uncached=True)
+    cached = run(invoices, settings, uncached=False)
+    print(f"{args.invoices} invoices x {args.lines} lines")
+    print(f"uncached template: {uncached * 1000:.2f} ms/PDF")
+    print(f"cached template:   {cached * 1000:.2f} ms/PDF")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Pricing engine over synthetic line items: one vectorised NumPy pass versus the
+# old per-line scalar arithmetic, plus per-invoice totals for bulk recomputation.
+#
+#   python benchmarks/bench_pricing.py --lines 1000000
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pricing import price_lines, summarize_by_invoice
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1_000_000)
+    parser.add_argument("--lines-per-invoice", type=int, default=10)
+    parser.add_argument("--scalar-sample", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    mrp = np.round(rng.uniform(1, 5000, args.lines), 2)
+    discount = np.round(rng.uniform(0, 60, args.lines), 1)
+    quantity = rng.integers(1, 50, args.lines)
+    tax_rate = rng.choice([0.0, 5.0, 12.0, 18.0, 28.0], args.lines)
+    invoice_ids = np.arange(args.lines) // args.lines_per_invoice
+
+    start = time.perf_counter()
+    lines = price_lines(mrp, discount, quantity, tax_rate)
+    vectorised = time.perf_counter() - start
+
+    start = time.perf_counter()
+    totals = summarize_by_invoice(invoice_ids, lines)
+    grouped = time.perf_counter() - start
+
+    # The pre-engine arithmetic: one float calculation and one dict per line
+    sample = min(args.scalar_sample, args.lines)
+    start = time.perf_counter()
+    for i in range(sample):
+        price = mrp[i] * (1 - discount[i] / 100)
+        amount = price * quantity[i]
+        {'price': price, 'amount': amount, 'tax_amount': amount * (tax_rate[i] / 100)}
+    scalar = (time.perf_counter() - start) * args.lines / sample
+
+    print(f"{args.lines} lines, {len(totals)} invoices")
+    print(f"vectorised price/amount/tax:  {vectorised * 1000:.1f} ms")
+    print(f"per-invoice totals:           {grouped * 1000:.1f} ms")
+    print(f"scalar loop (extrapolated):   {scalar * 1000:.1f} ms")
+    print(f"grand total: INR {(lines['amount'].sum() + lines['tax_amount'].sum()) / 100:,.2f}")
+
+if __name__ == "__main__":
+    main()
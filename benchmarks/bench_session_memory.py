@@ -0,0 +1,56 @@
+# Per-session memory for a large order: the old per-line dicts (selected_products
+# plus the copied current_invoice list) versus slotted LineItem / Invoice records.
+#
+#   python benchmarks/bench_session_memory.py --lines 300
+import os
+import sys
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from invoice_models import LineItem, new_invoice
+
+def measure(build):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+def dict_session(lines):
+    selected_products = []
+    for n in range(lines):
+        price = 250.0 + n
+        selected_products.append({
+            'product_id': str(n), 'product_name': f"Product {n}", 'mrp': price * 2,
+            'discount_percentage': 50.0, 'price': price, 'quantity': 2 + n,
+            'tax_rate': 18.0, 'tax_amount': price * 2 * 0.18, 'amount': price * 2
+        })
+    current_invoice = {'invoice_data': {'invoice_id': "INV-1"}, 'selected_products': selected_products.copy()}
+    return selected_products, current_invoice
+
+def slotted_session(lines):
+    selected_products = []
+    for n in range(lines):
+        price = 250.0 + n
+        selected_products.append(LineItem(str(n), f"Product {n}", price * 2, 50.0, price, 2 + n,
+                                          18.0, price * 2 * 0.18, price * 2))
+    current_invoice = new_invoice("INV-1", "2025-01-01 10:00:00", selected_products)
+    return current_invoice
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=300)
+    args = parser.parse_args()
+
+    old = measure(lambda: dict_session(args.lines))
+    new = measure(lambda: slotted_session(args.lines))
+    print(f"{args.lines}-line order")
+    print(f"dict line items:    {old / 1024:.1f} KiB")
+    print(f"slotted LineItems:  {new / 1024:.1f} KiB ({new / old:.0%} of before)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Compare Sheets connection cost per Streamlit rerun: connecting eagerly on every
+# script run (the old module-level code) versus the cached sheets_client handles.
+#
+#   python benchmarks/bench_sheets_connect.py                 # simulated round trips
+#   python benchmarks/bench_sheets_connect.py --live          # real Sheets, uses .streamlit/secrets.toml
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sheets_client
+from fake_sheets import FakeSpreadsheet
+
+class SlowFakeClient:
+    def __init__(self, latency):
+        self.latency = latency
+        self.spreadsheet = SlowFakeSpreadsheet(latency)
+
+    def open(self, name):
+        time.sleep(self.latency)
+        return self.spreadsheet
+
+class SlowFakeSpreadsheet(FakeSpreadsheet):
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def worksheet(self, title):
+        time.sleep(self.latency)
+        return super().worksheet(title)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="connect to the real spreadsheet")
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.15, help="simulated round trip in seconds")
+    args = parser.parse_args()
+
+    if args.live:
+        info_provider, factory = sheets_client.load_service_account_info, None
+    else:
+        def info_provider():
+            return {}
+        def factory(info):
+            time.sleep(args.latency)
+            return SlowFakeClient(args.latency)
+
+    # Old behaviour: authorize, open and look up both worksheets on every rerun
+    eager = []
+    for _ in range(args.reruns):
+        sheets_client.configure(info_provider, factory)
+        sheets_client.reset()
+        start = time.perf_counter()
+        sheets_client.get_worksheet("Invoices")
+        sheets_client.get_worksheet("Catalogue")
+        eager.append(time.perf_counter() - start)
+
+    # New behaviour: first rerun connects, later reruns reuse the cached handles
+    sheets_client.configure(info_provider, factory)
+    sheets_client.reset()
+    cached = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        sheets_client.get_worksheet("Invoices")
+        sheets_client.get_worksheet("Catalogue")
+        cached.append(time.perf_counter() - start)
+
+    print(f"eager connect per rerun:  mean {sum(eager) / len(eager) * 1000:.1f} ms")
+    print(f"cached cold start:        {cached[0] * 1000:.1f} ms  {sheets_client.connect_timings}")
+    warm = cached[1:] or [0.0]
+    print(f"cached per rerun (warm):  mean {sum(warm) / len(warm) * 1000:.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Cold start of the Streamlit app: module import time and time to the first full render,
+# each measured in a fresh interpreter, plus which heavy libraries were loaded by then.
+# Sheets is replaced by the in-memory fake, so no network is involved.
+#
+#   python benchmarks/bench_startup.py --runs 5
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["reportlab", "PIL", "gspread", "oauth2client"]
+
+# Imports everything the app script imports, without running it
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import streamlit, pandas, numpy
+import invoice_ledger, invoice_core, invoice_reconcile, invoice_numbering, invoice_search, invoice_sync
+import sheets_client, sheets_writer, catalogue, pricing, invoice_models, bulk_pdf
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+# Runs the app once with AppTest against fake worksheets
+RENDER_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import sheets_client
+from fake_sheets import FakeWorksheet, FakeSpreadsheet
+from invoice_ledger import INVOICE_COLUMNS
+catalogue = FakeWorksheet("Catalogue", rows=[
+    ["product_id", "product_name", "product_tax_rate", "product_mrp", "product_default_discount"]
+] + [[str(i), f"Product {i}", "18", str(100 + i), "10"] for i in range(200)])
+invoices = FakeWorksheet("Invoices", rows=[INVOICE_COLUMNS])
+class Client:
+    def open(self, name):
+        return FakeSpreadsheet([catalogue, invoices])
+sheets_client._default_client_factory = lambda info: Client()
+app = AppTest.from_file(APP, default_timeout=120)
+app.secrets["gcp_service_account"] = {"type": "service_account"}
+app.run()
+elapsed = time.perf_counter() - start
+assert not app.exception, app.exception
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in HEAVY if m in sys.modules]}))
+"""
+
+# Function to run a probe in a fresh interpreter inside an empty working directory
+def run_probe(source, workdir):
+    prelude = f"HEAVY = {HEAVY_MODULES!r}\nAPP = {os.path.join(REPO, 'invoice_claude_dis.py')!r}\n"
+    env = dict(os.environ, PYTHONPATH=REPO + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    out = subprocess.run(
+        [sys.executable, "-c", prelude + source], cwd=workdir, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def summarize(label, results):
+    times = [r["seconds"] for r in results]
+    print(f"{label}: median {statistics.median(times) * 1000:.0f} ms, "
+          f"min {min(times) * 1000:.0f} ms over {len(times)} runs; heavy modules loaded: "
+          f"{', '.join(results[-1]['loaded']) or 'none'}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, renders = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as workdir:
+            imports.append(run_probe(IMPORT_PROBE, workdir))
+        with tempfile.TemporaryDirectory() as workdir:
+            renders.append(run_probe(RENDER_PROBE, workdir))
+    summarize("import", imports)
+    summarize("first render", renders)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# End-to-end benchmark suite over synthetic catalogues and invoice histories, with the
+# Sheets worksheet replaced by the in-memory fake. Writes JSON results that can be
+# compared against an earlier run to catch regressions before deploying.
+#
+#   python benchmarks/bench_suite.py --preset small --output results.json
+#   python benchmarks/bench_suite.py --preset medium --compare results.json --tolerance 0.25
+#   python benchmarks/bench_suite.py --products 100000 --invoices 1000000      # large history
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+import invoice_core
+import invoice_ledger
+from fake_sheets import FakeWorksheet
+from sheets_writer import SheetsWriter
+from invoice_sync import InvoiceSheetCache
+from invoice_search import InvoiceSearchIndex, paginate
+from product_search import ProductSearchIndex
+from invoice_models import Invoice
+from invoice_pdf import create_pdf_invoice
+from bulk_pdf import render_invoices_zip
+from bench_pdf_render import COMPANY_SETTINGS
+
+PRESETS = {
+    'small': {'products': 21, 'invoices': 1000, 'saves': 100, 'pdfs': 20, 'bulk': 100},
+    'medium': {'products': 10000, 'invoices': 100000, 'saves': 200, 'pdfs': 50, 'bulk': 500},
+    'large': {'products': 100000, 'invoices': 1000000, 'saves': 200, 'pdfs': 100, 'bulk': 2000},
+}
+
+# Function to time fn over several runs; returns seconds statistics
+def measure(fn, runs=5):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'max_s': max(times), 'runs': runs}
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def bench_catalogue(params, rng):
+    rows = synthetic.catalogue_rows(params['products'], params['seed'])
+    build = measure(lambda: synthetic.Catalogue.from_rows(rows), runs=3)
+    catalogue = synthetic.Catalogue.from_rows(rows)
+    names = [rng.choice(catalogue.product_names) for _ in range(10000)]
+    lookup = measure(lambda: [catalogue.by_name(name) for name in names], runs=3)
+    search_build = measure(lambda: ProductSearchIndex(catalogue.product_ids, catalogue.product_names), runs=3)
+
+    # Typeahead keystrokes: growing prefixes of product names, plus some ids
+    queries = []
+    for name in names[:100]:
+        words = name.split()
+        word = words[-1] if name.startswith("SKU ") else words[0]
+        queries.extend(word[:n] for n in range(1, len(word) + 1))
+    queries.extend(str(rng.randrange(1, len(catalogue) + 1)) for _ in range(100))
+    index = catalogue.search_index()
+    timing = measure(lambda: [index.search(query) for query in queries], runs=3)
+    return catalogue, {
+        'catalogue_build': build,
+        'catalogue_lookup_10k': lookup,
+        'product_search_build': search_build,
+        'product_search_per_keystroke': {key: (value / len(queries) if key.endswith('_s') else value)
+                                         for key, value in timing.items()},
+    }
+
+def bench_ledger(params, catalogue, workdir):
+    db_path = os.path.join(workdir, "ledger.db")
+    start = time.perf_counter()
+    synthetic.build_ledger(params['invoices'], catalogue, db_path, params['seed'])
+    build_seconds = time.perf_counter() - start
+    results = {
+        'ledger_build': {'median_s': build_seconds, 'min_s': build_seconds, 'max_s': build_seconds, 'runs': 1},
+        'load_invoice_data': measure(lambda: invoice_ledger.load_invoices(db_path), runs=3),
+    }
+
+    # save_invoice: spool the sheet row and append to the ledger, one invoice at a time
+    worksheet = FakeWorksheet("Invoices", rows=[invoice_ledger.INVOICE_COLUMNS])
+    writer = SheetsWriter(lambda: worksheet, spool_path=os.path.join(workdir, "spool.db"))
+    new_invoices = synthetic.invoices(params['saves'], catalogue, params['seed'] + 1, first=params['invoices'],
+                                      total=params['invoices'] + params['saves'])
+    times = []
+    for invoice in new_invoices:
+        start = time.perf_counter()
+        invoice_core.save_invoice(invoice, writer, db_path)
+        times.append(time.perf_counter() - start)
+    results['save_invoice'] = {'median_s': statistics.median(times), 'min_s': min(times),
+                               'max_s': max(times), 'runs': len(times)}
+    results['sheets_flush'] = measure(writer.flush, runs=1)
+    return db_path, results
+
+def bench_search(db_path, rng):
+    frame = invoice_ledger.load_invoices(db_path)
+    rows = [invoice_ledger.INVOICE_COLUMNS] + frame.fillna("").astype(str).values.tolist()
+    worksheet = FakeWorksheet("Invoices", rows=rows)
+    cache = InvoiceSheetCache(min_interval=0.0)
+    results = {'invoice_sheet_sync_cold': measure(lambda: InvoiceSheetCache().sync(worksheet), runs=3)}
+    cache.sync(worksheet)
+    index = InvoiceSearchIndex()
+    results['search_index_build'] = measure(lambda: InvoiceSearchIndex().sync(cache), runs=3)
+    index.sync(cache)
+
+    sample = frame.sample(n=min(200, len(frame)), random_state=rng.randrange(2 ** 31))
+    queries = []
+    for record in sample.to_dict('records'):
+        queries.append({'customer_name': record['customer_name'].split()[1]})
+        queries.append({'customer_gst': record['customer_gst'][:9]})
+        queries.append({'customer_phone': record['customer_phone'][-5:]})
+        queries.append({'customer_email': record['customer_email'].split("@")[0]})
+
+    # One keystroke: search, then slice the first page as tab2 does
+    def run_queries():
+        for query in queries:
+            invoice_df, matching_ids = cache.search(index, query)
+            page_ids, _ = paginate(matching_ids, 1, 50)
+            invoice_df.iloc[page_ids]
+    timing = measure(run_queries, runs=3)
+    results['tab2_search_per_query'] = {key: (value / len(queries) if key.endswith('_s') else value)
+                                        for key, value in timing.items()}
+    return results
+
+def bench_pdfs(params, db_path, catalogue, rng):
+    frame = invoice_ledger.load_invoices(db_path)
+    records = frame.sample(n=min(params['pdfs'], len(frame)), random_state=rng.randrange(2 ** 31)).to_dict('records')
+    create_pdf_invoice(Invoice.from_record(records[0], catalogue), COMPANY_SETTINGS)  # warm the template
+    timing = measure(lambda: [create_pdf_invoice(Invoice.from_record(r, catalogue), COMPANY_SETTINGS)
+                              for r in records], runs=1)
+    results = {'pdf_regenerate_per_invoice': {key: (value / len(records) if key.endswith('_s') else value)
+                                              for key, value in timing.items()}}
+
+    bulk_df = frame.head(params['bulk'])
+    stats = render_invoices_zip(bulk_df, catalogue, COMPANY_SETTINGS, io.BytesIO(), workers=params['workers'])
+    results['bulk_render'] = {'median_s': stats['seconds'], 'min_s': stats['seconds'], 'max_s': stats['seconds'],
+                              'runs': 1, 'pdfs': stats['rendered'], 'pdfs_per_second': stats['pdfs_per_second']}
+    return results
+
+# Function to list benchmarks whose best time got slower than baseline by more than tolerance.
+# The fastest run is compared because it is the least disturbed by other load on the machine,
+# and differences under min_delta seconds are treated as noise.
+def compare(results, baseline, tolerance, min_delta=0.005):
+    regressions = []
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('min_s'):
+            continue
+        ratio = current['min_s'] / previous['min_s']
+        if ratio > 1 + tolerance and current['min_s'] - previous['min_s'] > min_delta:
+            regressions.append((name, previous['min_s'], current['min_s'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--invoices", type=int)
+    parser.add_argument("--saves", type=int)
+    parser.add_argument("--pdfs", type=int)
+    parser.add_argument("--bulk", type=int)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    params = dict(PRESETS[args.preset], seed=args.seed, workers=args.workers)
+    for key in ('products', 'invoices', 'saves', 'pdfs', 'bulk'):
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    rng = random.Random(args.seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # the ledger's legacy Excel migration looks in the working directory
+        try:
+            catalogue, timings = bench_catalogue(params, rng)
+            results.update(timings)
+            db_path, timings = bench_ledger(params, catalogue, workdir)
+            results.update(timings)
+            results.update(bench_search(db_path, rng))
+            results.update(bench_pdfs(params, db_path, catalogue, rng))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec="seconds"),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'preset': args.preset,
+            'params': params,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    for name, timing in results.items():
+        print(f"{name:32s} median {timing['median_s'] * 1000:12.3f} ms  min {timing['min_s'] * 1000:12.3f} ms",
+              file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_delta_ms / 1000)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
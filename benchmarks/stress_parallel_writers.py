@@ -0,0 +1,146 @@
+# Many processes writing the shared local files at once, as several Streamlit workers and
+# the CLI do in production: each worker saves numbered invoices to the ledger and the
+# Sheets spool, flushes the spool, saves the company settings and exports the Excel
+# snapshot. Afterwards every file must be intact, nothing lost or duplicated, and the
+# invoice numbers must run 1..N without gaps.
+# Exits non-zero on any failure.
+#
+#   python benchmarks/stress_parallel_writers.py --workers 16 --invoices 50
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+import invoice_core
+import invoice_ledger
+import invoice_rollups
+from file_store import file_lock
+from sheets_writer import SheetsWriter
+from invoice_numbering import financial_year, format_invoice_id
+
+SERIES = "STRESS"
+
+# Stands in for the Drive sheet: every appended row becomes one line of a shared file
+class SheetLog:
+    def __init__(self, path):
+        self.path = path
+
+    def append_rows(self, rows):
+        with file_lock(self.path), open(self.path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+def worker(args):
+    worker_id, invoices, workdir = args
+    os.chdir(workdir)
+    catalogue = synthetic.catalogue(21)
+    sheet = SheetLog("sheet_rows.jsonl")
+    writer = SheetsWriter(lambda: sheet, batch_size=7)
+    errors = []
+    for i, invoice in enumerate(synthetic.invoices(invoices, catalogue, seed=worker_id)):
+        try:
+            invoice_core.save_invoice(invoice, writer, series=SERIES)
+            if i % 3 == 0:
+                writer.flush_batch()
+            if i % 5 == 0:
+                settings = invoice_core.load_company_settings()
+                settings['company_name'] = f"Worker {worker_id} save {i}"
+                invoice_core.save_company_settings(settings)
+            if i % 10 == 0:
+                invoice_ledger.export_excel_snapshot()
+        except Exception as e:
+            errors.append(f"worker {worker_id} invoice {i}: {type(e).__name__}: {e}")
+    try:
+        writer.flush()
+    except Exception as e:
+        errors.append(f"worker {worker_id} final flush: {type(e).__name__}: {e}")
+    return errors
+
+# Function to compare the rollups kept by concurrent appends with a rebuild from the ledger
+def rollup_mismatches(db_path):
+    conn = invoice_ledger.open_ledger(db_path)
+    try:
+        kept = {dimension: invoice_rollups.read_rollup(conn, dimension) for dimension in invoice_rollups.ROLLUP_TABLES}
+        conn.execute("BEGIN")
+        invoice_rollups.rebuild(conn)
+        rebuilt = {dimension: invoice_rollups.read_rollup(conn, dimension) for dimension in invoice_rollups.ROLLUP_TABLES}
+        conn.rollback()
+    finally:
+        conn.close()
+    return [dimension for dimension in kept if not kept[dimension].equals(rebuilt[dimension])]
+
+def check(workdir, expected):
+    problems = []
+    ledger = invoice_ledger.load_invoices(os.path.join(workdir, invoice_ledger.LEDGER_PATH))
+    if len(ledger) != expected:
+        problems.append(f"ledger has {len(ledger)} invoices, expected {expected}")
+    if ledger['invoice_id'].duplicated().any():
+        problems.append(f"{int(ledger['invoice_id'].duplicated().sum())} duplicate invoice ids in the ledger")
+    for fiscal_year, group in ledger.groupby(ledger['date'].map(lambda date: financial_year(pd.Timestamp(date)))):
+        expected_ids = [format_invoice_id(SERIES, fiscal_year, number) for number in range(1, len(group) + 1)]
+        if sorted(group['invoice_id']) != expected_ids:
+            problems.append(f"{SERIES} {fiscal_year} invoice numbers are not 1..{len(group)} without gaps")
+    mismatched = rollup_mismatches(os.path.join(workdir, invoice_ledger.LEDGER_PATH))
+    if mismatched:
+        problems.append(f"rollups differ from a rebuild: {', '.join(mismatched)}")
+
+    with open(os.path.join(workdir, "sheet_rows.jsonl")) as f:
+        sheet_ids = [json.loads(line)[0] for line in f]
+    if len(sheet_ids) != expected or len(set(sheet_ids)) != expected:
+        problems.append(f"sheet received {len(sheet_ids)} rows ({len(set(sheet_ids))} distinct), expected {expected}")
+    spool = sqlite3.connect(os.path.join(workdir, "inglo_delhi_sheets_spool.db"))
+    left = spool.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+    spool.close()
+    if left:
+        problems.append(f"{left} rows left in the Sheets spool")
+
+    try:
+        with open(os.path.join(workdir, invoice_core.COMPANY_SETTINGS_PATH)) as f:
+            json.load(f)
+    except Exception as e:
+        problems.append(f"company settings unreadable: {e}")
+    try:
+        snapshot = pd.read_excel(os.path.join(workdir, invoice_ledger.LEGACY_EXCEL_PATH))
+        if len(snapshot) > expected:
+            problems.append(f"Excel snapshot has {len(snapshot)} rows, more than {expected}")
+    except Exception as e:
+        problems.append(f"Excel snapshot unreadable: {e}")
+    stray = [name for name in os.listdir(workdir) if name.endswith(".tmp")]
+    if stray:
+        problems.append(f"temporary files left behind: {', '.join(stray)}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--invoices", type=int, default=50, help="invoices saved by each worker")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.workers) as pool:
+            errors = [error for worker_errors in
+                      pool.map(worker, [(i, args.invoices, workdir) for i in range(args.workers)])
+                      for error in worker_errors]
+        elapsed = time.perf_counter() - start
+        expected = args.workers * args.invoices
+        problems = errors + check(workdir, expected)
+
+    print(f"{args.workers} workers x {args.invoices} invoices in {elapsed:.1f}s "
+          f"({expected / elapsed:.0f} invoices/s)")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK: ledger, invoice numbers, rollups, Sheets rows, settings and Excel snapshot intact")
+
+if __name__ == "__main__":
+    main()
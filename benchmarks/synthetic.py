@@ -0,0 +1,90 @@
+# Seeded synthetic data for the benchmarks: catalogues from the 21 sample products up
+# to any number of SKUs, and invoice histories priced with the real pricing engine.
+import os
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalogue import CATALOGUE_COLUMNS, Catalogue
+from pricing import price_lines, from_paise
+from invoice_models import LineItem, Invoice
+import invoice_ledger
+
+SAMPLE_PRODUCTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.xlsx")
+TAX_RATES = [0.0, 5.0, 12.0, 18.0, 28.0]
+CITIES = ["New Delhi", "Mumbai", "Bengaluru", "Chennai", "Kolkata", "Pune", "Jaipur", "Lucknow"]
+
+# Function to build catalogue sheet rows (header first); up to 21 products come from products.xlsx
+def catalogue_rows(products, seed=42):
+    sample = pd.read_excel(SAMPLE_PRODUCTS_PATH)
+    if products <= len(sample):
+        frame = sample.head(products)
+    else:
+        rng = np.random.default_rng(seed)
+        extra = products - len(sample)
+        frame = pd.concat([sample, pd.DataFrame({
+            'product_id': np.arange(len(sample) + 1, products + 1),
+            'product_name': [f"SKU {i:06d} {sample['product_name'].iloc[i % len(sample)]}"
+                             for i in range(len(sample), products)],
+            'product_tax_rate': rng.choice(TAX_RATES, extra),
+            'product_mrp': np.round(rng.uniform(5, 5000, extra), 2),
+            'product_default_discount': rng.choice([0, 5, 10, 25, 50], extra),
+        })], ignore_index=True)
+    return [CATALOGUE_COLUMNS] + frame[CATALOGUE_COLUMNS].astype(str).values.tolist()
+
+# Function to generate invoices first..first+count-1 of a history of total invoices spread over a
+# year; customers repeat (one per 20 invoices) so searches have matches
+def invoices(count, catalogue, seed=42, first=0, total=None, max_lines=8, start=datetime(2025, 4, 1)):
+    total = total or first + count
+    rng = np.random.default_rng([seed, first])
+    customers = max(1, total // 20)
+    line_counts = rng.integers(1, max_lines + 1, count)
+    total_lines = int(line_counts.sum())
+    positions = rng.integers(0, len(catalogue), total_lines)
+    quantities = rng.integers(1, 25, total_lines)
+    mrps = catalogue.mrps[positions]
+    discounts = catalogue.default_discounts[positions]
+    tax_rates = catalogue.tax_rates[positions]
+    priced = price_lines(mrps, discounts, quantities, tax_rates)
+    prices = from_paise(priced['price'])
+    amounts = from_paise(priced['amount'])
+    tax_amounts = from_paise(priced['tax_amount'])
+    seconds_per_invoice = 365 * 24 * 3600 / total
+    customer_ids = rng.integers(0, customers, count)
+
+    result = []
+    line = 0
+    for i in range(count):
+        items = []
+        for j in range(line, line + int(line_counts[i])):
+            record = catalogue.records[positions[j]]
+            items.append(LineItem(record.product_id, record.product_name, float(mrps[j]), float(discounts[j]),
+                                  float(prices[j]), int(quantities[j]), float(tax_rates[j]),
+                                  float(tax_amounts[j]), float(amounts[j])))
+        subtotal = round(float(amounts[line:line + len(items)].sum()), 2)
+        tax = round(float(tax_amounts[line:line + len(items)].sum()), 2)
+        line += len(items)
+        c = int(customer_ids[i])
+        result.append(Invoice(
+            invoice_id=f"INV-BENCH-{first + i:07d}",
+            date=(start + timedelta(seconds=int((first + i) * seconds_per_invoice))).strftime("%Y-%m-%d %H:%M:%S"),
+            customer_gst=f"07AAGCI{c:05d}N1ZA",
+            customer_name=f"Customer {c} Traders",
+            customer_email=f"customer{c}@example.com",
+            customer_phone=f"98{c:08d}",
+            customer_address=CITIES[c % len(CITIES)],
+            subtotal=subtotal, tax=tax, total=round(subtotal + tax, 2),
+            line_items=items,
+        ))
+    return result
+
+# Function to write a history of total invoices to a ledger in chunks, as the batch path does
+def build_ledger(total, catalogue, db_path, seed=42, chunk=10000):
+    for first in range(0, total, chunk):
+        batch = invoices(min(chunk, total - first), catalogue, seed, first, total)
+        invoice_ledger.append_invoices([(invoice.to_record(), invoice.line_items) for invoice in batch], db_path)
+
+def catalogue(products, seed=42):
+    return Catalogue.from_rows(catalogue_rows(products, seed))
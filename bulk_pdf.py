@@ -0,0 +1,108 @@
+# Bulk invoice regeneration: render many invoice PDFs across a process pool and
+# stream them into a ZIP archive. Each PDF is written to the archive as soon as it
+# is rendered, and only a bounded number of renders are in flight at once.
+import os
+import time
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from invoice_models import Invoice
+
+# Function to pick invoices whose date falls within [start_date, end_date] (inclusive, either may be None)
+def select_invoices(invoice_df, start_date=None, end_date=None):
+    dates = pd.to_datetime(invoice_df['date'].astype(str).str[:10], format="%Y-%m-%d", errors='coerce')
+    mask = pd.Series(True, index=invoice_df.index)
+    if start_date is not None:
+        mask &= dates >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= dates <= pd.Timestamp(end_date)
+    return invoice_df[mask]
+
+# Function run in a worker process: render one invoice and return its archive name and bytes
+def _render_one(invoice, company_settings):
+    # Imported here so loading this module does not pull in ReportLab
+    from invoice_pdf import create_pdf_invoice
+    pdf_buffer = create_pdf_invoice(invoice, company_settings)
+    return f"Invoice_{invoice.invoice_id}.pdf", pdf_buffer.getvalue()
+
+# Function to yield Invoice jobs, recording invoices that cannot be rebuilt
+def _jobs(invoice_df, catalogue, failures):
+    for record in invoice_df.to_dict('records'):
+        try:
+            yield Invoice.from_record(record, catalogue)
+        except Exception as e:
+            failures.append((record.get('invoice_id'), str(e)))
+
+# Function to render Invoices across a process pool, calling write(filename, pdf_bytes) in the
+# parent as each one finishes. progress(done, total, elapsed_seconds) is called after every PDF;
+# skipped lists invoices that could not be built and counts towards progress.
+def render_invoices(invoices, company_settings, write, total, workers=None, progress=None, skipped=()):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    failures = []
+    done = 0
+    written_bytes = 0
+    start = time.perf_counter()
+
+    # Workers are spawned, not forked: the Streamlit server and the HTTP endpoint are threaded, and a
+    # forked child can inherit a lock (e.g. the metrics lock) held by another thread and deadlock on it
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        jobs = iter(invoices)
+        in_flight = {}
+
+        def submit_next():
+            for invoice in jobs:
+                future = pool.submit(_render_one, invoice, company_settings)
+                in_flight[future] = invoice.invoice_id
+                return True
+            return False
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                invoice_id = in_flight.pop(future)
+                try:
+                    filename, pdf_bytes = future.result()
+                    write(filename, pdf_bytes)
+                    written_bytes += len(pdf_bytes)
+                except Exception as e:
+                    failures.append((invoice_id, str(e)))
+                done += 1
+                if progress is not None:
+                    # Invoices that could not be rebuilt count as processed too
+                    progress(done + len(skipped), total, time.perf_counter() - start)
+                submit_next()
+
+    elapsed = time.perf_counter() - start
+    failures = list(skipped) + failures
+    return {
+        'requested': total,
+        'rendered': total - len(failures),
+        'failures': failures,
+        'seconds': elapsed,
+        'pdfs_per_second': (total - len(failures)) / elapsed if elapsed else 0.0,
+        'pdf_bytes': written_bytes,
+    }
+
+# Function to render invoices into a ZIP at output (path or binary file object).
+# progress(done, total, elapsed_seconds) is called after every PDF is written.
+def render_invoices_zip(invoice_df, catalogue, company_settings, output, workers=None, progress=None):
+    skipped = []
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        return render_invoices(
+            _jobs(invoice_df, catalogue, skipped), company_settings, archive.writestr,
+            len(invoice_df), workers, progress, skipped
+        )
+
+# Function to render Invoices as individual PDF files in output_dir
+def render_invoices_to_dir(invoices, company_settings, output_dir, workers=None, progress=None):
+    os.makedirs(output_dir, exist_ok=True)
+
+    def write(filename, pdf_bytes):
+        with open(os.path.join(output_dir, filename), "wb") as f:
+            f.write(pdf_bytes)
+
+    return render_invoices(invoices, company_settings, write, len(invoices), workers, progress)
@@ -0,0 +1,196 @@
+# Product catalogue with hash indexes by name and id.
+# Built once from the Catalogue sheet (or the sample data) so lookups are O(1)
+# instead of a boolean-mask scan of the product DataFrame per line item.
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from file_store import atomic_write
+
+CATALOGUE_COLUMNS = ['product_id', 'product_name', 'product_tax_rate', 'product_mrp', 'product_default_discount']
+NUMERIC_COLUMNS = ['product_tax_rate', 'product_mrp', 'product_default_discount']
+
+SNAPSHOT_PATH = "inglo_delhi_catalogue_snapshot.json"
+DEFAULT_TTL = float(os.environ.get("CATALOGUE_TTL_SECONDS", 300))
+
+class ProductRecord(NamedTuple):
+    product_id: str
+    product_name: str
+    product_tax_rate: float
+    product_mrp: float
+    product_default_discount: float
+
+class Catalogue:
+    def __init__(self, frame):
+        frame = frame.copy()
+        frame['product_id'] = frame['product_id'].astype(str)
+        frame['product_name'] = frame['product_name'].astype(str)
+        for column in NUMERIC_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').fillna(0.0).astype(np.float64)
+        self.frame = frame.reset_index(drop=True)
+
+        # Typed columns for vectorised use; records and indexes for per-line lookups
+        self.product_ids = self.frame['product_id'].tolist()
+        self.product_names = self.frame['product_name'].tolist()
+        self.tax_rates = self.frame['product_tax_rate'].to_numpy()
+        self.mrps = self.frame['product_mrp'].to_numpy()
+        self.default_discounts = self.frame['product_default_discount'].to_numpy()
+        self.records = [
+            ProductRecord(pid, name, float(tax), float(mrp), float(disc))
+            for pid, name, tax, mrp, disc in zip(
+                self.product_ids, self.product_names, self.tax_rates, self.mrps, self.default_discounts
+            )
+        ]
+        # First occurrence wins, matching the old .iloc[0] lookups
+        self._by_name = {}
+        self._by_id = {}
+        for pos, record in enumerate(self.records):
+            self._by_name.setdefault(record.product_name, pos)
+            self._by_id.setdefault(record.product_id, pos)
+        self._search_index = None
+
+    # Function to build a catalogue from get_all_values() output (header row first)
+    @classmethod
+    def from_rows(cls, values):
+        return cls(pd.DataFrame(values[1:], columns=values[0]))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, product_name):
+        return product_name in self._by_name
+
+    # Function to look up a product by name; raises KeyError for unknown products
+    def by_name(self, product_name):
+        try:
+            return self.records[self._by_name[product_name]]
+        except KeyError:
+            raise KeyError(f"Product not found in catalogue: {product_name}") from None
+
+    # Function to look up a product by id; raises KeyError for unknown ids
+    def by_id(self, product_id):
+        try:
+            return self.records[self._by_id[str(product_id)]]
+        except KeyError:
+            raise KeyError(f"Product id not found in catalogue: {product_id}") from None
+
+    # Function to find row positions of many product names at once (-1 for unknown names)
+    def positions(self, product_names):
+        return np.fromiter((self._by_name.get(name, -1) for name in product_names), dtype=np.int64,
+                           count=len(product_names))
+
+    # Function to get the typeahead index over product names and ids, built on first use
+    def search_index(self):
+        if self._search_index is None:
+            from product_search import ProductSearchIndex
+            self._search_index = ProductSearchIndex(self.product_ids, self.product_names)
+        return self._search_index
+
+# Function to hash catalogue rows so an unchanged sheet can be detected cheaply
+def rows_hash(values):
+    digest = hashlib.sha1()
+    for row in values:
+        digest.update(json.dumps(row, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+# Catalogue cache with a TTL, a cheap revision check and an on-disk snapshot.
+# A snapshot on disk is served immediately at startup and revalidated in the background;
+# after the TTL the sheet's revision (e.g. Drive modifiedTime) is compared first and the
+# rows are fetched only when it moved. The Catalogue is rebuilt only when the rows changed.
+class CatalogueCache:
+    def __init__(self, fetch_rows, revision_probe=None, snapshot_path=SNAPSHOT_PATH, ttl=DEFAULT_TTL):
+        self.fetch_rows = fetch_rows
+        self.revision_probe = revision_probe
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.catalogue = None
+        self.row_hash = None
+        self.revision = None
+        self.checked_at = 0.0
+        self.loaded_from = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._checking = False
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        with open(self.snapshot_path, "r") as f:
+            snapshot = json.load(f)
+        self.catalogue = Catalogue.from_rows(snapshot['rows'])
+        self.row_hash = snapshot['row_hash']
+        self.revision = snapshot.get('revision')
+        self.loaded_from = "snapshot"
+        return True
+
+    def _save_snapshot(self, values):
+        if not self.snapshot_path:
+            return
+        # Every worker refreshes the same snapshot; each writes its own temporary file
+        atomic_write(self.snapshot_path, json.dumps({'rows': values, 'row_hash': self.row_hash,
+                                                     'revision': self.revision, 'saved_at': time.time()}))
+
+    # Function to fetch the rows and rebuild the catalogue if they changed; returns True when rebuilt
+    def _fetch(self, revision=None):
+        values = self.fetch_rows()
+        new_hash = rows_hash(values)
+        self.revision = revision
+        self.checked_at = time.time()
+        if new_hash == self.row_hash and self.catalogue is not None:
+            return False
+        self.catalogue = Catalogue.from_rows(values)
+        self.row_hash = new_hash
+        self.loaded_from = "sheet"
+        self._save_snapshot(values)
+        return True
+
+    # Function to revalidate against the sheet, skipping the row fetch when the revision is unchanged
+    def check(self):
+        revision = None
+        if self.revision_probe is not None:
+            try:
+                revision = self.revision_probe()
+            except Exception as e:
+                # No cheap revision available (e.g. no Drive access); compare the rows instead
+                print(f"Catalogue revision check failed: {e}")
+            if revision is not None and revision == self.revision and self.catalogue is not None:
+                self.checked_at = time.time()
+                return False
+        return self._fetch(revision)
+
+    def _background_check(self):
+        try:
+            with self._lock:
+                self.check()
+                self.last_error = None
+        except Exception as e:
+            self.last_error = e
+            print(f"Catalogue revalidation failed, serving cached catalogue: {e}")
+        finally:
+            self._checking = False
+
+    # Function to return the current catalogue, revalidating in the background once the TTL has passed
+    def get(self):
+        if self.catalogue is None:
+            with self._lock:
+                if self.catalogue is None and not self._load_snapshot():
+                    self._fetch()
+        if time.time() - self.checked_at >= self.ttl and not self._checking:
+            self._checking = True
+            threading.Thread(target=self._background_check, name="catalogue-check", daemon=True).start()
+        return self.catalogue
+
+    # Function to fetch the catalogue now, ignoring the TTL and revision (manual refresh)
+    def refresh(self):
+        with self._lock:
+            self.revision = None
+            return self.check()
+
+# Function to read the catalogue from the on-disk snapshot without contacting Drive; None if there is none
+def load_snapshot_catalogue(snapshot_path=SNAPSHOT_PATH):
+    cache = CatalogueCache(None, snapshot_path=snapshot_path)
+    return cache.catalogue if cache._load_snapshot() else None
@@ -0,0 +1,70 @@
+# In-memory stand-in for a gspread worksheet, for local development and benchmarks
+# without Google credentials. Only the calls this app makes are implemented.
+import threading
+
+class FakeWorksheet:
+    def __init__(self, title="Invoices", rows=None, fail_times=0):
+        self.title = title
+        self.rows = [list(r) for r in (rows or [])]
+        self.fail_times = fail_times
+        self.calls = []
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def _maybe_fail(self, call):
+        self.calls.append(call)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise ConnectionError(f"fake {call} failure")
+
+    def append_row(self, values, **kwargs):
+        with self._lock:
+            self._maybe_fail("append_row")
+            self.rows.append(list(values))
+            self.revision += 1
+
+    def append_rows(self, values, **kwargs):
+        with self._lock:
+            self._maybe_fail("append_rows")
+            self.rows.extend(list(v) for v in values)
+            self.revision += 1
+
+    def get_all_values(self, **kwargs):
+        with self._lock:
+            self._maybe_fail("get_all_values")
+            return [[str(v) for v in r] for r in self.rows]
+
+    # Supports the "A<row>:<col>" open-ended ranges used for incremental reads
+    def get(self, range_name, **kwargs):
+        with self._lock:
+            self._maybe_fail("get")
+            start, end = range_name.split(":")
+            first_row = int("".join(c for c in start if c.isdigit()))
+            width = 0
+            for c in end:
+                width = width * 26 + (ord(c) - 64)
+            values = []
+            for r in self.rows[first_row - 1:]:
+                r = [str(v) for v in r[:width]]
+                while r and r[-1] == "":
+                    r.pop()
+                values.append(r)
+            return values
+
+    def col_values(self, col, **kwargs):
+        with self._lock:
+            self._maybe_fail("col_values")
+            return [str(r[col - 1]) if len(r) >= col else "" for r in self.rows]
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets=None):
+        self.worksheets = {ws.title: ws for ws in (worksheets or [])}
+
+    def worksheet(self, title):
+        if title not in self.worksheets:
+            self.worksheets[title] = FakeWorksheet(title)
+        return self.worksheets[title]
+
+    # Stands in for the Drive modifiedTime: changes whenever any worksheet is written
+    def get_lastUpdateTime(self):
+        return str(sum(ws.revision for ws in self.worksheets.values()))
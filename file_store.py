@@ -0,0 +1,80 @@
+# Cross-process locking and atomic replacement for the local files that several Streamlit
+# workers (or the CLI next to the app) may write at the same time: company settings, the
+# Excel export, the catalogue snapshot and the uploaded logo.
+# Writers hold an exclusive lock on a sidecar <path>.lock file; contents go to a temporary
+# file in the same directory and are moved into place with os.replace, so a reader sees
+# either the old file or the new one, never a partly written file.
+import os
+import time
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 30.0
+POLL_INTERVAL = 0.05
+REPLACE_RETRIES = 10  # Windows refuses to replace a file another process has open
+
+class LockTimeout(TimeoutError):
+    pass
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+# Function to hold an exclusive lock for path across threads and processes:
+# with file_lock("settings.json"): ...
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    with open(lock_path, "a+") as f:
+        while not _try_lock(f):
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Timed out after {timeout:.0f}s waiting for {lock_path}")
+            time.sleep(POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            _unlock(f)
+
+# Function to replace path with data (str or bytes) in one step
+def atomic_write(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(REPLACE_RETRIES):
+            try:
+                os.replace(tmp_path, path)
+                break
+            except PermissionError:
+                if attempt == REPLACE_RETRIES - 1:
+                    raise
+                time.sleep(POLL_INTERVAL)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
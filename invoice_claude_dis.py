@@ -1,50 +1,66 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 from datetime import datetime
 import os
-import time
 import uuid
-import io
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import base64
-from PIL import Image as PILImage
+import tempfile
+import invoice_ledger
+import invoice_core
+import metrics
+from sheets_writer import SheetsWriter
+from invoice_sync import InvoiceSheetCache
+from invoice_search import InvoiceSearchIndex, paginate
+from catalogue import Catalogue, CatalogueCache
+from pricing import calculate_price, price_lines, from_paise
+from invoice_models import LineItem, Invoice, price_line_items
+from bulk_pdf import render_invoices_zip, select_invoices
+from invoice_reconcile import InvoiceReconciler
+from invoice_numbering import DEFAULT_SERIES
 ################ External EXcel Trial Below
-import json
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-# Define the scope
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-# Load from secrets
-service_account_info = st.secrets["gcp_service_account"]
-creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, scope)
-client = gspread.authorize(creds)
-
-# Connect the spreadsheet file
-spreadsheet = client.open("Inglo_Invoice")  # or open_by_url() or open_by_key()
-# Access a specific worksheet (tab) by name
-invoice_sheet = spreadsheet.worksheet("Invoices")
-catalogue_sheet = spreadsheet.worksheet("Catalogue")
+import sheets_client
+from file_store import atomic_write
+
+# Credentials come from Streamlit secrets; nothing connects until a sheet is first used
+sheets_client.configure(lambda: st.secrets["gcp_service_account"])
+
+# Function to get the cached Invoices worksheet handle
+def get_invoice_sheet():
+    return sheets_client.get_worksheet("Invoices")
+
+# Function to get the cached Catalogue worksheet handle
+def get_catalogue_sheet():
+    return sheets_client.get_worksheet("Catalogue")
 ################ External Excel Trial Above
 
 # Set page configuration
 st.set_page_config(page_title="Invoice Generator", layout="wide")
 
+# Function to get the catalogue's last modified time from Drive (cheap revision check)
+def get_catalogue_revision():
+    return sheets_client.get_spreadsheet().get_lastUpdateTime()
+
+# Function to get the process-wide catalogue cache (TTL, revision check and disk snapshot)
+@st.cache_resource
+def get_catalogue_cache():
+    return CatalogueCache(lambda: get_catalogue_sheet().get_all_values(), get_catalogue_revision)
+
+# Function to get the catalogue from the local product file, read once per version of the file
+# so offline reruns do not parse the workbook again
+@st.cache_resource
+def load_local_catalogue(file_path, modified_at):
+    return Catalogue(pd.read_excel(file_path))
+
 # Function to load product data
-@st.cache_data
+@metrics.timed("load_product_data")
 def load_product_data(file_path="products.xlsx"):
     try:
-        catalogue_data = catalogue_sheet.get_all_values()
-        df = pd.DataFrame(catalogue_data[1:], columns=catalogue_data[0])  # Skip header
-        return df
-    except FileNotFoundError:
+        return get_catalogue_cache().get()
+    except Exception as e:
+        # No snapshot and the Drive sheet is unreachable: use the local product file
+        print(f"Failed to fetch the drive excel file: {e}")
+        if os.path.exists(file_path):
+            return load_local_catalogue(file_path, os.path.getmtime(file_path))
         # Create sample product data if file doesn't exist
-        print("Failed to fetch the drive excel file")
         sample_data = {
             'product_id': [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21],
             'product_name': ['Toilet Cleaner 5L','Handwash 5L','Glass Cleaner 5L','Floor Cleaner 5L','Shampoo 20ml Bottles','Shampoo 30ml Bottles','Shampoo 5L','Shower Gel 20ml Bottles','Shower Gel 30ml Bottles','Shower Gel 5L','Moisturiser 20ml Bottles','Moisturiser 30ml Bottles','Conditioner 20ml Bottles','Conditioner 30ml Bottles','Air Freshener 300ml','Air Freshener 5L','Samples','Liquid Soap Dispensers','Soap 10gms','Soap 15gms','Soap 20gms'],            
@@ -53,726 +69,687 @@ def load_product_data(file_path="products.xlsx"):
             'product_default_discount':[10,50,50,50,25,25,50,25,50,50,50,50,50,50,50,50,50,50,50,50,50]
         }
         df = pd.DataFrame(sample_data)
-        df.to_excel("products.xlsx", index=False)
-        return df
+        df.to_excel(file_path, index=False)
+        return load_local_catalogue(file_path, os.path.getmtime(file_path))
 
-# Function to calculate price based on MRP and discount
-def calculate_price(mrp, discount_percentage):
-    return mrp * (1 - discount_percentage / 100)
+# Function to load invoice data
+@metrics.timed("load_invoice_data")
+def load_invoice_data(db_path=invoice_ledger.LEDGER_PATH):
+    return invoice_ledger.load_invoices(db_path)
 
-# Function to calculate tax amount based on price (already multiplied with quantity) and tax rate
-def calculate_tax(price, tax_rate):
-    return price * (tax_rate / 100)
+# Function to load company settings
+def load_company_settings(file_path=invoice_core.COMPANY_SETTINGS_PATH):
+    return invoice_core.load_company_settings(file_path)
 
-def format_currency(value):
-    try:
-        return f"INR {float(value):.2f}"
-    except:
-        return "N/A"
+# Function to save company settings
+def save_company_settings(settings, file_path=invoice_core.COMPANY_SETTINGS_PATH):
+    return invoice_core.save_company_settings(settings, file_path)
 
-# Function to load invoice data
-def load_invoice_data(file_path="inglo_delhi_invoices.xlsx"):
-    try:
-        return pd.read_excel(file_path)
-    except FileNotFoundError:
-        # Create empty invoice dataframe with appropriate columns
-        df = pd.DataFrame(columns=[
-            'invoice_id', 'date', 'customer_gst','customer_name', 'customer_email', 
-            'customer_phone', 'customer_address', 'products', 'quantities',
-            'mrps', 'discount_percentages', 'prices', 'subtotal', 'tax', 'total'
-        ])
-        df.to_excel("invoices.xlsx", index=False)
-        return df
+# Function to get the series new invoices are numbered in, e.g. INV-2627-000042
+def get_invoice_series():
+    return os.environ.get("INVOICE_SERIES", DEFAULT_SERIES)
 
-# Function to load company settings
-def load_company_settings(file_path="inglo_delhi_company_settings.json"):
-    import json
+# Function to get the process-wide incremental copy of the Invoices sheet
+@st.cache_resource
+def get_invoice_cache():
+    return InvoiceSheetCache()
+
+# Function to get the process-wide customer search index over the Invoices sheet
+@st.cache_resource
+def get_invoice_search_index():
+    return InvoiceSearchIndex()
+
+# Function to get the process-wide background writer for the Invoices sheet
+@st.cache_resource
+def get_sheets_writer():
+    return SheetsWriter(get_invoice_sheet).start()
+
+# Function to get the process-wide reconciler between the local ledger and the Invoices sheet
+@st.cache_resource
+def get_invoice_reconciler():
+    return InvoiceReconciler(get_invoice_sheet, get_invoice_cache(), get_sheets_writer()).start()
+
+# Function to get the invoices for the Previous Invoices tab, falling back to the local ledger
+# when the Drive sheet cannot be reached. Returns the frame and whether it came from the sheet.
+def load_previous_invoices(force=False):
+    invoice_cache = get_invoice_cache()
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        # Default settings
-        default_settings = {
-            "company_gst":"07AAGCI0069N1ZA",
-            "company_name": "Inglo Imex Private Limited",
-            "company_address": "Sector 8 Dwarka, New Delhi 110077",
-            "company_phone": "(+91) 87006-01262",
-            "company_email": "ingloimexsales@gmail.com",
-            "company_website": "www.yourcompany.com",
-            "company_logo_path": None,
-            "invoice_terms": "Payment is due within 30 days of the order date."
-        }
-        with open(file_path, 'w') as f:
-            json.dump(default_settings, f, indent=4)
-        return default_settings
+        return invoice_cache.sync(get_invoice_sheet(), force=force), True
+    except Exception as e:
+        sheets_client.mark_unavailable(e)
+        print(f"Invoices sheet unreachable, serving local copy: {e}")
+        if not invoice_cache.header:
+            local_df = load_invoice_data()
+            return invoice_cache.load_local(local_df.columns, local_df.fillna("").astype(str).values.tolist()), False
+        return invoice_cache.frame(), False
 
-# Function to save company settings
-def save_company_settings(settings, file_path="inglo_delhi_company_settings.json"):
-    import json
-    with open(file_path, 'w') as f:
-        json.dump(settings, f, indent=4)
-    return True
+# Function to get the process-wide cache of rendered PDFs
+@st.cache_resource
+def get_pdf_cache():
+    # ReportLab and PIL load with the first PDF, not at startup
+    from invoice_pdf import PdfCache
+    return PdfCache()
 
-# Function to generate invoice ID
-def generate_invoice_id():
-    # Generate ID based on timestamp + short random string for uniqueness
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    unique_id = str(uuid.uuid4())[:4]
-    return f"INV-{timestamp}-{unique_id}"
+# Function to offer PDF bytes for download without embedding them in the page
+def pdf_download_button(pdf_bytes, filename, key):
+    return st.download_button(
+        "Download Invoice PDF",
+        data=pdf_bytes,
+        file_name=filename,
+        mime="application/pdf",
+        key=key,
+        on_click="ignore"
+    )
 
-# Function to save invoice data
-def save_invoice_old(invoice_data, file_path="inglo_delhi_invoices.xlsx"):
-    existing_invoices = load_invoice_data(file_path)
-    updated_invoices = pd.concat([existing_invoices, pd.DataFrame([invoice_data])], ignore_index=True)
-    updated_invoices.to_excel(file_path, index=False)
+# Function to show span timings in the sidebar; only rendered with ?admin=1 in the URL
+def render_admin_panel():
+    with st.sidebar.expander("⏱️ Timings", expanded=True):
+        enabled = st.toggle("Record timings", value=metrics.is_enabled(), key="admin_metrics_enabled")
+        if enabled != metrics.is_enabled():
+            metrics.enable() if enabled else metrics.disable()
+        timings = metrics.summary()
+        if timings:
+            st.dataframe(pd.DataFrame(timings), hide_index=True)
+        else:
+            st.caption("No spans recorded yet.")
+        st.download_button("Prometheus metrics", data=metrics.prometheus_text(), file_name="invoice_metrics.prom",
+                           mime="text/plain", key="admin_metrics_prometheus", on_click="ignore")
+        trace_path = metrics.trace_path()
+        if trace_path and os.path.exists(trace_path):
+            with open(trace_path, "rb") as f:
+                st.download_button("JSONL trace", data=f.read(), file_name=os.path.basename(trace_path),
+                                   mime="application/x-ndjson", key="admin_metrics_trace", on_click="ignore")
+        if st.button("Reset timings", key="admin_metrics_reset"):
+            metrics.reset()
+            st.rerun()
+
+# Function to save invoice data (rewriting the shared workbook lost invoices when two workers saved at once)
+def save_invoice_old(invoice_data, db_path=invoice_ledger.LEDGER_PATH):
+    invoice_ledger.append_invoice(invoice_data, db_path)
     return True
 
 # Function to save invoice data
-def save_invoice(invoice_data, file_path="inglo_delhi_invoices.xlsx"):
+@metrics.timed("save_invoice")
+def save_invoice(invoice, db_path=invoice_ledger.LEDGER_PATH):
     try:
-        invoice_row = [
-        invoice_data["invoice_id"],
-        invoice_data["date"],
-        invoice_data["customer_gst"],
-        invoice_data["customer_name"],
-        invoice_data["customer_email"],
-        invoice_data["customer_phone"],
-        invoice_data["customer_address"],
-        invoice_data["products"],
-        invoice_data["quantities"],
-        invoice_data["mrps"],
-        invoice_data["discount_percentages"],
-        invoice_data["prices"],
-        invoice_data["subtotal"],
-        invoice_data["tax"],
-        invoice_data["total"]]
-        invoice_sheet.append_row(invoice_row)
-        # invoice_sheet.append_row(invoice_data)
-        st.write("Inserted Row in the Drive Sheet")
-        existing_invoices = load_invoice_data(file_path)
-        updated_invoices = pd.concat([existing_invoices, pd.DataFrame([invoice_data])], ignore_index=True)
-        updated_invoices.to_excel(file_path, index=False)
+        # Number the invoice as it is stored, then queue the row for the background batch writer
+        invoice_core.save_invoice(invoice, get_sheets_writer(), db_path, get_invoice_series())
+        st.write("Queued Row for the Drive Sheet")
     except Exception as e:
         print("Exception occurred:")
         st.write(e)
         # traceback.print_exc()
         st.write("Unable to proceed with appending records")
+        return False
     return True
 
-# Function to create PDF invoice
-def create_pdf_invoice(invoice_data, selected_products, company_settings):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=A4,
-        rightMargin=72, 
-        leftMargin=72,
-        topMargin=72, 
-        bottomMargin=72
-    )
+# Function to show the invoice that was just generated, with its PDF download
+def show_generated_invoice(invoice):
+    st.success(f"Invoice {invoice.invoice_id} generated successfully!")
+    st.header(f"Invoice #{invoice.invoice_id}")
+    st.subheader("Invoice Details")
     
-    styles = getSampleStyleSheet()
-    elements = []
+    # Show invoice details in a clean format
+    invoice_col1, invoice_col2 = st.columns(2)
     
-    # Create custom styles
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Heading1'],
-        fontSize=16,
-        alignment=1,  # Center alignment
-        spaceAfter=12
-    )
+    with invoice_col1:
+        st.markdown("**Bill To:**")
+        st.markdown(f"{invoice.customer_gst}")
+        st.markdown(f"{invoice.customer_name}")
+        st.markdown(f"{invoice.customer_email}")
+        st.markdown(f"{invoice.customer_phone}")
+        st.markdown(f"{invoice.customer_address}")
     
-    heading_style = ParagraphStyle(
-        'Heading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=6
-    )
+    with invoice_col2:
+        st.markdown(f"**Invoice ID:** {invoice.invoice_id}")
+        st.markdown(f"**Date:** {invoice.date[:10]}")
+        st.markdown(f"**Total Due:** ₹{invoice.total:.2f}")
+    
+    # Generate and offer the PDF for download
+    pdf_bytes = get_pdf_cache().get_or_render(invoice, load_company_settings())
+    pdf_filename = f"Invoice_{invoice.invoice_id}.pdf"
+    pdf_download_button(pdf_bytes, pdf_filename, key="download_new_invoice")
+
+# Each section below is a fragment: interacting with a widget inside it reruns only that
+# section, not the whole script. Every run is timed as a render.<section> span, so the
+# per-click cost can be compared with render.app (a full script run) in the admin panel.
+
+LINE_GRID_COLUMNS = ['product', 'quantity', 'discount_percentage', 'mrp', 'price', 'tax_rate', 'amount']
+
+# Function to get the widget key of the line-item grid. It changes after every applied batch
+# of edits, so the grid starts again from the repriced lines instead of replaying old edits.
+def line_grid_key():
+    return f"line_grid_{st.session_state.line_grid_version}"
+
+# Function to build the line-item grid contents
+def line_grid_frame(line_items):
+    return pd.DataFrame({
+        'product': [item.product_name for item in line_items],
+        'quantity': [item.quantity for item in line_items],
+        'discount_percentage': [item.discount_percentage for item in line_items],
+        'mrp': [item.mrp for item in line_items],
+        'price': [item.price for item in line_items],
+        'tax_rate': [item.tax_rate for item in line_items],
+        'amount': [item.amount for item in line_items],
+    }, columns=LINE_GRID_COLUMNS)
+
+def _line_entry(item):
+    return {'product': item.product_name, 'quantity': item.quantity, 'discount_percentage': item.discount_percentage}
+
+# Function to replace the invoice lines, pricing all of them in one pass; lines that
+# cannot be priced are dropped and reported on the next render
+def set_selected_products(items):
+    line_items, failures = invoice_core.price_items(items, load_product_data())
+    st.session_state.selected_products = line_items
+    st.session_state.line_errors = [f"{item.get('product') or 'Blank product'}: {error}" for item, error in failures]
+    st.session_state.line_grid_version += 1
+
+# Function to apply one batch of grid edits (changed cells, added rows, deleted rows)
+def apply_line_grid_edits():
+    changes = st.session_state[line_grid_key()]
+    items = [_line_entry(item) for item in st.session_state.selected_products]
+    for row, edits in changes['edited_rows'].items():
+        # A cleared cell keeps its old value
+        items[int(row)].update({column: value for column, value in edits.items() if value is not None})
+    deleted = set(changes['deleted_rows'])
+    items = [item for i, item in enumerate(items) if i not in deleted]
+    for row in changes['added_rows']:
+        values = {column: value for column, value in row.items() if value is not None and value != ""}
+        if values:
+            items.append({'quantity': 1, **values})
+    set_selected_products(items)
+
+# Function to set the quantity and/or discount of every line at once
+def apply_bulk_line_edit():
+    items = [_line_entry(item) for item in st.session_state.selected_products]
+    for item in items:
+        if st.session_state.bulk_quantity is not None:
+            item['quantity'] = st.session_state.bulk_quantity
+        if st.session_state.bulk_discount is not None:
+            item['discount_percentage'] = st.session_state.bulk_discount
+    set_selected_products(items)
+
+# Function to add the lines of a pasted product list (e.g. SKU and quantity columns copied from a spreadsheet)
+def add_pasted_lines():
+    pasted = invoice_core.read_line_list(st.session_state.pasted_lines)
+    set_selected_products([_line_entry(item) for item in st.session_state.selected_products] + pasted)
+    st.session_state.pasted_lines = ""
+    st.session_state.generated_invoice = None
+
+# Fragment with the selected products, the invoice summary and the Generate button.
+# The lines are one editable grid, so a large order is a single widget and each batch of
+# edits is repriced once. Generating an invoice reruns the whole app so the invoice
+# history and analytics pick it up.
+@st.fragment
+@metrics.timed("render.selected_products")
+def selected_products_list():
+    for error in st.session_state.line_errors:
+        st.warning(f"Skipped {error}")
+    st.session_state.line_errors = []
     
-    normal_style = styles["Normal"]
-    normal_right = ParagraphStyle(
-        'NormalRight', 
-        parent=normal_style,
-        alignment=2  # Right alignment
+    if not st.session_state.selected_products:
+        if st.session_state.generated_invoice is not None:
+            show_generated_invoice(st.session_state.generated_invoice)
+        else:
+            st.info("No products added to invoice yet. Please add products above.")
+        return
+    
+    st.header("Selected Products")
+    st.caption("Edit quantities and discounts in place, paste product names or ids with quantities into new rows, "
+               "and select rows to delete them.")
+    st.data_editor(
+        line_grid_frame(st.session_state.selected_products),
+        key=line_grid_key(),
+        on_change=apply_line_grid_edits,
+        num_rows="dynamic",
+        hide_index=True,
+        disabled=['mrp', 'price', 'tax_rate', 'amount'],
+        column_config={
+            'product': st.column_config.TextColumn("Product", help="Product name or id", width="large"),
+            'quantity': st.column_config.NumberColumn("Quantity", min_value=1, step=1, format="%d"),
+            'discount_percentage': st.column_config.NumberColumn("Discount %", min_value=0.0, max_value=100.0,
+                                                                 step=0.1, format="%.1f"),
+            'mrp': st.column_config.NumberColumn("MRP", format="₹%.2f"),
+            'price': st.column_config.NumberColumn("Price", format="₹%.2f"),
+            'tax_rate': st.column_config.NumberColumn("Tax %", format="%.1f"),
+            'amount': st.column_config.NumberColumn("Amount", format="₹%.2f"),
+        },
     )
     
-    # Create company header table with logo if available
-    header_data = []
-    company_info = [
-        [Paragraph(f"<b>{company_settings['company_gst']}</b>", normal_style)],
-        [Paragraph(f"<b>{company_settings['company_name']}</b>", normal_style)],
-        [Paragraph(company_settings['company_address'].replace('\n', '<br/>'), normal_style)],
-        [Paragraph(f"Phone: {company_settings['company_phone']}", normal_style)],
-        [Paragraph(f"Email: {company_settings['company_email']}", normal_style)],
-        [Paragraph(f"Website: {company_settings['company_website']}", normal_style)]
-    ]
+    with st.expander("Bulk Edit"):
+        bulk_col1, bulk_col2 = st.columns(2)
+        with bulk_col1:
+            st.number_input("Set Quantity", min_value=1, value=None, step=1, key="bulk_quantity")
+        with bulk_col2:
+            st.number_input("Set Discount %", min_value=0.0, max_value=100.0, value=None, step=0.1, key="bulk_discount")
+        st.button("Apply to All Lines", key="bulk_apply", on_click=apply_bulk_line_edit)
     
-    if company_settings['company_logo_path'] and os.path.exists(company_settings['company_logo_path']):
-        # Add logo
-        logo = Image(company_settings['company_logo_path'], width=2*inch, height=1*inch)
-        header_data = [
-            [logo, Table(company_info, colWidths=[3*inch])]
-        ]
-    else:
-        header_data = [
-            [Table(company_info, colWidths=[5*inch])]
-        ]
-    
-    header_table = Table(header_data, colWidths=[2*inch, 3*inch])
-    header_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
-    elements.append(header_table)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add invoice title
-    elements.append(Paragraph("INVOICE", title_style))
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Add invoice details in a table
-    invoice_info_data = [
-        ["Invoice #:", invoice_data['invoice_id']],
-        ["Date:", invoice_data['date']],
-        ["Due Date:", (datetime.strptime(invoice_data['date'].split()[0], "%Y-%m-%d") + 
-                      pd.Timedelta(days=30)).strftime("%Y-%m-%d")]
-    ]
-    
-    invoice_info_table = Table(invoice_info_data, colWidths=[1.5*inch, 4*inch])
-    invoice_info_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(invoice_info_table)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Billing and customer info in a side by side table
-    billing_data = [
-        [Paragraph("<b>Billed To:</b>", normal_style), ""],
-        [invoice_data['customer_gst'], ""],
-        [invoice_data['customer_name'], ""],
-        [invoice_data['customer_email'], ""],
-        [invoice_data['customer_phone'], ""],
-        [invoice_data['customer_address'], ""]
-    ]
-    
-    billing_table = Table(billing_data, colWidths=[3*inch, 2.5*inch])
-    billing_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-    ]))
-    elements.append(billing_table)
-    elements.append(Spacer(1, 0.25*inch))
-    
-    # Items table - Updated to include MRP and Discount columns
-    items_data = [["Item", "MRP", "Discount %", "Price", "Quantity", "Tax", "Amount"]]
-    
-    for item in selected_products:
-        items_data.append([
-            item['product_name'],
-            f"INR {item['mrp']:.2f}",
-            f"{item['discount_percentage']:.1f}%",
-            f"INR {item['price']:.2f}",
-            str(item['quantity']),
-            f"INR {item['tax_amount']:.2f}",
-            f"INR {item['amount']:.2f}"
-        ])
-    
-    # Add totals row
-    items_data.append(["", "", "", "", "", "Subtotal:", format_currency(invoice_data['subtotal'])])
-    items_data.append(["", "", "", "", "", "Tax Total:", format_currency(invoice_data['tax'])])
-    items_data.append(["", "", "", "", "", "Total:", format_currency(invoice_data['total']) ])
-    
-    items_table = Table(items_data, colWidths=[1.8*inch, 0.9*inch, 0.8*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.9*inch])
-    items_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -4), colors.beige),
-        ('BACKGROUND', (5, -3), (-1, -1), colors.beige),
-        ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -4), 1, colors.black),
-        ('LINEABOVE', (5, -3), (-1, -3), 1, colors.black),
-        ('LINEABOVE', (5, -1), (-1, -1), 1, colors.black),
-        ('LINEBELOW', (5, -1), (-1, -1), 1, colors.black),
-        ('FONTNAME', (5, -1), (5, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (6, -1), (6, -1), 'Helvetica-Bold'),
-    ]))
-    elements.append(items_table)
-    
-    # Add footer with terms and conditions
-    elements.append(Spacer(1, 0.5*inch))
-    elements.append(Paragraph("<b>Terms & Conditions</b>", normal_style))
-    elements.append(Paragraph(company_settings['invoice_terms'], normal_style))
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
-
-# Function to create download link for PDF
-def get_pdf_download_link(pdf_bytes, filename):
-    b64 = base64.b64encode(pdf_bytes.read()).decode()
-    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}">Download Invoice PDF</a>'
+    # Calculate totals
+    _, totals = price_line_items(st.session_state.selected_products)
+    subtotal = totals['subtotal']
+    tax_total = totals['tax']
+    total = totals['total']
+    
+    # Customer details come from the sidebar inputs
+    customer = {field: st.session_state.get(field, "") for field in invoice_core.CUSTOMER_FIELDS}
+    
+    # Display summary
+    st.header("Invoice Summary")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write("**Invoice Date:**", datetime.now().strftime("%Y-%m-%d"))
+        st.write("**Customer Name:**", customer['customer_name'] if customer['customer_name'] else "Not specified")
+        st.write("**Customer Email:**", customer['customer_email'] if customer['customer_email'] else "Not specified")
+    
+    with col2:
+        st.write("**Subtotal:**", f"₹{subtotal:.2f}")
+        st.write("**Tax:**", f"₹{tax_total:.2f}")
+        st.write("**Total Amount:**", f"₹{total:.2f}")
+    
+    # Generate invoice button
+    if st.button("Generate Invoice", type="primary"):
+        if not customer['customer_name']:
+            st.error("Please enter customer name")
+        else:
+            invoice_date = datetime.now()
+            
+            # Prepare invoice data; the ledger assigns the invoice ID when it is saved
+            invoice = Invoice(
+                invoice_id=None,
+                date=invoice_date.strftime("%Y-%m-%d %H:%M:%S"),
+                subtotal=subtotal,
+                tax=tax_total,
+                total=total,
+                line_items=st.session_state.selected_products,
+                **customer
+            )
+            
+            # Save invoice data
+            if save_invoice(invoice):
+                # Store current invoice in session state (it owns the line list from here on)
+                st.session_state.current_invoice = invoice
+                st.session_state.generated_invoice = invoice
+                
+                # Reset the form
+                st.session_state.selected_products = []
+                st.rerun()
 
-def main():
-    st.title("💼 Invoice Generator")
+# Fragment with the add-product form; the selected products list is nested inside it so
+# adding a line redraws the list in the same fragment run
+@st.fragment
+@metrics.timed("render.product_form")
+def product_form():
+    catalogue = load_product_data()
     
-    # Load company settings
-    company_settings = load_company_settings()
+    # Paste many lines at once, e.g. SKU and quantity columns copied from a spreadsheet
+    with st.expander("Paste Product List"):
+        st.text_area("One product per line: name or id, quantity, discount % (optional)", key="pasted_lines",
+                     placeholder="Soap 10gms\t200\n17, 50, 25")
+        st.button("Add Pasted Lines", key="add_pasted_lines", on_click=add_pasted_lines)
     
-    # Add a tab control for main app and settings
-    tab1, tab2, tab3 = st.tabs(["📝 Invoice Generator", "🕐 Previous Invoices","⚙️ Company Settings"])
+    # Search the catalogue here so the picker only gets the top matches, not every product.
+    # The query commits after a short typing pause and only this fragment reruns.
+    product_query = st.text_input("Search Products", key="product_search", type="search", live="200ms",
+                                  placeholder="Product name or id, e.g. shampoo 20")
+    product_options = catalogue.search_index().search_names(product_query)
+    if not product_options:
+        st.info(f"No products match '{product_query}'.")
+        selected_products_list()
+        return
     
-    with tab1:
-        # Load product data
-        product_df = load_product_data()
+    # Add new product row
+    with st.form(key="add_product_form"):
+        col1, col2, col3, col4, col5, col6 = st.columns([2.5, 0.8, 0.8, 0.8, 0.8, 1])
         
-        # Sidebar for customer information
-        st.sidebar.header("Customer Information")
-        customer_gst = st.sidebar.text_input("Customer GST")
-        customer_name = st.sidebar.text_input("Customer Name")
-        customer_email = st.sidebar.text_input("Customer Email")
-        customer_phone = st.sidebar.text_input("Customer Phone")
-        customer_address = st.sidebar.text_area("Customer Address")
+        with col1:
+            product = st.selectbox("Select Product", product_options)
         
-        # Product selection section
-        st.header("Select Products")
+        # Get product details
+        product_info = catalogue.by_name(product)
+        
+        with col2:
+            mrp = st.number_input("MRP", value=product_info.product_mrp, disabled=True, key="mrp_display")
+        
+        with col3:
+            discount_percentage = st.number_input("Discount", 
+                                                value=product_info.product_default_discount, 
+                                                min_value=0.0, 
+                                                max_value=100.0, 
+                                                step=0.1,
+                                                help="Enter discount percentage (without % sign)")
         
-        # Create columns for product selection interface
-        # col1, col2, col3, col4, col5, col6 = st.columns([2.5, 0.8, 0.8, 0.8, 0.8, 1])
+        # Calculate price based on MRP and discount
+        calculated_price = calculate_price(mrp, discount_percentage)
         
-        # with col1:
-        #     st.subheader("Product")
-        # with col2:
-        #     st.subheader("MRP")
-        # with col3:
-        #     st.subheader("Discount %")
-        # with col4:
-        #     st.subheader("Price")
-        # with col5:
-        #     st.subheader("Quantity")
-        # with col6:
-        #     st.subheader("Amount")
+        with col4:
+            # st.text(f"₹{calculated_price:.2f}")
+            st.text_input("Price",value=f"₹{calculated_price:.2f}", disabled=True, key="calculatedPrice")
         
-        # Initialize session state for selected products if not exists
-        if 'selected_products' not in st.session_state:
-            st.session_state.selected_products = []
+        with col5:
+            quantity = st.number_input("Quantity", min_value=1, value=1)
         
-        # Initialize session state for current invoice
-        if 'current_invoice' not in st.session_state:
-            st.session_state.current_invoice = None
+        with col6:
+            # Price the line in paise so it matches the invoice totals exactly
+            line = price_lines([mrp], [discount_percentage], [quantity], [product_info.product_tax_rate])
+            amount = float(from_paise(line['amount'])[0])
+            # st.text(f"₹{amount:.2f}")
+            st.text_input("Amount",value=f"₹{amount:.2f}", disabled=True, key="calculatedAmount")
+        
+        add_product_submitted = st.form_submit_button("Add Product")
+        
+        if add_product_submitted:
+            # Add product to session state
+            tax_rate = product_info.product_tax_rate
+            calculate_tax_amount = float(from_paise(line['tax_amount'])[0])
+            st.session_state.selected_products.append(LineItem(
+                product_id=product_info.product_id,
+                product_name=product,
+                mrp=mrp,
+                discount_percentage=discount_percentage,
+                price=calculated_price,
+                quantity=quantity,
+                tax_rate=tax_rate,
+                tax_amount=calculate_tax_amount,
+                amount=amount
+            ))
+            st.session_state.line_grid_version += 1
+            st.session_state.generated_invoice = None
+            st.success(f"Added {quantity} x {product} at ₹{calculated_price:.2f} each ({discount_percentage}% discount)")
+    
+    # Show selected products (rendered after the form, so a new line shows up without another rerun)
+    selected_products_list()
+
+# Fragment with the invoice history from the local ledger (Invoice Generator tab)
+@st.fragment
+@metrics.timed("render.invoice_history")
+def invoice_history():
+    # View previous invoices section
+    st.header("Previous Invoices")
+    invoice_df = load_invoice_data()
+    
+    if not invoice_df.empty:
+        st.dataframe(invoice_df[['invoice_id', 'date', 'customer_name', 'total']])
         
-        # Add new product row
-        with st.form(key="add_product_form"):
-            col1, col2, col3, col4, col5, col6 = st.columns([2.5, 0.8, 0.8, 0.8, 0.8, 1])
+        # Excel is exported on demand as a snapshot of the ledger
+        if st.button("Prepare Excel Export"):
+            st.download_button(
+                "Download Invoices (Excel)",
+                data=invoice_ledger.excel_snapshot_bytes(),
+                file_name="inglo_delhi_invoices.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        
+        # Provide option to regenerate PDF for previous invoices
+        st.subheader("Download Previous Invoice")
+        selected_invoice_id = st.selectbox("Select Invoice ID", invoice_df['invoice_id'].tolist())
+        
+        if st.button("Generate PDF"):
+            # Get the invoice data
+            selected_invoice = invoice_df[invoice_df['invoice_id'] == selected_invoice_id].iloc[0]
+            invoice = Invoice.from_record(selected_invoice, load_product_data())
             
+            # Create PDF (reused from the cache when this invoice was rendered before)
+            pdf_bytes = get_pdf_cache().get_or_render(invoice, load_company_settings())
+            pdf_filename = f"Invoice_{selected_invoice_id}.pdf"
+            pdf_download_button(pdf_bytes, pdf_filename, key="download_previous_invoice")
+    else:
+        st.info("No previous invoices found.")
+
+# Fragment with the Previous Invoices tab: filter keystrokes, paging and exports rerun only this tab
+@st.fragment
+@metrics.timed("render.previous_invoices")
+def previous_invoices_browser():
+    st.write('Previous Invoices Here')
+    # Only rows appended since the last sync are fetched; keystrokes reuse the cached frame
+    refresh_invoices = st.button("Refresh", key="refresh_previous_invoices")
+    if refresh_invoices:
+        get_invoice_reconciler().trigger()
+    invoice_df, sheet_online = load_previous_invoices(force=refresh_invoices)
+    if not sheet_online:
+        st.warning("Drive sheet unreachable - showing the local copy. New invoices are saved locally and synced when it is back.")
+    conflicts = invoice_ledger.load_conflicts()
+    if not conflicts.empty:
+        with st.expander(f"⚠️ {len(conflicts)} invoice(s) differ between this app and the Drive sheet"):
+            st.dataframe(conflicts, hide_index=True)
+    # st.dataframe(invoice_df)
+    # invoice_df = pd.DataFrame(prev_invoices_data[1:], columns=prev_invoices_data[0])  # Skip header
+    # invoice_df = load_invoice_data()
+    if invoice_df.empty:
+        st.info("No invoices found.")
+    else:
+        # Ensure required columns are present
+        expected_cols = ['invoice_id', 'customer_name', 'customer_email', 'customer_phone', 'customer_gst']
+        missing = [col for col in expected_cols if col not in invoice_df.columns]
+        if missing:
+            st.error(f"Missing columns in invoice data: {', '.join(missing)}")
+        else:
+            # Filter inputs
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                product = st.selectbox("Select Product", product_df['product_name'].tolist())
-            
-            # Get product details
-            product_info = product_df[product_df['product_name'] == product].iloc[0]
-            
+                gst_filter = st.text_input("GST Number", key="filter_gst")
             with col2:
-                mrp = st.number_input("MRP", value=float(product_info['product_mrp']), disabled=True, key="mrp_display")
-            
+                name_filter = st.text_input("Customer Name", key="filter_name")
             with col3:
-                discount_percentage = st.number_input("Discount", 
-                                                    value=float(product_info['product_default_discount']), 
-                                                    min_value=0.0, 
-                                                    max_value=100.0, 
-                                                    step=0.1,
-                                                    help="Enter discount percentage (without % sign)")
-            
-            # Calculate price based on MRP and discount
-            calculated_price = calculate_price(mrp, discount_percentage)
-            
+                phone_filter = st.text_input("Phone Number", key="filter_phone")
             with col4:
-                # st.text(f"₹{calculated_price:.2f}")
-                st.text_input("Price",value=f"₹{calculated_price:.2f}", disabled=True, key="calculatedPrice")
-            
-            with col5:
-                quantity = st.number_input("Quantity", min_value=1, value=1)
-            
-            with col6:
-                amount = calculated_price * quantity
-                # st.text(f"₹{amount:.2f}")
-                st.text_input("Amount",value=f"₹{amount:.2f}", disabled=True, key="calculatedAmount")
+                email_filter = st.text_input("Email", key="filter_email")
             
-            add_product_submitted = st.form_submit_button("Add Product")
-            
-            if add_product_submitted:
-                # Add product to session state
-                tax_rate = float(product_info['product_tax_rate'])
-                calculate_tax_amount = calculate_tax(calculated_price * quantity, tax_rate)
-                st.session_state.selected_products.append({
-                    'product_id': product_info['product_id'],
-                    'product_name': product,
-                    'mrp': mrp,
-                    'discount_percentage': discount_percentage,
-                    'price': calculated_price,
-                    'quantity': quantity,
-                    'tax_rate': tax_rate,
-                    'tax_amount': calculate_tax_amount,
-                    'amount': calculated_price * quantity
+            # Look up matching rows in the search index instead of scanning every column.
+            # The frame is taken again with the ids so both describe the same rows.
+            with metrics.span("tab2.filter"):
+                invoice_df, matching_ids = get_invoice_cache().search(get_invoice_search_index(), {
+                    'customer_gst': gst_filter,
+                    'customer_name': name_filter,
+                    'customer_phone': phone_filter,
+                    'customer_email': email_filter
                 })
-                st.success(f"Added {quantity} x {product} at ₹{calculated_price:.2f} each ({discount_percentage}% discount)")
-                # Force a rerun to update the product list display
-                st.rerun()
-        
-        # Show selected products
-        if st.session_state.selected_products:
-            st.header("Selected Products")
-            # Create columns for product selection interface
-            col1, col2, col3, col4, col5, col6 = st.columns([2.5, 0.8, 0.8, 0.8, 0.8, 1])
-            with col1:
-                st.subheader("Product")
-            with col2:
-                st.subheader("MRP")
-            with col3:
-                st.subheader("Discount %")
-            with col4:
-                st.subheader("Price")
-            with col5:
-                st.subheader("Quantity")
-            with col6:
-                st.subheader("Amount")
-            
-            for i, item in enumerate(st.session_state.selected_products):
-                cols = st.columns([2.5, 0.8, 0.8, 0.8, 0.8, 1, 0.5])
-                cols[0].text(item['product_name'])
-                cols[1].text(f"₹{item['mrp']:.2f}")
-                cols[2].text(f"{item['discount_percentage']:.1f}%")
-                cols[3].text(f"₹{item['price']:.2f}")
-                cols[4].text(f"{item['quantity']}")
-                cols[5].text(f"₹{item['amount']:.2f}")
+                match_count = len(invoice_df) if matching_ids is None else len(matching_ids)
                 
-                # Remove button for each product
-                if cols[6].button("✕", key=f"remove_{i}"):
-                    st.session_state.selected_products.pop(i)
-                    st.rerun()
-            
-            # Calculate totals
-            subtotal = sum(item['amount'] for item in st.session_state.selected_products)
-            tax_total = sum(item['tax_amount'] for item in st.session_state.selected_products)
-            total = subtotal + tax_total
-            
-            # Display summary
-            st.header("Invoice Summary")
-            col1, col2 = st.columns(2)
+                page_size = 50
+                page = st.number_input("Page", min_value=1, value=1, step=1, key="filter_page")
+                if matching_ids is None:
+                    page_count = max(1, -(-match_count // page_size))
+                    page = min(page, page_count)
+                    filtered_df = invoice_df.iloc[(page - 1) * page_size:page * page_size]
+                else:
+                    page_ids, page_count = paginate(matching_ids, page, page_size)
+                    filtered_df = invoice_df.iloc[page_ids]
             
-            with col1:
-                st.write("**Invoice Date:**", datetime.now().strftime("%Y-%m-%d"))
-                st.write("**Customer Name:**", customer_name if customer_name else "Not specified")
-                st.write("**Customer Email:**", customer_email if customer_email else "Not specified")
+            st.write(f"🔍 Showing {len(filtered_df)} of {match_count} matching invoices ({len(invoice_df)} total), page {min(page, page_count)} of {page_count}")
+            st.dataframe(filtered_df)
             
-            with col2:
-                st.write("**Subtotal:**", f"₹{subtotal:.2f}")
-                st.write("**Tax:**", f"₹{tax_total:.2f}")
-                st.write("**Total Amount:**", f"₹{total:.2f}")
-            
-            # Generate invoice button
-            if st.button("Generate Invoice", type="primary"):
-                if not customer_name:
-                    st.error("Please enter customer name")
-                else:
-                    # Generate invoice ID
-                    invoice_id = generate_invoice_id()
-                    
-                    # Prepare invoice data
-                    invoice_data = {
-                        'invoice_id': invoice_id,
-                        'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'customer_gst': customer_gst,
-                        'customer_name': customer_name,
-                        'customer_email': customer_email,
-                        'customer_phone': customer_phone,
-                        'customer_address': customer_address,
-                        'products': str([item['product_name'] for item in st.session_state.selected_products]),
-                        'quantities': str([item['quantity'] for item in st.session_state.selected_products]),
-                        'mrps': str([item['mrp'] for item in st.session_state.selected_products]),
-                        'discount_percentages': str([item['discount_percentage'] for item in st.session_state.selected_products]),
-                        'prices': str([item['price'] for item in st.session_state.selected_products]),
-                        'subtotal': subtotal,
-                        'tax': tax_total,
-                        'total': total
-                    }
-                    
-                    # Save invoice data
-                    if save_invoice(invoice_data):
-                        st.success(f"Invoice {invoice_id} generated successfully!")
-                        
-                        # Store current invoice in session state
-                        st.session_state.current_invoice = {
-                            'invoice_data': invoice_data,
-                            'selected_products': st.session_state.selected_products.copy()
-                        }
-                        
-                        # Display invoice
-                        st.header(f"Invoice #{invoice_id}")
-                        st.subheader("Invoice Details")
-                        
-                        # Show invoice details in a clean format
-                        invoice_col1, invoice_col2 = st.columns(2)
-                        
-                        with invoice_col1:
-                            st.markdown("**Bill To:**")
-                            st.markdown(f"{customer_gst}")
-                            st.markdown(f"{customer_name}")
-                            st.markdown(f"{customer_email}")
-                            st.markdown(f"{customer_phone}")
-                            st.markdown(f"{customer_address}")
-                        
-                        with invoice_col2:
-                            st.markdown(f"**Invoice ID:** {invoice_id}")
-                            st.markdown(f"**Date:** {datetime.now().strftime('%Y-%m-%d')}")
-                            st.markdown(f"**Total Due:** ₹{total:.2f}")
-                        
-                        # Generate and display PDF download link
-                        pdf_buffer = create_pdf_invoice(invoice_data, st.session_state.selected_products, company_settings)
-                        pdf_filename = f"Invoice_{invoice_id}.pdf"
-                        st.markdown(get_pdf_download_link(pdf_buffer, pdf_filename), unsafe_allow_html=True)
-                        
-                        # Reset the form
-                        st.session_state.selected_products = []
-        else:
-            st.info("No products added to invoice yet. Please add products above.")
+            # Render every matching invoice (optionally limited to a date range) into one ZIP
+            with st.expander("Bulk PDF Export"):
+                use_date_range = st.checkbox("Limit to date range", key="bulk_use_dates")
+                bulk_col1, bulk_col2 = st.columns(2)
+                with bulk_col1:
+                    bulk_start = st.date_input("From", key="bulk_start", disabled=not use_date_range)
+                with bulk_col2:
+                    bulk_end = st.date_input("To", key="bulk_end", disabled=not use_date_range)
+                if st.button("Render PDFs to ZIP", key="bulk_render"):
+                    bulk_df = invoice_df if matching_ids is None else invoice_df.iloc[matching_ids]
+                    if use_date_range:
+                        bulk_df = select_invoices(bulk_df, bulk_start, bulk_end)
+                    if bulk_df.empty:
+                        st.info("No invoices match the current filters.")
+                    else:
+                        progress_bar = st.progress(0.0)
+                        def report_progress(done, total, elapsed):
+                            rate = done / elapsed if elapsed else 0.0
+                            progress_bar.progress(done / total, text=f"{done}/{total} invoices, {rate:.1f} PDFs/s")
+                        zip_path = os.path.join(tempfile.gettempdir(), f"invoices_{uuid.uuid4().hex}.zip")
+                        stats = render_invoices_zip(bulk_df, load_product_data(), load_company_settings(), zip_path, progress=report_progress)
+                        st.success(f"Rendered {stats['rendered']} of {stats['requested']} invoices in {stats['seconds']:.1f}s ({stats['pdfs_per_second']:.1f} PDFs/s)")
+                        for failed_id, error in stats['failures']:
+                            st.warning(f"{failed_id}: {error}")
+                        with open(zip_path, "rb") as zip_file:
+                            st.download_button("Download ZIP", zip_file, file_name="invoices.zip", mime="application/zip")
+                        os.remove(zip_path)
+    invoice_id_gen = st.text_input("Invoice ID", key="generate_invoice_id")
+    if st.button("Generate PDF", key="regenerate_older_invoices"):
+        # Get the invoice data
+        selected_invoice = invoice_df[invoice_df['invoice_id'] == invoice_id_gen].iloc[0]
         
-        # View previous invoices section
-        st.header("Previous Invoices")
-        invoice_df = load_invoice_data()
+        invoice = Invoice.from_record(selected_invoice, load_product_data())
+        # Create PDF
+        # st.write(selected_invoice)
+        # st.write(invoice)
+        # st.write(company_settings)
+        pdf_bytes = get_pdf_cache().get_or_render(invoice, load_company_settings())
+        pdf_filename = f"Invoice_{invoice_id_gen}.pdf"
+        pdf_download_button(pdf_bytes, pdf_filename, key="download_regenerated_invoice")
+
+# Fragment with the Analytics tab
+@st.fragment
+@metrics.timed("render.analytics")
+def analytics_view():
+    st.header("Sales Analytics")
+    # Read from rollups maintained by save_invoice, so this does not scan the ledger
+    month_rollup = invoice_ledger.load_rollup('month')
+    if month_rollup.empty:
+        st.info("No invoices found.")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Revenue", f"₹{month_rollup['revenue'].sum():,.2f}")
+        col2.metric("Tax", f"₹{month_rollup['tax'].sum():,.2f}")
+        col3.metric("Quantity", f"{month_rollup['quantity'].sum():,.0f}")
+        col4.metric("Invoices", f"{month_rollup['invoices'].sum():,}")
         
-        if not invoice_df.empty:
-            invoice_table = st.dataframe(invoice_df[['invoice_id', 'date', 'customer_name', 'total']])
-            
-            # Provide option to regenerate PDF for previous invoices
-            st.subheader("Download Previous Invoice")
-            selected_invoice_id = st.selectbox("Select Invoice ID", invoice_df['invoice_id'].tolist())
-            
-            if st.button("Generate PDF"):
-                # Get the invoice data
-                selected_invoice = invoice_df[invoice_df['invoice_id'] == selected_invoice_id].iloc[0]
-                
-                # Parse the stored invoice data
-                products_list = eval(selected_invoice['products'])
-                quantities_list = eval(selected_invoice['quantities'])
-                
-                # Check if the invoice has the new format with discount info
-                if 'mrps' in selected_invoice and pd.notna(selected_invoice['mrps']):
-                    # New format - use stored discount information
-                    mrps_list = eval(selected_invoice['mrps'])
-                    discount_percentages_list = eval(selected_invoice['discount_percentages'])
-                    prices_list = eval(selected_invoice['prices'])
-                    
-                    selected_products = []
-                    for i, (product_name, quantity) in enumerate(zip(products_list, quantities_list)):
-                        product_info = product_df[product_df['product_name'] == product_name].iloc[0]
-                        tax_rate = float(product_info['product_tax_rate'])
-                        calculate_tax_amount = calculate_tax(prices_list[i] * quantity, tax_rate)
-                        selected_products.append({
-                            'product_id': product_info['product_id'],
-                            'product_name': product_name,
-                            'mrp': mrps_list[i],
-                            'discount_percentage': discount_percentages_list[i],
-                            'price': prices_list[i],
-                            'quantity': quantity,
-                            'tax_rate': tax_rate,
-                            'tax_amount': calculate_tax_amount,
-                            'amount': prices_list[i] * quantity
-                        })
-                else:
-                    # Old format - use default discounts (for backward compatibility)
-                    selected_products = []
-                    for product_name, quantity in zip(products_list, quantities_list):
-                        product_info = product_df[product_df['product_name'] == product_name].iloc[0]
-                        mrp = float(product_info['product_mrp'])
-                        default_discount = float(product_info['product_default_discount'])
-                        price = calculate_price(mrp, default_discount)
-                        tax_rate = float(product_info['product_tax_rate'])
-                        calculate_tax_amount = calculate_tax(price*quantity,tax_rate)
-                        selected_products.append({
-                            'product_id': product_info['product_id'],
-                            'product_name': product_name,
-                            'mrp': mrp,
-                            'discount_percentage': default_discount,
-                            'price': price,
-                            'quantity': quantity,
-                            'tax_rate': tax_rate,
-                            'tax_amount': calculate_tax_amount,
-                            'amount': price * quantity
-                        })
-                
-                # Create PDF
-                pdf_buffer = create_pdf_invoice(selected_invoice, selected_products, company_settings)
-                pdf_filename = f"Invoice_{selected_invoice_id}.pdf"
-                st.markdown(get_pdf_download_link(pdf_buffer, pdf_filename), unsafe_allow_html=True)
-        else:
-            st.info("No previous invoices found.")
-    
-    # Company Settings Tab
-    with tab2:
-        st.write('Previous Invoices Here')
-        prev_invoices_data = invoice_sheet.get_all_values()
-        invoice_df = pd.DataFrame(prev_invoices_data)
-        invoice_df.columns = invoice_df.iloc[0]
-        invoice_df = invoice_df[1:]  # Drop the header row now used as column names
-        # st.dataframe(invoice_df)
-        # invoice_df = pd.DataFrame(prev_invoices_data[1:], columns=prev_invoices_data[0])  # Skip header
-        # invoice_df = load_invoice_data()
-        if invoice_df.empty:
-            st.info("No invoices found.")
-        else:
-            # Ensure required columns are present
-            expected_cols = ['invoice_id', 'customer_name', 'customer_email', 'customer_phone', 'customer_gst']
-            missing = [col for col in expected_cols if col not in invoice_df.columns]
-            if missing:
-                st.error(f"Missing columns in invoice data: {', '.join(missing)}")
-            else:
-                # Filter inputs
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    gst_filter = st.text_input("GST Number", key="filter_gst")
-                with col2:
-                    name_filter = st.text_input("Customer Name", key="filter_name")
-                with col3:
-                    phone_filter = st.text_input("Phone Number", key="filter_phone")
-                with col4:
-                    email_filter = st.text_input("Email", key="filter_email")
-    
-                # Apply filters
-                filtered_df = invoice_df.copy()
-                if gst_filter:
-                    filtered_df = filtered_df[filtered_df['customer_gst'].str.contains(gst_filter, case=False, na=False)]
-                if name_filter:
-                    filtered_df = filtered_df[filtered_df['customer_name'].str.contains(name_filter, case=False, na=False)]
-                if phone_filter:
-                    filtered_df = filtered_df[filtered_df['customer_phone'].astype(str).str.contains(phone_filter, case=False, na=False)]
-                if email_filter:
-                    filtered_df = filtered_df[filtered_df['customer_email'].str.contains(email_filter, case=False, na=False)]
-    
-                st.write(f"🔍 Showing {len(filtered_df)} of {len(invoice_df)} invoices")
-                st.dataframe(filtered_df)
-        invoice_id_gen = st.text_input("Invoice ID", key="generate_invoice_id")
-        if st.button("Generate PDF", key="regenerate_older_invoices"):
-            # Get the invoice data
-            selected_invoice = invoice_df[invoice_df['invoice_id'] == invoice_id_gen].iloc[0]
-            
-            # Parse the stored invoice data
-            products_list = eval(selected_invoice['products'])
-            quantities_list = eval(selected_invoice['quantities'])
-            
-            # Check if the invoice has the new format with discount info
-            if 'mrps' in selected_invoice and pd.notna(selected_invoice['mrps']):
-                # New format - use stored discount information
-                mrps_list = eval(selected_invoice['mrps'])
-                discount_percentages_list = eval(selected_invoice['discount_percentages'])
-                prices_list = eval(selected_invoice['prices'])
-                
-                selected_products = []
-                for i, (product_name, quantity) in enumerate(zip(products_list, quantities_list)):
-                    product_info = product_df[product_df['product_name'] == product_name].iloc[0]
-                    tax_rate = float(product_info['product_tax_rate'])
-                    calculate_tax_amount = calculate_tax(prices_list[i] * quantity, tax_rate)
-                    selected_products.append({
-                        'product_id': product_info['product_id'],
-                        'product_name': product_name,
-                        'mrp': mrps_list[i],
-                        'discount_percentage': discount_percentages_list[i],
-                        'price': prices_list[i],
-                        'quantity': quantity,
-                        'tax_rate': tax_rate,
-                        'tax_amount': calculate_tax_amount,
-                        'amount': prices_list[i] * quantity
-                    })
-            else:
-                # Old format - use default discounts (for backward compatibility)
-                selected_products = []
-                for product_name, quantity in zip(products_list, quantities_list):
-                    product_info = product_df[product_df['product_name'] == product_name].iloc[0]
-                    mrp = float(product_info['product_mrp'])
-                    default_discount = float(product_info['product_default_discount'])
-                    price = calculate_price(mrp, default_discount)
-                    tax_rate = float(product_info['product_tax_rate'])
-                    calculate_tax_amount = calculate_tax(price*quantity, tax_rate)
-                    selected_products.append({
-                        'product_id': product_info['product_id'],
-                        'product_name': product_name,
-                        'mrp': mrp,
-                        'discount_percentage': default_discount,
-                        'price': price,
-                        'quantity': quantity,
-                        'tax_rate': tax_rate,
-                        'tax_amount': calculate_tax_amount,
-                        'amount': price * quantity
-                    })
-                    # price * quantity * tax_rate,
-            # Create PDF
-            # st.write(selected_invoice)
-            # st.write(selected_products)
-            # st.write(company_settings)
-            pdf_buffer = create_pdf_invoice(selected_invoice, selected_products, company_settings)
-            pdf_filename = f"Invoice_{invoice_id_gen}.pdf"
-            st.markdown(get_pdf_download_link(pdf_buffer, pdf_filename), unsafe_allow_html=True)
-    # Company Settings Tab
-    with tab3:
-        st.header("Company Settings")
+        period = st.radio("Period", ["Daily", "Monthly"], horizontal=True, key="analytics_period")
+        period_rollup = month_rollup if period == "Monthly" else invoice_ledger.load_rollup('day')
+        st.subheader("Revenue by " + ("Month" if period == "Monthly" else "Day"))
+        st.bar_chart(period_rollup.set_index('key')[['revenue', 'tax']])
         
-        st.subheader("Company Information")
-        company_gst = st.text_input("Company GST", value=company_settings['company_gst'], disabled=True)
-        company_name = st.text_input("Company Name", value=company_settings['company_name'], disabled=True)
-        company_address = st.text_area("Company Address", value=company_settings['company_address'], disabled=True)
-        company_phone = st.text_input("Company Phone", value=company_settings['company_phone'], disabled=True)
-        company_email = st.text_input("Company Email", value=company_settings['company_email'], disabled=True)
-        company_website = st.text_input("Company Website", value=company_settings['company_website'], disabled=True)
+        st.subheader("By Product")
+        product_rollup = invoice_ledger.load_rollup('product').sort_values('revenue', ascending=False)
+        st.dataframe(product_rollup.rename(columns={'key': 'product_name'}), hide_index=True)
         
-        st.subheader("Company Logo")
-        # Display current logo if exists
-        if company_settings['company_logo_path'] and os.path.exists(company_settings['company_logo_path']):
-            st.image(company_settings['company_logo_path'], width=200)
+        st.subheader("By Customer GST")
+        customer_rollup = invoice_ledger.load_rollup('customer').sort_values('revenue', ascending=False)
+        st.dataframe(customer_rollup.rename(columns={'key': 'customer_gst'}), hide_index=True)
+
+# Fragment with the Company Settings tab
+@st.fragment
+@metrics.timed("render.company_settings")
+def company_settings_panel():
+    company_settings = load_company_settings()
+    
+    st.header("Company Settings")
+    
+    st.subheader("Company Information")
+    company_gst = st.text_input("Company GST", value=company_settings['company_gst'], disabled=True)
+    company_name = st.text_input("Company Name", value=company_settings['company_name'], disabled=True)
+    company_address = st.text_area("Company Address", value=company_settings['company_address'], disabled=True)
+    company_phone = st.text_input("Company Phone", value=company_settings['company_phone'], disabled=True)
+    company_email = st.text_input("Company Email", value=company_settings['company_email'], disabled=True)
+    company_website = st.text_input("Company Website", value=company_settings['company_website'], disabled=True)
+    
+    st.subheader("Company Logo")
+    # Display current logo if exists
+    if company_settings['company_logo_path'] and os.path.exists(company_settings['company_logo_path']):
+        st.image(company_settings['company_logo_path'], width=200)
+    
+    # Logo upload
+    uploaded_logo = st.file_uploader("Upload Company Logo", type=['png', 'jpg', 'jpeg'])
+    if uploaded_logo is not None:
+        # Save the uploaded logo to a file
+        logo_path = f"company_logo.{uploaded_logo.name.split('.')[-1]}"
+        atomic_write(logo_path, uploaded_logo.getvalue())
+        st.success(f"Logo uploaded successfully: {logo_path}")
         
-        # Logo upload
-        uploaded_logo = st.file_uploader("Upload Company Logo", type=['png', 'jpg', 'jpeg'])
-        if uploaded_logo is not None:
-            # Save the uploaded logo to a file
-            logo_path = f"company_logo.{uploaded_logo.name.split('.')[-1]}"
-            with open(logo_path, "wb") as f:
-                f.write(uploaded_logo.getbuffer())
-            st.success(f"Logo uploaded successfully: {logo_path}")
-            
-            # Display the uploaded logo
-            st.image(logo_path, width=200)
-            
-            # Update logo path in settings
-            company_settings['company_logo_path'] = logo_path
+        # Display the uploaded logo
+        st.image(logo_path, width=200)
         
-        st.subheader("Invoice T&C")
-        invoice_terms = st.text_area("Invoice Terms & Conditions", value=company_settings['invoice_terms'])
+        # Update logo path in settings
+        company_settings['company_logo_path'] = logo_path
+    
+    st.subheader("Product Catalogue")
+    catalogue_cache = get_catalogue_cache()
+    if catalogue_cache.checked_at:
+        st.caption(f"{len(load_product_data())} products, last checked {datetime.fromtimestamp(catalogue_cache.checked_at).strftime('%Y-%m-%d %H:%M:%S')}")
+    if st.button("Refresh Catalogue", key="refresh_catalogue"):
+        try:
+            if catalogue_cache.refresh():
+                st.success("Catalogue reloaded from the Drive sheet")
+                # The product form lives in another fragment, so rerun the whole app
+                st.rerun()
+            else:
+                st.info("Catalogue is already up to date")
+        except Exception as e:
+            st.error(f"Could not refresh the catalogue: {e}")
+    
+    st.subheader("Invoice T&C")
+    invoice_terms = st.text_area("Invoice Terms & Conditions", value=company_settings['invoice_terms'])
+    
+    # Save settings button
+    if st.button("Save Company Settings"):
+        # Update settings
+        company_settings.update({
+            "company_gst": company_gst,
+            "company_name": company_name,
+            "company_address": company_address,
+            "company_phone": company_phone,
+            "company_email": company_email,
+            "company_website": company_website,
+            "invoice_terms": invoice_terms
+        })
         
-        # Save settings button
-        if st.button("Save Company Settings"):
-            # Update settings
-            company_settings.update({
-                "company_gst": company_gst,
-                "company_name": company_name,
-                "company_address": company_address,
-                "company_phone": company_phone,
-                "company_email": company_email,
-                "company_website": company_website,
-                "invoice_terms": invoice_terms
-            })
-            
-            # Save to file
-            if save_company_settings(company_settings):
-                st.success("Company settings saved successfully!")
+        # Save to file
+        if save_company_settings(company_settings):
+            st.success("Company settings saved successfully!")
+
+@metrics.timed("render.app")
+def main():
+    st.title("💼 Invoice Generator")
+    
+    # Keep the local ledger and the Drive sheet in step in the background
+    get_invoice_reconciler()
+    
+    # Initialize session state for selected products if not exists
+    if 'selected_products' not in st.session_state:
+        st.session_state.selected_products = []
+    
+    # Initialize session state for current invoice
+    if 'current_invoice' not in st.session_state:
+        st.session_state.current_invoice = None
+    if 'generated_invoice' not in st.session_state:
+        st.session_state.generated_invoice = None
+    if 'line_grid_version' not in st.session_state:
+        st.session_state.line_grid_version = 0
+        st.session_state.line_errors = []
+    
+    # Sidebar for customer information (fragments read these from session state)
+    st.sidebar.header("Customer Information")
+    st.sidebar.text_input("Customer GST", key="customer_gst")
+    st.sidebar.text_input("Customer Name", key="customer_name")
+    st.sidebar.text_input("Customer Email", key="customer_email")
+    st.sidebar.text_input("Customer Phone", key="customer_phone")
+    st.sidebar.text_area("Customer Address", key="customer_address")
+    
+    # Add a tab control for main app and settings
+    tab1, tab2, tab3, tab4 = st.tabs(["📝 Invoice Generator", "🕐 Previous Invoices", "📊 Analytics", "⚙️ Company Settings"])
+    
+    with tab1:
+        # Product selection section
+        st.header("Select Products")
+        product_form()
+        invoice_history()
+    
+    # Previous Invoices Tab
+    with tab2:
+        previous_invoices_browser()
+    
+    # Analytics Tab
+    with tab3:
+        analytics_view()
+    
+    # Company Settings Tab
+    with tab4:
+        company_settings_panel()
+
+    if st.query_params.get("admin") == "1":
+        render_admin_panel()
 
 if __name__ == "__main__":
     main()
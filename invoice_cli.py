@@ -0,0 +1,154 @@
+# Headless batch invoicing from CSV or JSONL orders, without the Streamlit UI.
+#
+#   python invoice_cli.py [--no-sheets] create orders.csv [--pdf-dir pdfs]
+#   python invoice_cli.py [--no-sheets] serve [--host 127.0.0.1] [--port 8765] [--pdf-dir pdfs]
+#
+# CSV orders have one line item per row, grouped by order_ref:
+#   order_ref,customer_name,customer_gst,customer_email,customer_phone,customer_address,product,quantity,discount_percentage
+# JSONL orders have one order per line:
+#   {"order_ref": "A1", "customer_name": "...", "items": [{"product": "Handwash 5L", "quantity": 2}]}
+#
+# The HTTP endpoint takes the same bodies: POST /invoices with Content-Type text/csv or
+# application/x-ndjson, and answers with the created invoice ids. PDFs are rendered only into
+# the directory given to serve --pdf-dir; callers cannot choose where files are written.
+# GET /metrics serves span timings as Prometheus text when INVOICE_METRICS=1.
+import sys
+import json
+import argparse
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import invoice_core
+import invoice_ledger
+import metrics
+from invoice_numbering import DEFAULT_SERIES
+from sheets_writer import SheetsWriter
+import sheets_client
+
+# Function to build the writer that queues rows for the Drive sheet (None when disabled)
+def make_writer(use_sheets):
+    if not use_sheets:
+        return None
+    return SheetsWriter(lambda: sheets_client.get_worksheet("Invoices"))
+
+# Function to push spooled rows to the sheet; rows stay spooled for the app's writer on failure
+def flush_writer(writer):
+    if writer is None:
+        return None
+    try:
+        return writer.flush()
+    except Exception as e:
+        print(f"Sheets flush failed, rows remain spooled: {e}", file=sys.stderr)
+        return None
+
+def create_command(args):
+    if args.orders == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.orders, "r", encoding="utf-8") as f:
+            text = f.read()
+    orders = invoice_core.read_orders(text, args.format or invoice_core.order_format(args.orders))
+    # Progress and warnings go to stderr so stdout carries only the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        writer = make_writer(not args.no_sheets)
+        result = invoice_core.create_invoices(
+            orders, invoice_core.load_catalogue(use_sheets=not args.no_sheets), writer, args.db, args.series, args.pdf_dir, workers=args.workers
+        )
+        result['rows_flushed'] = flush_writer(writer)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    return 1 if result['failures'] else 0
+
+class InvoiceRequestHandler(BaseHTTPRequestHandler):
+    # Set by serve_command
+    catalogue_cache = None  # None when Drive is disabled
+    writer = None
+    pdf_dir = None
+    db_path = invoice_ledger.LEDGER_PATH
+    series = DEFAULT_SERIES
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._reply(200, {'status': 'ok', 'sheets_available': sheets_client.is_available()})
+        elif path == "/metrics":
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/invoices":
+            self._reply(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        text = self.rfile.read(length).decode("utf-8")
+        content_type = self.headers.get("Content-Type", "")
+        fmt = "csv" if "csv" in content_type else "jsonl"
+        try:
+            orders = invoice_core.read_orders(text, fmt)
+            catalogue = invoice_core.load_catalogue(self.catalogue_cache, use_sheets=self.catalogue_cache is not None)
+            result = invoice_core.create_invoices(orders, catalogue, self.writer, self.db_path, self.series, self.pdf_dir)
+        except Exception as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._reply(200 if not result['failures'] else 207, result)
+
+def serve_command(args):
+    InvoiceRequestHandler.catalogue_cache = None if args.no_sheets else invoice_core.catalogue_cache()
+    InvoiceRequestHandler.writer = writer = make_writer(not args.no_sheets)
+    InvoiceRequestHandler.db_path = args.db
+    InvoiceRequestHandler.series = args.series
+    InvoiceRequestHandler.pdf_dir = args.pdf_dir
+    if writer is not None:
+        writer.start()
+    server = ThreadingHTTPServer((args.host, args.port), InvoiceRequestHandler)
+    print(f"Serving invoices on http://{args.host}:{args.port}/invoices")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if writer is not None:
+            writer.stop()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create invoices without the Streamlit UI")
+    parser.add_argument("--db", default=invoice_ledger.LEDGER_PATH)
+    parser.add_argument("--series", default=DEFAULT_SERIES)
+    parser.add_argument("--no-sheets", action="store_true", help="do not queue rows for the Drive sheet")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="create invoices from a CSV or JSONL file of orders")
+    create.add_argument("orders", help="orders file, or - for stdin")
+    create.add_argument("--format", choices=["csv", "jsonl"])
+    create.add_argument("--pdf-dir", help="render a PDF per invoice into this directory")
+    create.add_argument("--workers", type=int, default=None)
+    create.set_defaults(handler=create_command)
+
+    serve = commands.add_parser("serve", help="accept orders over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--pdf-dir", help="render a PDF per created invoice into this directory")
+    serve.set_defaults(handler=serve_command)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+# Invoice creation without the Streamlit UI: catalogue lookup, pricing, storage and
+# PDF rendering for single invoices and for batches of orders from CSV or JSONL.
+# Used by the app and by invoice_cli.py; must not import Streamlit.
+import os
+import csv
+import io
+import json
+from datetime import datetime
+import pandas as pd
+import invoice_ledger
+import sheets_client
+import metrics
+from catalogue import Catalogue, CatalogueCache, load_snapshot_catalogue
+from pricing import price_lines, from_paise
+from invoice_models import LineItem, new_invoice
+from invoice_numbering import assign_invoice_ids, DEFAULT_SERIES
+from bulk_pdf import render_invoices_to_dir
+from file_store import file_lock, atomic_write
+
+COMPANY_SETTINGS_PATH = "inglo_delhi_company_settings.json"
+PRODUCTS_PATH = "products.xlsx"
+
+DEFAULT_COMPANY_SETTINGS = {
+    "company_gst":"07AAGCI0069N1ZA",
+    "company_name": "Inglo Imex Private Limited",
+    "company_address": "Sector 8 Dwarka, New Delhi 110077",
+    "company_phone": "(+91) 87006-01262",
+    "company_email": "ingloimexsales@gmail.com",
+    "company_website": "www.yourcompany.com",
+    "company_logo_path": None,
+    "invoice_terms": "Payment is due within 30 days of the order date."
+}
+
+CUSTOMER_FIELDS = ['customer_gst', 'customer_name', 'customer_email', 'customer_phone', 'customer_address']
+
+# Function to load company settings, writing the defaults on first use
+def load_company_settings(file_path=COMPANY_SETTINGS_PATH):
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        with file_lock(file_path):
+            # Another worker may have written them while we waited for the lock
+            if not os.path.exists(file_path):
+                atomic_write(file_path, json.dumps(DEFAULT_COMPANY_SETTINGS, indent=4))
+            with open(file_path, 'r') as f:
+                return json.load(f)
+
+# Function to save company settings; concurrent saves are serialised and readers never see a partial file
+def save_company_settings(settings, file_path=COMPANY_SETTINGS_PATH):
+    with file_lock(file_path):
+        atomic_write(file_path, json.dumps(settings, indent=4))
+    return True
+
+# Function to get the catalogue cache backed by the Drive sheet
+def catalogue_cache():
+    return CatalogueCache(
+        lambda: sheets_client.get_worksheet("Catalogue").get_all_values(),
+        lambda: sheets_client.get_spreadsheet().get_lastUpdateTime()
+    )
+
+# Function to load the catalogue from the snapshot / Drive sheet, falling back to the local product file.
+# With use_sheets=False Drive is not contacted: the last snapshot is used, else the local product file.
+def load_catalogue(cache=None, products_path=PRODUCTS_PATH, use_sheets=True):
+    if not use_sheets:
+        catalogue = load_snapshot_catalogue()
+        return catalogue if catalogue is not None else Catalogue(pd.read_excel(products_path))
+    try:
+        return (cache or catalogue_cache()).get()
+    except Exception as e:
+        print(f"Failed to fetch the drive excel file: {e}")
+        return Catalogue(pd.read_excel(products_path))
+
+# Function to build the worksheet row for an invoice record (Invoices sheet column order)
+def invoice_row(invoice_data):
+    return [invoice_data[column] for column in invoice_ledger.INVOICE_COLUMNS]
+
+# Function to build the ledger's numbering callback for series (None keeps the invoices' own ids)
+def _assign_ids(series):
+    if series is None:
+        return None
+    return lambda conn, records: assign_invoice_ids(conn, records, series)
+
+# Function to store one invoice: append it to the ledger, then queue its row for the Drive sheet.
+# A failed ledger append raises before anything is queued, so the sheet never gets an invoice
+# the ledger does not have. With a series the invoice is numbered in the ledger transaction.
+def save_invoice(invoice, writer=None, db_path=invoice_ledger.LEDGER_PATH, series=None):
+    invoice_data = invoice.to_record()
+    with metrics.span("save_invoice.ledger_append"):
+        invoice_ledger.append_invoice(invoice_data, db_path, line_items=invoice.line_items,
+                                      assign_ids=_assign_ids(series))
+    invoice.invoice_id = invoice_data['invoice_id']
+    if writer is not None:
+        with metrics.span("save_invoice.sheets_enqueue"):
+            writer.enqueue(invoice_row(invoice_data))
+    return True
+
+# Function to store many invoices with one ledger transaction, then one spool write
+def save_invoices(invoices, writer=None, db_path=invoice_ledger.LEDGER_PATH, series=None):
+    entries = [(invoice.to_record(), invoice.line_items) for invoice in invoices]
+    with metrics.span("save_invoices.ledger_append"):
+        saved = invoice_ledger.append_invoices(entries, db_path, assign_ids=_assign_ids(series))
+    for invoice, (invoice_data, _) in zip(invoices, entries):
+        invoice.invoice_id = invoice_data['invoice_id']
+    if writer is not None:
+        with metrics.span("save_invoices.sheets_enqueue"):
+            writer.enqueue_many([invoice_row(invoice_data) for invoice_data, _ in entries])
+    return saved
+
+def render_pdf(invoice, company_settings):
+    from invoice_pdf import create_pdf_invoice
+    return create_pdf_invoice(invoice, company_settings).getvalue()
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+# Function to read orders from CSV (one line item per row, grouped by order_ref) or JSONL
+# (one order per line with an "items" list). Each order is a dict with the customer fields
+# and items of {product or product_id, quantity, optional discount_percentage}.
+def read_orders(text, fmt):
+    if fmt == "jsonl":
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    orders = {}
+    for n, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        order_ref = _text(row.get('order_ref')) or f"row-{n}"
+        order = orders.get(order_ref)
+        if order is None:
+            order = orders[order_ref] = {'order_ref': order_ref, 'items': []}
+            order.update({field: _text(row.get(field)) for field in CUSTOMER_FIELDS})
+        item = {'product': _text(row.get('product')), 'product_id': _text(row.get('product_id')),
+                'quantity': row.get('quantity')}
+        if _text(row.get('discount_percentage')):
+            item['discount_percentage'] = row['discount_percentage']
+        order['items'].append(item)
+    return list(orders.values())
+
+# Function to read a pasted product list: one line per item with the product name or id,
+# the quantity (default 1) and optionally a discount percentage, separated by tabs (as
+# copied from a spreadsheet), commas or semicolons. A header line is skipped.
+def read_line_list(text):
+    items = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        delimiter = "\t" if "\t" in line else ";" if ";" in line else ","
+        fields = [_text(field) for field in next(csv.reader([line], delimiter=delimiter))]
+        item = {'product': fields[0], 'quantity': fields[1] if len(fields) > 1 and fields[1] else 1}
+        if len(fields) > 2 and fields[2]:
+            item['discount_percentage'] = fields[2]
+        try:
+            float(item['quantity'])
+        except ValueError:
+            if not items:
+                continue  # header
+        items.append(item)
+    return items
+
+def _lookup(catalogue, item):
+    if item.get('product_id'):
+        return catalogue.by_id(str(item['product_id']))
+    product = _text(item.get('product'))
+    if product not in catalogue:
+        # Pasted lists often carry product ids (SKUs) in the product column
+        try:
+            return catalogue.by_id(product)
+        except KeyError:
+            pass
+    return catalogue.by_name(product)
+
+# Function to validate one order item; returns (product record, quantity, discount)
+def _item_line(catalogue, item):
+    product_info = _lookup(catalogue, item)
+    quantity = int(float(item.get('quantity') or 0))
+    if quantity < 1:
+        raise ValueError(f"Quantity must be at least 1 for {product_info.product_name}")
+    discount = item.get('discount_percentage')
+    discount = product_info.product_default_discount if _text(discount) == "" else float(discount)
+    if not 0 <= discount <= 100:
+        raise ValueError(f"Discount must be between 0 and 100 for {product_info.product_name}")
+    return product_info, quantity, discount
+
+# Function to build LineItems from (product record, quantity, discount) lines in one pricing pass
+def _line_items(lines):
+    priced = price_lines(
+        [info.product_mrp for info, _, _ in lines],
+        [discount for _, _, discount in lines],
+        [quantity for _, quantity, _ in lines],
+        [info.product_tax_rate for info, _, _ in lines],
+    )
+    prices = from_paise(priced['price'])
+    amounts = from_paise(priced['amount'])
+    tax_amounts = from_paise(priced['tax_amount'])
+    return [
+        LineItem(
+            product_id=info.product_id,
+            product_name=info.product_name,
+            mrp=info.product_mrp,
+            discount_percentage=discount,
+            price=float(prices[i]),
+            quantity=quantity,
+            tax_rate=info.product_tax_rate,
+            tax_amount=float(tax_amounts[i]),
+            amount=float(amounts[i]),
+        )
+        for i, (info, quantity, discount) in enumerate(lines)
+    ]
+
+# Function to price order items ({product or product_id, quantity, optional discount_percentage})
+# as LineItems in one pass. Returns (line_items, failures) where failures are (item, error).
+def price_items(items, catalogue):
+    lines, failures = [], []
+    for item in items:
+        try:
+            lines.append(_item_line(catalogue, item))
+        except KeyError as e:
+            failures.append((item, str(e.args[0])))
+        except (ValueError, TypeError) as e:
+            failures.append((item, str(e)))
+    return _line_items(lines), failures
+
+# Function to turn orders into Invoices, pricing every line of every order in one vectorised pass.
+# Returns (invoices, failures) where failures are (order_ref, error) for orders that were rejected.
+# The invoices have no invoice_id yet; save_invoices numbers them when it stores them.
+def build_invoices(orders, catalogue, date=None):
+    date = date or datetime.now()
+    accepted, failures = [], []
+    lines = []  # (product record, quantity, discount)
+    line_counts = []
+    for order in orders:
+        order_ref = order.get('order_ref')
+        try:
+            if not _text(order.get('customer_name')):
+                raise ValueError("customer_name is required")
+            order_lines = [_item_line(catalogue, item) for item in order.get('items') or []]
+            if not order_lines:
+                raise ValueError("Order has no items")
+        except KeyError as e:
+            failures.append((order_ref, str(e.args[0])))
+            continue
+        except (ValueError, TypeError) as e:
+            failures.append((order_ref, str(e)))
+            continue
+        accepted.append(order)
+        lines.extend(order_lines)
+        line_counts.append(len(order_lines))
+
+    all_items = _line_items(lines)
+    line_items = []
+    start = 0
+    for count in line_counts:
+        line_items.append(all_items[start:start + count])
+        start += count
+
+    date_text = date.strftime("%Y-%m-%d %H:%M:%S")
+    invoices = [
+        new_invoice(None, date_text, items,
+                    **{field: _text(order.get(field)) for field in CUSTOMER_FIELDS})
+        for order, items in zip(accepted, line_items)
+    ]
+    return invoices, failures
+
+# Function to create invoices for a batch of orders: price, number, store and optionally render PDFs.
+# The batch is numbered in the same ledger transaction that stores it, so it never leaves a gap.
+def create_invoices(orders, catalogue, writer=None, db_path=invoice_ledger.LEDGER_PATH,
+                    series=DEFAULT_SERIES, pdf_dir=None, company_settings=None, workers=None):
+    invoices, failures = build_invoices(orders, catalogue)
+    if invoices:
+        save_invoices(invoices, writer, db_path, series)
+    result = {
+        'created': [invoice.invoice_id for invoice in invoices],
+        'failures': [{'order_ref': order_ref, 'error': error} for order_ref, error in failures],
+    }
+    if pdf_dir and invoices:
+        stats = render_invoices_to_dir(invoices, company_settings or load_company_settings(), pdf_dir, workers)
+        result['pdfs'] = {'rendered': stats['rendered'], 'seconds': round(stats['seconds'], 3),
+                          'failures': [{'invoice_id': i, 'error': e} for i, e in stats['failures']]}
+    return result
+
+# Function to guess the order format from a file name
+def order_format(path):
+    return "jsonl" if os.path.splitext(path)[1].lower() in (".jsonl", ".json") else "csv"
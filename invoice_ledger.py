@@ -0,0 +1,266 @@
+# Append-only local invoice ledger backed by SQLite.
+# Saving an invoice inserts one row instead of rewriting the whole Excel workbook;
+# the Excel file is produced on demand as a snapshot of the ledger.
+import os
+import io
+import json
+import time
+import sqlite3
+import pandas as pd
+import invoice_rollups
+from file_store import atomic_write
+
+LEDGER_PATH = "inglo_delhi_invoices.db"
+LEGACY_EXCEL_PATH = "inglo_delhi_invoices.xlsx"
+
+INVOICE_COLUMNS = [
+    'invoice_id', 'date', 'customer_gst', 'customer_name', 'customer_email',
+    'customer_phone', 'customer_address', 'products', 'quantities',
+    'mrps', 'discount_percentages', 'prices', 'subtotal', 'tax', 'total'
+]
+NUMERIC_COLUMNS = ['subtotal', 'tax', 'total']
+# Seconds a connection waits for another process's write transaction (SQLite busy timeout)
+BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS invoices (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    invoice_id TEXT NOT NULL UNIQUE,
+    date TEXT,
+    customer_gst TEXT,
+    customer_name TEXT,
+    customer_email TEXT,
+    customer_phone TEXT,
+    customer_address TEXT,
+    products TEXT,
+    quantities TEXT,
+    mrps TEXT,
+    discount_percentages TEXT,
+    prices TEXT,
+    subtotal REAL,
+    tax REAL,
+    total REAL
+);
+CREATE TABLE IF NOT EXISTS ledger_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_conflicts (
+    invoice_id TEXT PRIMARY KEY,
+    local_json TEXT,
+    remote_json TEXT,
+    detected_at REAL
+);
+CREATE TABLE IF NOT EXISTS invoice_series (
+    series TEXT NOT NULL,
+    financial_year TEXT NOT NULL,
+    next_number INTEGER NOT NULL,
+    PRIMARY KEY (series, financial_year)
+);
+"""
+
+_INSERT_SQL = "INSERT INTO invoices ({}) VALUES ({})".format(
+    ", ".join(INVOICE_COLUMNS), ", ".join("?" for _ in INVOICE_COLUMNS)
+)
+
+# Ledgers that have already been checked for the one-time Excel migration in this process
+_migrated_ledgers = set()
+
+# Function to open a ledger connection, creating the schema on first use.
+# Several app workers and the CLI can share the ledger: WAL lets readers run alongside the
+# writer, and writers queue for up to BUSY_TIMEOUT instead of failing with "database is locked".
+def open_ledger(db_path=LEDGER_PATH):
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    invoice_rollups.create_schema(conn)
+    return conn
+
+# Function to convert an invoice dict into a row tuple in ledger column order
+def _invoice_to_row(invoice_data):
+    row = []
+    for column in INVOICE_COLUMNS:
+        value = invoice_data.get(column)
+        if value is not None and pd.isna(value):
+            value = None
+        elif column in NUMERIC_COLUMNS and value is not None:
+            value = float(value)
+        elif value is not None:
+            value = str(value)
+        row.append(value)
+    return tuple(row)
+
+# Function to start a write transaction that takes the write lock up front. A deferred
+# transaction that reads first can find its snapshot stale when it comes to write, which
+# SQLite reports as "database is locked" without waiting; BEGIN IMMEDIATE waits its turn.
+def _begin_write(conn):
+    conn.execute("BEGIN IMMEDIATE")
+
+# Function to import the legacy Excel workbook into the ledger (runs once per ledger)
+def migrate_from_excel(excel_path=LEGACY_EXCEL_PATH, db_path=LEDGER_PATH):
+    conn = open_ledger(db_path)
+    try:
+        done = conn.execute("SELECT value FROM ledger_meta WHERE key = 'excel_migration'").fetchone()
+        if done is not None:
+            return 0
+        rows = []
+        if os.path.exists(excel_path):
+            legacy_df = pd.read_excel(excel_path)
+            rows = [_invoice_to_row(record) for record in legacy_df.to_dict('records')]
+        with conn:
+            _begin_write(conn)
+            # Check again under the write lock: another worker may have migrated meanwhile
+            if conn.execute("SELECT 1 FROM ledger_meta WHERE key = 'excel_migration'").fetchone() is not None:
+                return 0
+            before = conn.total_changes
+            conn.executemany(_INSERT_SQL.replace("INSERT", "INSERT OR IGNORE", 1), rows)
+            imported = conn.total_changes - before
+            conn.execute(
+                "INSERT OR REPLACE INTO ledger_meta (key, value) VALUES ('excel_migration', ?)",
+                (f"{excel_path}:{imported}",)
+            )
+        return imported
+    finally:
+        conn.close()
+
+# Function to make sure the one-time migration and rollup backfill have run before the ledger is used
+def ensure_migrated(db_path=LEDGER_PATH, excel_path=LEGACY_EXCEL_PATH):
+    key = os.path.abspath(db_path)
+    if key not in _migrated_ledgers:
+        migrate_from_excel(excel_path, db_path)
+        conn = open_ledger(db_path)
+        try:
+            if not invoice_rollups.is_current(conn):
+                with conn:
+                    _begin_write(conn)
+                    if not invoice_rollups.is_current(conn):
+                        invoice_rollups.rebuild(conn)
+        finally:
+            conn.close()
+        _migrated_ledgers.add(key)
+
+# Function to append one invoice to the ledger and add it to the sales rollups.
+# line_items (LineItems) give exact per-product tax; without them tax is shared by line amount.
+# assign_ids(conn, records), e.g. invoice_numbering.assign_invoice_ids, sets invoice_id inside
+# the insert transaction, so the number is only used if the invoice is stored.
+def append_invoice(invoice_data, db_path=LEDGER_PATH, line_items=None, assign_ids=None):
+    ensure_migrated(db_path)
+    conn = open_ledger(db_path)
+    try:
+        with conn:
+            _begin_write(conn)
+            if assign_ids is not None:
+                assign_ids(conn, [invoice_data])
+            conn.execute(_INSERT_SQL, _invoice_to_row(invoice_data))
+            invoice_rollups.apply_invoice(conn, invoice_data, line_items)
+    finally:
+        conn.close()
+    return True
+
+# Function to append many invoices in a single transaction; either all are stored or none.
+# entries are (invoice_data, line_items) pairs as taken by append_invoice.
+def append_invoices(entries, db_path=LEDGER_PATH, assign_ids=None):
+    ensure_migrated(db_path)
+    conn = open_ledger(db_path)
+    try:
+        with conn:
+            _begin_write(conn)
+            if assign_ids is not None:
+                assign_ids(conn, [invoice_data for invoice_data, _ in entries])
+            conn.executemany(_INSERT_SQL, [_invoice_to_row(invoice_data) for invoice_data, _ in entries])
+            for invoice_data, line_items in entries:
+                invoice_rollups.apply_invoice(conn, invoice_data, line_items)
+    finally:
+        conn.close()
+    return len(entries)
+
+# Function to add invoices saved elsewhere (e.g. rows found only in the Drive sheet).
+# Invoice ids already in the ledger are skipped. Each record is imported on its own savepoint,
+# so a malformed one is left out instead of rolling back the batch.
+# Returns (number imported, [(invoice_id, error), ...]).
+def import_invoices(records, db_path=LEDGER_PATH):
+    ensure_migrated(db_path)
+    conn = open_ledger(db_path)
+    imported = 0
+    failures = []
+    try:
+        with conn:
+            _begin_write(conn)
+            for record in records:
+                conn.execute("SAVEPOINT import_record")
+                try:
+                    cursor = conn.execute(_INSERT_SQL.replace("INSERT", "INSERT OR IGNORE", 1), _invoice_to_row(record))
+                    if cursor.rowcount:
+                        invoice_rollups.apply_invoice(conn, record)
+                        imported += 1
+                except Exception as e:
+                    conn.execute("ROLLBACK TO import_record")
+                    failures.append((str(record.get('invoice_id')), str(e)))
+                conn.execute("RELEASE import_record")
+    finally:
+        conn.close()
+    return imported, failures
+
+# Function to replace the recorded sync conflicts with (invoice_id, local_record, remote_record) tuples
+def record_conflicts(conflicts, db_path=LEDGER_PATH):
+    conn = open_ledger(db_path)
+    try:
+        with conn:
+            _begin_write(conn)
+            conn.execute("DELETE FROM sync_conflicts")
+            conn.executemany(
+                "INSERT INTO sync_conflicts (invoice_id, local_json, remote_json, detected_at) VALUES (?, ?, ?, ?)",
+                [(invoice_id, json.dumps(local, default=str), json.dumps(remote, default=str), time.time())
+                 for invoice_id, local, remote in conflicts]
+            )
+    finally:
+        conn.close()
+
+# Function to read the recorded sync conflicts
+def load_conflicts(db_path=LEDGER_PATH):
+    conn = open_ledger(db_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT invoice_id, local_json, remote_json, detected_at FROM sync_conflicts ORDER BY invoice_id", conn
+        )
+    finally:
+        conn.close()
+
+# Function to read all invoices from the ledger in insertion order
+def load_invoices(db_path=LEDGER_PATH):
+    ensure_migrated(db_path)
+    conn = open_ledger(db_path)
+    try:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(INVOICE_COLUMNS)} FROM invoices ORDER BY seq", conn
+        )
+    finally:
+        conn.close()
+
+# Function to count invoices in the ledger without loading them
+def count_invoices(db_path=LEDGER_PATH):
+    ensure_migrated(db_path)
+    conn = open_ledger(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+    finally:
+        conn.close()
+
+# Function to read a sales rollup ('product', 'customer', 'day' or 'month')
+def load_rollup(dimension, db_path=LEDGER_PATH):
+    ensure_migrated(db_path)
+    conn = open_ledger(db_path)
+    try:
+        return invoice_rollups.read_rollup(conn, dimension)
+    finally:
+        conn.close()
+
+# Function to build an in-memory Excel snapshot of the ledger
+def excel_snapshot_bytes(db_path=LEDGER_PATH):
+    buffer = io.BytesIO()
+    load_invoices(db_path).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+# Function to write an Excel snapshot of the ledger to disk
+def export_excel_snapshot(excel_path=LEGACY_EXCEL_PATH, db_path=LEDGER_PATH):
+    return atomic_write(excel_path, excel_snapshot_bytes(db_path))
@@ -0,0 +1,134 @@
+# Slotted record types for invoices and their line items.
+# These replace the 9-key dicts kept per line in session state and rebuilt for
+# every regenerated invoice; a slotted instance has no per-object __dict__.
+from dataclasses import dataclass, field, asdict
+from line_items import decode_list, encode_line_items
+from pricing import price_lines, from_paise, summarize
+
+@dataclass(slots=True)
+class LineItem:
+    product_id: str
+    product_name: str
+    mrp: float
+    discount_percentage: float
+    price: float
+    quantity: int
+    tax_rate: float
+    tax_amount: float
+    amount: float
+
+@dataclass(slots=True)
+class Invoice:
+    invoice_id: str
+    date: str
+    customer_gst: str = ""
+    customer_name: str = ""
+    customer_email: str = ""
+    customer_phone: str = ""
+    customer_address: str = ""
+    subtotal: float = 0.0
+    tax: float = 0.0
+    total: float = 0.0
+    line_items: list = field(default_factory=list)
+
+    # Function to flatten the invoice into a storage record (ledger / Sheets column order)
+    def to_record(self):
+        record = {
+            'invoice_id': self.invoice_id,
+            'date': self.date,
+            'customer_gst': self.customer_gst,
+            'customer_name': self.customer_name,
+            'customer_email': self.customer_email,
+            'customer_phone': self.customer_phone,
+            'customer_address': self.customer_address,
+        }
+        record.update(encode_line_items(self.line_items))
+        record.update({'subtotal': self.subtotal, 'tax': self.tax, 'total': self.total})
+        return record
+
+    def to_dict(self):
+        return asdict(self)
+
+    # Function to rebuild an invoice from a stored record (dict, DataFrame row or Sheets row)
+    @classmethod
+    def from_record(cls, record, catalogue):
+        return cls(
+            invoice_id=str(record['invoice_id']),
+            date=str(record['date']),
+            customer_gst=_text(record.get('customer_gst')),
+            customer_name=_text(record.get('customer_name')),
+            customer_email=_text(record.get('customer_email')),
+            customer_phone=_text(record.get('customer_phone')),
+            customer_address=_text(record.get('customer_address')),
+            subtotal=_number(record.get('subtotal')),
+            tax=_number(record.get('tax')),
+            total=_number(record.get('total')),
+            line_items=build_selected_products(record, catalogue),
+        )
+
+# Function to create a new invoice from line items, totalling them with the pricing engine
+def new_invoice(invoice_id, date, line_items, **customer):
+    _, totals = price_line_items(line_items)
+    return Invoice(invoice_id=invoice_id, date=date, line_items=list(line_items),
+                   subtotal=totals['subtotal'], tax=totals['tax'], total=totals['total'], **customer)
+
+def _text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+# Function to price line items in one pass and total them
+def price_line_items(line_items):
+    lines = price_lines(
+        [item.mrp for item in line_items],
+        [item.discount_percentage for item in line_items],
+        [item.quantity for item in line_items],
+        [item.tax_rate for item in line_items],
+        [item.price for item in line_items],
+    )
+    return lines, summarize(lines)
+
+# Function to rebuild the line items of a stored invoice for PDF regeneration
+def build_selected_products(selected_invoice, catalogue):
+    # Parse the stored invoice data (JSON, or legacy str(list) rows)
+    products_list = decode_list(selected_invoice['products'])
+    quantities_list = decode_list(selected_invoice['quantities'])
+    mrps_list = decode_list(selected_invoice.get('mrps'))
+    product_infos = [catalogue.by_name(product_name) for product_name in products_list]
+    tax_rates = [product_info.product_tax_rate for product_info in product_infos]
+
+    # Check if the invoice has the new format with discount info
+    if mrps_list is not None:
+        # New format - use stored discount information
+        discount_percentages_list = decode_list(selected_invoice['discount_percentages'])
+        prices_list = decode_list(selected_invoice['prices'])
+        lines = price_lines(mrps_list, discount_percentages_list, quantities_list, tax_rates, prices_list)
+    else:
+        # Old format - use default discounts (for backward compatibility)
+        mrps_list = [product_info.product_mrp for product_info in product_infos]
+        discount_percentages_list = [product_info.product_default_discount for product_info in product_infos]
+        lines = price_lines(mrps_list, discount_percentages_list, quantities_list, tax_rates)
+
+    prices = from_paise(lines['price'])
+    amounts = from_paise(lines['amount'])
+    tax_amounts = from_paise(lines['tax_amount'])
+    return [
+        LineItem(
+            product_id=product_info.product_id,
+            product_name=product_info.product_name,
+            mrp=float(mrps_list[i]),
+            discount_percentage=float(discount_percentages_list[i]),
+            price=float(prices[i]),
+            quantity=int(quantity),
+            tax_rate=tax_rates[i],
+            tax_amount=float(tax_amounts[i]),
+            amount=float(amounts[i]),
+        )
+        for i, (product_info, quantity) in enumerate(zip(product_infos, quantities_list))
+    ]
@@ -0,0 +1,59 @@
+# Sequential invoice numbers per series and financial year, e.g. INV-2526-000123.
+# Counters live in the invoice_series table of the invoice ledger and are advanced in the
+# same BEGIN IMMEDIATE transaction that inserts the invoices, so a number is used if and
+# only if its invoice is stored: threads and worker processes sharing the ledger never hand
+# out the same number, and a failed save rolls its number back instead of leaving a gap.
+# Numbers are zero padded and sort in issue order.
+import re
+from datetime import datetime
+
+DEFAULT_SERIES = "INV"
+NUMBER_WIDTH = 6
+
+# Function to get the Indian financial year (April to March) of a date as "YYyy", e.g. "2526"
+def financial_year(date=None):
+    date = date or datetime.now()
+    start = date.year if date.month >= 4 else date.year - 1
+    return f"{start % 100:02d}{(start + 1) % 100:02d}"
+
+def format_invoice_id(series, fiscal_year, number):
+    return f"{series}-{fiscal_year}-{number:0{NUMBER_WIDTH}d}"
+
+# Function to find the highest number already used in the ledger, so a lost counter resumes after it
+def _highest_issued(conn, series, fiscal_year):
+    prefix = f"{series}-{fiscal_year}-"
+    pattern = re.compile(re.escape(prefix) + r"(\d+)$")
+    highest = 0
+    for (invoice_id,) in conn.execute(
+        "SELECT invoice_id FROM invoices WHERE substr(invoice_id, 1, ?) = ?", (len(prefix), prefix)
+    ):
+        match = pattern.match(invoice_id)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+# Function to take count consecutive numbers; returns the first one.
+# conn must be inside the ledger write transaction that stores the invoices.
+def take_numbers(conn, series, fiscal_year, count=1):
+    row = conn.execute(
+        "SELECT next_number FROM invoice_series WHERE series = ? AND financial_year = ?",
+        (series, fiscal_year)
+    ).fetchone()
+    first = row[0] if row is not None else _highest_issued(conn, series, fiscal_year) + 1
+    conn.execute(
+        "INSERT OR REPLACE INTO invoice_series (series, financial_year, next_number) VALUES (?, ?, ?)",
+        (series, fiscal_year, first + count)
+    )
+    return first
+
+# Function to number invoice records in place, in order, by the financial year of their date.
+# Passed to invoice_ledger.append_invoice(s) as assign_ids, which calls it under the write lock.
+def assign_invoice_ids(conn, records, series=DEFAULT_SERIES):
+    by_year = {}
+    for record in records:
+        date = datetime.strptime(str(record['date'])[:10], "%Y-%m-%d")
+        by_year.setdefault(financial_year(date), []).append(record)
+    for fiscal_year, year_records in by_year.items():
+        first = take_numbers(conn, series, fiscal_year, len(year_records))
+        for number, record in enumerate(year_records, start=first):
+            record['invoice_id'] = format_invoice_id(series, fiscal_year, number)
@@ -0,0 +1,381 @@
+# PDF rendering for invoices. Kept free of Streamlit so it can run in worker processes.
+import os
+import io
+import copy
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, Flowable
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from PIL import Image as PILImage
+import metrics
+from pricing import to_paise
+
+def format_currency(value):
+    try:
+        return f"INR {float(value):.2f}"
+    except:
+        return "N/A"
+
+# Static table styles shared by every invoice
+HEADER_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+INVOICE_INFO_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+BILLING_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+])
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -4), colors.beige),
+    ('BACKGROUND', (5, -3), (-1, -1), colors.beige),
+    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -4), 1, colors.black),
+    ('LINEABOVE', (5, -3), (-1, -3), 1, colors.black),
+    ('LINEABOVE', (5, -1), (-1, -1), 1, colors.black),
+    ('LINEBELOW', (5, -1), (-1, -1), 1, colors.black),
+    ('FONTNAME', (5, -1), (5, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (6, -1), (6, -1), 'Helvetica-Bold'),
+])
+
+# Items table of one page of a large invoice: every row gridded, the last page gets ITEMS_TABLE_STYLE
+PAGE_ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+ITEMS_COL_WIDTHS = [1.8*inch, 0.9*inch, 0.8*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.9*inch]
+ITEMS_HEADER = ["Item", "MRP", "Discount %", "Price", "Quantity", "Tax", "Amount"]
+
+# Invoices with more lines than this are laid out page by page (see PagedItems), each page with
+# the column header and the running tax and amount totals brought/carried forward
+LARGE_INVOICE_LINES = int(os.environ.get("INVOICE_PDF_LARGE_LINES", 100))
+ITEMS_HEADER_HEIGHT = 27  # 10pt text with 3pt top and 12pt bottom padding
+ITEMS_ROW_HEIGHT = 18     # 10pt text (12pt leading) with 3pt padding above and below
+
+# Templates are cached per thread: flowables keep layout state while a document is built
+_template_cache = threading.local()
+TEMPLATE_CACHE_SIZE = 4
+LOGO_MAX_PIXELS = (600, 300)  # 2 x 1 inch at 300 DPI
+
+# The parts of an invoice that depend only on the company settings and logo
+class InvoiceTemplate:
+    def __init__(self, company_settings, logo_bytes):
+        styles = getSampleStyleSheet()
+        
+        # Create custom styles
+        self.title_style = ParagraphStyle(
+            'Title',
+            parent=styles['Heading1'],
+            fontSize=16,
+            alignment=1,  # Center alignment
+            spaceAfter=12
+        )
+        self.normal_style = styles["Normal"]
+        normal_style = self.normal_style
+        self.logo_bytes = logo_bytes
+        
+        # Create company header table with logo if available
+        company_info = [
+            [Paragraph(f"<b>{company_settings['company_gst']}</b>", normal_style)],
+            [Paragraph(f"<b>{company_settings['company_name']}</b>", normal_style)],
+            [Paragraph(company_settings['company_address'].replace('\n', '<br/>'), normal_style)],
+            [Paragraph(f"Phone: {company_settings['company_phone']}", normal_style)],
+            [Paragraph(f"Email: {company_settings['company_email']}", normal_style)],
+            [Paragraph(f"Website: {company_settings['company_website']}", normal_style)]
+        ]
+        
+        if logo_bytes is not None:
+            # Add logo
+            logo = Image(io.BytesIO(logo_bytes), width=2*inch, height=1*inch)
+            header_data = [
+                [logo, Table(company_info, colWidths=[3*inch])]
+            ]
+        else:
+            header_data = [
+                [Table(company_info, colWidths=[5*inch])]
+            ]
+        
+        self.header_table = Table(header_data, colWidths=[2*inch, 3*inch])
+        self.header_table.setStyle(HEADER_TABLE_STYLE)
+        self.title = Paragraph("INVOICE", self.title_style)
+        self.billed_to = Paragraph("<b>Billed To:</b>", normal_style)
+        self.terms_heading = Paragraph("<b>Terms & Conditions</b>", normal_style)
+        self.terms = Paragraph(company_settings['invoice_terms'], normal_style)
+
+# Function to decode the logo once, scaled to at most 300 DPI at its printed size.
+# Opaque logos are stored as JPEG, which ReportLab embeds without re-encoding per PDF.
+def _prepare_logo(logo_path):
+    with PILImage.open(logo_path) as img:
+        img.load()
+        img.thumbnail((LOGO_MAX_PIXELS[0], LOGO_MAX_PIXELS[1]))
+        out = io.BytesIO()
+        if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+            img.save(out, format="PNG")
+        else:
+            img.convert('RGB').save(out, format="JPEG", quality=90)
+        return out.getvalue()
+
+# Function to get the prepared template for these company settings, keyed on their content and the logo mtime
+def get_invoice_template(company_settings):
+    logo_path = company_settings.get('company_logo_path')
+    logo_mtime = os.path.getmtime(logo_path) if logo_path and os.path.exists(logo_path) else None
+    key = (json.dumps(company_settings, sort_keys=True, default=str), logo_mtime)
+    cache = getattr(_template_cache, "templates", None)
+    if cache is None:
+        cache = _template_cache.templates = OrderedDict()
+    template = cache.get(key)
+    if template is None:
+        logo_bytes = None
+        if logo_mtime is not None:
+            logo_bytes = _prepare_logo(logo_path)
+        template = cache[key] = InvoiceTemplate(company_settings, logo_bytes)
+        while len(cache) > TEMPLATE_CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return template
+
+# Function to get a cached flowable for one more document. The platypus engine marks a flowable
+# it has moved to the next page (_postponed) and refuses to move it again, so each document gets
+# a shallow copy without that mark; the parsed text and table data are shared.
+def _fresh(flowable):
+    fresh = copy.copy(flowable)
+    fresh.__dict__.pop('_postponed', None)
+    return fresh
+
+# Function to drop cached templates for the current thread
+def clear_template_cache():
+    _template_cache.templates = OrderedDict()
+
+# Function to format one line item as an items table row
+def _item_row(item):
+    return [
+        item.product_name,
+        f"INR {item.mrp:.2f}",
+        f"{item.discount_percentage:.1f}%",
+        f"INR {item.price:.2f}",
+        str(item.quantity),
+        f"INR {item.tax_amount:.2f}",
+        f"INR {item.amount:.2f}"
+    ]
+
+def _totals_rows(invoice):
+    return [
+        ["", "", "", "", "", "Subtotal:", format_currency(invoice.subtotal)],
+        ["", "", "", "", "", "Tax Total:", format_currency(invoice.tax)],
+        ["", "", "", "", "", "Total:", format_currency(invoice.total) ],
+    ]
+
+def _carry_row(label, tax_paise, amount_paise):
+    return [label, "", "", "", "", format_currency(tax_paise / 100), format_currency(amount_paise / 100)]
+
+# Function to build the items table for lines start..end of a large invoice. Pages after the
+# first start with the tax and amount brought forward; every page but the last ends with them
+# carried forward, and the last page ends with the invoice totals.
+def _page_table(invoice, start, end, running, last):
+    tax_running, amount_running = running
+    rows = [ITEMS_HEADER]
+    if start:
+        rows.append(_carry_row("Brought forward", tax_running[start - 1], amount_running[start - 1]))
+    rows.extend(_item_row(item) for item in invoice.line_items[start:end])
+    rows.extend(_totals_rows(invoice) if last else
+                [_carry_row("Carried forward", tax_running[end - 1], amount_running[end - 1])])
+    table = Table(rows, colWidths=ITEMS_COL_WIDTHS, repeatRows=1)
+    table.setStyle(ITEMS_TABLE_STYLE if last else PAGE_ITEMS_TABLE_STYLE)
+    carry_rows = ([1] if start else []) + ([] if last else [len(rows) - 1])
+    table.setStyle(TableStyle(
+        [command for row in carry_rows for command in (
+            ('SPAN', (0, row), (4, row)),
+            ('FONTNAME', (0, row), (-1, row), 'Helvetica-Bold'),
+        )]
+    ))
+    return table
+
+# The items of a large invoice, laid out one page-sized table at a time. When the rest does not
+# fit, split() cuts a table for the space left on the page and a PagedItems for the remaining
+# lines, so only the table of the page being drawn is in memory at once. One Table over
+# thousands of rows is instead split again and again, which grows quadratically.
+class PagedItems(Flowable):
+    def __init__(self, invoice, start=0, running=None):
+        Flowable.__init__(self)
+        self.invoice = invoice
+        self.start = start
+        if running is None:
+            running = (to_paise([item.tax_amount for item in invoice.line_items]).cumsum(),
+                       to_paise([item.amount for item in invoice.line_items]).cumsum())
+        self.running = running
+
+    # Size of the remaining lines laid out as the last page
+    def wrap(self, availWidth, availHeight):
+        rows = len(self.invoice.line_items) - self.start + (1 if self.start else 0) + 3
+        self.width = sum(ITEMS_COL_WIDTHS)
+        self.height = ITEMS_HEADER_HEIGHT + rows * ITEMS_ROW_HEIGHT
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        carry_rows = 2 if self.start else 1
+        lines = int((availHeight - ITEMS_HEADER_HEIGHT) // ITEMS_ROW_HEIGHT) - carry_rows
+        if lines < 1:
+            return []  # nothing fits here, start on the next page
+        # Leave at least one line for the last page, which carries the totals
+        end = min(self.start + lines, len(self.invoice.line_items) - 1)
+        return [_page_table(self.invoice, self.start, end, self.running, last=False),
+                PagedItems(self.invoice, end, self.running)]
+
+    def draw(self):
+        table = _page_table(self.invoice, self.start, len(self.invoice.line_items), self.running, last=True)
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+# Function to create PDF invoice. The PDF is written to output (a path or binary file object)
+# when given, otherwise to a BytesIO that is returned. Large invoices are laid out page by page.
+@metrics.timed("create_pdf_invoice")
+def create_pdf_invoice(invoice, company_settings, output=None):
+    buffer = io.BytesIO() if output is None else output
+    doc = SimpleDocTemplate(
+        buffer, 
+        pagesize=A4,
+        rightMargin=72, 
+        leftMargin=72,
+        topMargin=72, 
+        bottomMargin=72
+    )
+    
+    template = get_invoice_template(company_settings)
+    elements = []
+    
+    elements.append(_fresh(template.header_table))
+    elements.append(Spacer(1, 0.25*inch))
+    
+    # Add invoice title
+    elements.append(_fresh(template.title))
+    elements.append(Spacer(1, 0.25*inch))
+    
+    # Add invoice details in a table
+    invoice_info_data = [
+        ["Invoice #:", invoice.invoice_id],
+        ["Date:", invoice.date],
+        ["Due Date:", (datetime.strptime(invoice.date.split()[0], "%Y-%m-%d") + 
+                      timedelta(days=30)).strftime("%Y-%m-%d")]
+    ]
+    
+    invoice_info_table = Table(invoice_info_data, colWidths=[1.5*inch, 4*inch])
+    invoice_info_table.setStyle(INVOICE_INFO_TABLE_STYLE)
+    elements.append(invoice_info_table)
+    elements.append(Spacer(1, 0.25*inch))
+    
+    # Billing and customer info in a side by side table
+    billing_data = [
+        [_fresh(template.billed_to), ""],
+        [invoice.customer_gst, ""],
+        [invoice.customer_name, ""],
+        [invoice.customer_email, ""],
+        [invoice.customer_phone, ""],
+        [invoice.customer_address, ""]
+    ]
+    
+    billing_table = Table(billing_data, colWidths=[3*inch, 2.5*inch])
+    billing_table.setStyle(BILLING_TABLE_STYLE)
+    elements.append(billing_table)
+    elements.append(Spacer(1, 0.25*inch))
+    
+    # Items table - Updated to include MRP and Discount columns
+    if len(invoice.line_items) > LARGE_INVOICE_LINES:
+        elements.append(PagedItems(invoice))
+    else:
+        items_data = [ITEMS_HEADER] + [_item_row(item) for item in invoice.line_items]
+        
+        # Add totals row
+        items_data.extend(_totals_rows(invoice))
+        
+        items_table = Table(items_data, colWidths=ITEMS_COL_WIDTHS, repeatRows=1)
+        items_table.setStyle(ITEMS_TABLE_STYLE)
+        elements.append(items_table)
+    
+    # Add footer with terms and conditions
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(_fresh(template.terms_heading))
+    elements.append(_fresh(template.terms))
+    
+    # Build PDF
+    doc.build(elements)
+    if output is None:
+        buffer.seek(0)
+    return buffer
+
+# Rendered PDFs keyed by invoice id and a hash of everything that goes into them,
+# evicted least-recently-used once the total size passes max_bytes
+class PdfCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Function to hash the invoice, its line items and the company settings (incl. logo mtime)
+    @staticmethod
+    def content_hash(invoice, company_settings):
+        logo_path = company_settings.get('company_logo_path')
+        logo_mtime = os.path.getmtime(logo_path) if logo_path and os.path.exists(logo_path) else None
+        payload = json.dumps(
+            [invoice.to_dict(), company_settings, logo_mtime],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    # Function to return the PDF bytes, rendering only when this exact content is not cached
+    def get_or_render(self, invoice, company_settings):
+        key = (invoice.invoice_id, self.content_hash(invoice, company_settings))
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pdf_bytes
+        pdf_bytes = create_pdf_invoice(invoice, company_settings).getvalue()
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries and len(pdf_bytes) <= self.max_bytes:
+                self._entries[key] = pdf_bytes
+                self.total_bytes += len(pdf_bytes)
+                while self.total_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+        return pdf_bytes
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,151 @@
+# Background reconciliation between the local invoice ledger and the Invoices worksheet.
+# The ledger is written first and the app keeps working from it while Sheets is
+# unreachable. Whenever the sheet can be read, both sides are matched by invoice_id:
+# ledger invoices missing from the sheet and the spool on two runs in a row are queued for
+# upload (an invoice saved between the ledger append and its enqueue is left to the writer),
+# sheet invoices missing from the ledger (saved by another instance) are imported, and
+# an invoice_id whose contents differ on the two sides is recorded as a conflict.
+import time
+import threading
+import invoice_ledger
+from invoice_ledger import INVOICE_COLUMNS, NUMERIC_COLUMNS
+from line_items import LINE_ITEM_COLUMNS, decode_list
+
+RECONCILE_INTERVAL = 300.0
+RECONCILE_START_DELAY = 10.0  # leave the first page render alone
+
+# Function to read an amount as stored in the ledger or typed into the sheet ("1,234.00");
+# returns None when it is blank or not a number
+def _number(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return None
+
+# Function to put a stored value into a form that compares equal across the ledger and the sheet
+def _comparable_value(column, value):
+    if value is None or (isinstance(value, float) and value != value):
+        value = ""
+    if column in NUMERIC_COLUMNS:
+        number = _number(value)
+        return round(number, 2) if number is not None else str(value).strip()
+    if column in LINE_ITEM_COLUMNS:
+        try:
+            return decode_list(value)
+        except Exception:
+            return str(value).strip()
+    return str(value).strip()
+
+def _comparable(record):
+    return [_comparable_value(column, record.get(column)) for column in INVOICE_COLUMNS]
+
+# Function to prepare a sheet record for the ledger: amounts are parsed the same way they are
+# compared, and blank or unparseable ones are stored as NULL
+def _ledger_record(record):
+    record = dict(record)
+    for column in NUMERIC_COLUMNS:
+        record[column] = _number(record.get(column))
+    return record
+
+# Function to build a worksheet row from a ledger record
+def sheet_row(record):
+    row = []
+    for column in INVOICE_COLUMNS:
+        value = record.get(column)
+        row.append("" if value is None or (isinstance(value, float) and value != value) else value)
+    return row
+
+class InvoiceReconciler:
+    def __init__(self, worksheet_provider, invoice_cache, writer, db_path=invoice_ledger.LEDGER_PATH,
+                 interval=RECONCILE_INTERVAL, start_delay=RECONCILE_START_DELAY):
+        self.worksheet_provider = worksheet_provider
+        self.invoice_cache = invoice_cache
+        self.writer = writer
+        self.db_path = db_path
+        self.interval = interval
+        self.start_delay = start_delay
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._missing = set()  # ledger invoice ids missing from the sheet and spool on the last run
+
+    # Function to compare the ledger with the sheet once; returns counts of what was done.
+    # The ledger and the writer's spool are read before the sheet, so an invoice flushed in
+    # between is already visible in the sheet and is never uploaded twice. The sheet is read
+    # in full (a forced sync), so an edit to any row shows up as a conflict.
+    def reconcile(self):
+        with self._lock:
+            local = {
+                str(record['invoice_id']): record
+                for record in invoice_ledger.load_invoices(self.db_path).to_dict('records')
+            }
+            pending = {str(row[0]) for row in self.writer.pending_rows()} if self.writer is not None else set()
+            remote = {}
+            for record in self.invoice_cache.sync(self.worksheet_provider(), force=True).to_dict('records'):
+                invoice_id = str(record.get('invoice_id') or "")
+                if invoice_id and invoice_id not in remote:
+                    remote[invoice_id] = record
+
+            missing = {invoice_id for invoice_id in local if invoice_id not in remote and invoice_id not in pending}
+            to_upload = [local[invoice_id] for invoice_id in sorted(missing & self._missing)]
+            to_import = [record for invoice_id, record in remote.items() if invoice_id not in local]
+            conflicts = [
+                (invoice_id, local[invoice_id], remote[invoice_id])
+                for invoice_id in local.keys() & remote.keys()
+                if _comparable(local[invoice_id]) != _comparable(remote[invoice_id])
+            ]
+
+            for record in to_upload:
+                self.writer.enqueue(sheet_row(record))
+            self._missing = missing - self._missing
+            imported, failures = invoice_ledger.import_invoices(
+                [_ledger_record(record) for record in to_import], self.db_path
+            ) if to_import else (0, [])
+            for invoice_id, error in failures:
+                print(f"Could not import sheet invoice {invoice_id}, skipped: {error}")
+            invoice_ledger.record_conflicts(sorted(conflicts, key=lambda c: c[0]), self.db_path)
+
+            self.last_run = time.time()
+            self.last_result = {
+                'uploaded': len(to_upload),
+                'imported': imported,
+                'skipped': len(failures),
+                'conflicts': len(conflicts),
+            }
+            return self.last_result
+
+    # Function to ask the background thread to reconcile now instead of waiting for the interval
+    def trigger(self):
+        self._wakeup.set()
+
+    def _run(self):
+        self._wakeup.wait(self.start_delay)
+        self._wakeup.clear()
+        while not self._stopping.is_set():
+            try:
+                self.reconcile()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                print(f"Invoice reconciliation failed, will retry: {e}")
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="invoice-reconciler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,140 @@
+# Materialised sales rollups kept next to the invoice ledger.
+# Every appended invoice adds its revenue, tax and quantity to per-product,
+# per-customer-GST, per-day and per-month rows in the same transaction, so the
+# analytics view reads a handful of small tables instead of the whole ledger.
+# Amounts are stored as integer paise.
+from collections import defaultdict
+import pandas as pd
+from line_items import decode_list
+from pricing import to_paise
+
+ROLLUP_TABLES = {
+    'product': 'rollup_product',
+    'customer': 'rollup_customer',
+    'day': 'rollup_day',
+    'month': 'rollup_month',
+}
+ROLLUP_VERSION = "1"
+
+_SCHEMA = "\n".join(
+    f"""CREATE TABLE IF NOT EXISTS {table} (
+    key TEXT PRIMARY KEY,
+    revenue INTEGER NOT NULL DEFAULT 0,
+    tax INTEGER NOT NULL DEFAULT 0,
+    quantity REAL NOT NULL DEFAULT 0,
+    invoices INTEGER NOT NULL DEFAULT 0
+);"""
+    for table in ROLLUP_TABLES.values()
+)
+
+def create_schema(conn):
+    conn.executescript(_SCHEMA)
+
+# Function to split a total in paise across weights, giving any rounding remainder to the last share
+def _allocate(total, weights):
+    weight_sum = sum(weights)
+    if not weights:
+        return []
+    if weight_sum <= 0:
+        return [0] * (len(weights) - 1) + [total]
+    shares = [(total * w) // weight_sum for w in weights]
+    shares[-1] += total - sum(shares)
+    return shares
+
+# Function to derive (product_name, quantity, amount_paise, tax_paise) lines from a stored record.
+# Exact per-line tax comes from LineItems when they are passed; otherwise the invoice tax is
+# shared across lines by amount (and the subtotal by quantity for rows without stored prices).
+def record_lines(record, line_items=None):
+    if line_items is not None:
+        return [
+            (item.product_name, float(item.quantity), int(to_paise(item.amount)), int(to_paise(item.tax_amount)))
+            for item in line_items
+        ]
+    products = decode_list(record.get('products')) or []
+    quantities = [float(q) for q in (decode_list(record.get('quantities')) or [])]
+    if len(quantities) != len(products):
+        quantities = [0.0] * len(products)
+    prices = decode_list(record.get('prices'))
+    subtotal = int(to_paise(record.get('subtotal') or 0))
+    tax = int(to_paise(record.get('tax') or 0))
+    if prices is not None and len(prices) == len(products):
+        amounts = [int(p) * int(q) for p, q in zip(to_paise(prices), quantities)]
+    else:
+        amounts = _allocate(subtotal, [int(q * 1000) for q in quantities])
+    taxes = _allocate(tax, amounts)
+    return list(zip(products, quantities, amounts, taxes))
+
+# Function to accumulate one invoice into per-table {key: [revenue, tax, quantity, invoices]} deltas
+def _accumulate(deltas, record, lines):
+    date = str(record.get('date') or "")
+    revenue = sum(line[2] for line in lines)
+    tax = sum(line[3] for line in lines)
+    quantity = sum(line[1] for line in lines)
+    for dimension, key in (('customer', str(record.get('customer_gst') or "")),
+                           ('day', date[:10]), ('month', date[:7])):
+        row = deltas[dimension][key]
+        row[0] += revenue
+        row[1] += tax
+        row[2] += quantity
+        row[3] += 1
+    seen = set()
+    for product_name, line_quantity, amount, line_tax in lines:
+        row = deltas['product'][product_name]
+        row[0] += amount
+        row[1] += line_tax
+        row[2] += line_quantity
+        if product_name not in seen:
+            row[3] += 1
+            seen.add(product_name)
+
+def _new_deltas():
+    return {dimension: defaultdict(lambda: [0, 0, 0.0, 0]) for dimension in ROLLUP_TABLES}
+
+def _write_deltas(conn, deltas):
+    for dimension, rows in deltas.items():
+        conn.executemany(
+            f"""INSERT INTO {ROLLUP_TABLES[dimension]} (key, revenue, tax, quantity, invoices)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    revenue = revenue + excluded.revenue,
+                    tax = tax + excluded.tax,
+                    quantity = quantity + excluded.quantity,
+                    invoices = invoices + excluded.invoices""",
+            [(key, *values) for key, values in rows.items()]
+        )
+
+# Function to add one invoice to the rollups; call inside the ledger's append transaction
+def apply_invoice(conn, record, line_items=None):
+    deltas = _new_deltas()
+    _accumulate(deltas, record, record_lines(record, line_items))
+    _write_deltas(conn, deltas)
+
+# Function to rebuild all rollups from the ledger (one-time backfill for existing history)
+def rebuild(conn):
+    for table in ROLLUP_TABLES.values():
+        conn.execute(f"DELETE FROM {table}")
+    deltas = _new_deltas()
+    cursor = conn.execute(
+        "SELECT date, customer_gst, products, quantities, prices, subtotal, tax FROM invoices ORDER BY seq"
+    )
+    columns = [c[0] for c in cursor.description]
+    for values in cursor:
+        record = dict(zip(columns, values))
+        _accumulate(deltas, record, record_lines(record))
+    _write_deltas(conn, deltas)
+    conn.execute(
+        "INSERT OR REPLACE INTO ledger_meta (key, value) VALUES ('rollup_version', ?)", (ROLLUP_VERSION,)
+    )
+
+def is_current(conn):
+    row = conn.execute("SELECT value FROM ledger_meta WHERE key = 'rollup_version'").fetchone()
+    return row is not None and row[0] == ROLLUP_VERSION
+
+# Function to read one rollup table as a DataFrame with rupee amounts
+def read_rollup(conn, dimension):
+    frame = pd.read_sql_query(
+        f"SELECT key, revenue, tax, quantity, invoices FROM {ROLLUP_TABLES[dimension]} ORDER BY key", conn
+    )
+    frame['revenue'] = frame['revenue'] / 100
+    frame['tax'] = frame['tax'] / 100
+    return frame
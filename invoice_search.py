@@ -0,0 +1,114 @@
+# N-gram search index over the customer columns of the invoice table.
+# Matches the old str.contains(case=False) filters: every filter is a case-insensitive
+# substring match and the filters are combined with AND. Values are indexed once per
+# distinct value, so repeat customers do not grow the n-gram postings.
+import threading
+
+SEARCH_FIELDS = ['customer_gst', 'customer_name', 'customer_phone', 'customer_email']
+GRAM_SIZE = 3
+
+# Function to list the n-grams (sizes 1..GRAM_SIZE) of a lower-cased value
+def _grams(text):
+    grams = set()
+    for n in range(1, GRAM_SIZE + 1):
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+class _FieldIndex:
+    def __init__(self):
+        self.value_ids = {}    # lower-cased value -> value id
+        self.values = []       # value id -> lower-cased value
+        self.value_rows = []   # value id -> list of row ids
+        self.postings = {}     # n-gram -> set of value ids
+
+    def add(self, row_id, value):
+        value = str(value).lower()
+        value_id = self.value_ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.value_ids[value] = value_id
+            self.values.append(value)
+            self.value_rows.append([])
+            for gram in _grams(value):
+                self.postings.setdefault(gram, set()).add(value_id)
+        self.value_rows[value_id].append(row_id)
+
+    # Function to return the set of row ids whose value contains the query
+    def lookup(self, query):
+        query = query.lower()
+        if len(query) <= GRAM_SIZE:
+            value_ids = self.postings.get(query, set())
+        else:
+            posting_lists = []
+            for i in range(len(query) - GRAM_SIZE + 1):
+                posting = self.postings.get(query[i:i + GRAM_SIZE])
+                if not posting:
+                    return set()
+                posting_lists.append(posting)
+            posting_lists.sort(key=len)
+            candidates = set(posting_lists[0])
+            for posting in posting_lists[1:]:
+                candidates &= posting
+                if not candidates:
+                    return set()
+            # Grams can match out of order, so confirm the substring on the candidates
+            value_ids = [v for v in candidates if query in self.values[v]]
+        rows = set()
+        for value_id in value_ids:
+            rows.update(self.value_rows[value_id])
+        return rows
+
+class InvoiceSearchIndex:
+    def __init__(self, fields=SEARCH_FIELDS):
+        self.fields = list(fields)
+        self.row_count = 0
+        self._source_refreshes = None
+        self._fields = {}
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._fields = {field: _FieldIndex() for field in self.fields}
+        self.row_count = 0
+
+    # Function to index rows given as lists in header column order
+    def add_rows(self, rows, header):
+        positions = {field: header.index(field) for field in self.fields if field in header}
+        for row in rows:
+            row_id = self.row_count
+            for field, pos in positions.items():
+                self._fields[field].add(row_id, row[pos])
+            self.row_count += 1
+
+    # Function to catch up with an InvoiceSheetCache, rebuilding only after a full refresh
+    def sync(self, invoice_cache):
+        with self._lock:
+            if invoice_cache.full_refreshes != self._source_refreshes or self.row_count > len(invoice_cache.rows):
+                self.clear()
+                self._source_refreshes = invoice_cache.full_refreshes
+            if self.row_count < len(invoice_cache.rows):
+                self.add_rows(invoice_cache.rows[self.row_count:], invoice_cache.header)
+        return self
+
+    # Function to return sorted row ids matching every non-empty filter, or None if no filter is set
+    def search(self, filters):
+        active = [(field, query) for field, query in filters.items() if query]
+        if not active:
+            return None
+        result = None
+        with self._lock:
+            # Start from the most selective filter (longest query) to keep intersections small
+            for field, query in sorted(active, key=lambda fq: -len(fq[1])):
+                rows = self._fields[field].lookup(query)
+                result = rows if result is None else result & rows
+                if not result:
+                    return []
+        return sorted(result)
+
+# Function to slice one page of row ids out of a result list
+def paginate(row_ids, page, page_size):
+    page_count = max(1, -(-len(row_ids) // page_size))
+    page = min(max(page, 1), page_count)
+    start = (page - 1) * page_size
+    return row_ids[start:start + page_size], page_count
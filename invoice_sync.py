@@ -0,0 +1,141 @@
+# Incrementally synced local copy of the Invoices worksheet.
+# After the first full load only rows appended since the last known row count are
+# fetched. The whole sheet is reloaded when the overlap row shows that existing rows were
+# edited or deleted, when a caller forces it, and every verify_interval, when it is compared
+# row by row with the cache so an edit anywhere in the sheet is picked up.
+import time
+import threading
+import pandas as pd
+import metrics
+
+# Function to convert a 1-based column number to its A1 letter(s)
+def _col_letter(n):
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+# Function to pad or trim a row to the header width, as get_all_values would return it
+def _normalize(row, width):
+    row = [str(v) for v in row[:width]]
+    return row + [""] * (width - len(row))
+
+class InvoiceSheetCache:
+    def __init__(self, min_interval=10.0, verify_interval=300.0):
+        # min_interval: reruns within this window reuse the cached frame without any network call
+        # verify_interval: how often every cached row is compared against the sheet
+        self.min_interval = min_interval
+        self.verify_interval = verify_interval
+        self.header = None
+        self.rows = []
+        self.last_sync = 0.0
+        self.last_verify = 0.0
+        self.full_refreshes = 0
+        self.incremental_fetches = 0
+        self.offline = False
+        self.last_error = None
+        self._frame = None
+        self._frame_rows = 0
+        self._lock = threading.Lock()
+
+    # Function to reload the whole worksheet
+    def _full_refresh(self, worksheet):
+        with metrics.span("sheets.get_all_values"):
+            values = worksheet.get_all_values()
+        self._load(values)
+
+    # Function to replace the cache with values as returned by get_all_values
+    def _load(self, values):
+        self.header = list(values[0]) if values else []
+        width = len(self.header)
+        self.rows = [_normalize(r, width) for r in values[1:]]
+        self._frame = None
+        self._frame_rows = 0
+        self.full_refreshes += 1
+        self.last_verify = time.time()
+        self.offline = False
+
+    # Function to fetch rows appended after the cached ones; returns False if the tail no longer matches
+    def _fetch_appended(self, worksheet):
+        width = len(self.header)
+        # Re-read the last cached row (sheet row = data index + 2) so edits at the tail are noticed
+        start_row = len(self.rows) + 1
+        with metrics.span("sheets.get_appended"):
+            fetched = worksheet.get(f"A{start_row}:{_col_letter(width)}")
+        fetched = [_normalize(r, width) for r in fetched]
+        expected = self.rows[-1] if self.rows else self.header
+        if not fetched or fetched[0] != expected:
+            return False
+        self.rows.extend(fetched[1:])
+        self.incremental_fetches += 1
+        return True
+
+    # Function to compare every row of the sheet with the cache, reloading it if any differs.
+    # An unchanged sheet keeps the cached frame, so the search index is not rebuilt.
+    def _verify(self, worksheet):
+        self.last_verify = time.time()
+        with metrics.span("sheets.get_all_values"):
+            values = worksheet.get_all_values()
+        header = list(values[0]) if values else []
+        rows = [_normalize(r, len(header)) for r in values[1:]]
+        if header != self.header or rows[:len(self.rows)] != self.rows:
+            self._load(values)
+        else:
+            self.rows.extend(rows[len(self.rows):])
+
+    # Function to bring the cache up to date and return the invoices as a DataFrame
+    def sync(self, worksheet, force=False):
+        with self._lock:
+            now = time.time()
+            try:
+                if self.header is None or not self.header or force:
+                    self._full_refresh(worksheet)
+                elif now - self.last_sync >= self.min_interval:
+                    if self.offline:
+                        self._full_refresh(worksheet)
+                    elif now - self.last_verify >= self.verify_interval:
+                        self._verify(worksheet)
+                    elif not self._fetch_appended(worksheet):
+                        self._full_refresh(worksheet)
+                else:
+                    return self.frame()
+            except Exception as e:
+                # Keep serving what is cached; the next attempt waits for min_interval
+                self.last_sync = now
+                self.last_error = e
+                raise
+            self.last_sync = now
+            self.last_error = None
+            return self.frame()
+
+    # Function to serve rows from the local ledger while the sheet is unreachable;
+    # the first successful sync afterwards reloads the whole sheet
+    def load_local(self, header, rows):
+        with self._lock:
+            self.header = list(header)
+            self.rows = [_normalize(r, len(self.header)) for r in rows]
+            self._frame = None
+            self._frame_rows = 0
+            self.full_refreshes += 1
+            self.offline = True
+            self.last_sync = time.time()
+            return self.frame()
+
+    # Function to search the cached rows with an InvoiceSearchIndex. The frame and the matching
+    # row ids come from the same state of the cache: a sync by another session or the
+    # reconciler between taking the frame and searching could otherwise shift the ids.
+    def search(self, search_index, filters):
+        with self._lock:
+            matching_ids = search_index.sync(self).search(filters)
+            return self.frame(), matching_ids
+
+    # Function to build the DataFrame, appending only rows added since it was last built
+    def frame(self):
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.rows, columns=self.header)
+        elif self._frame_rows < len(self.rows):
+            new_part = pd.DataFrame(self.rows[self._frame_rows:], columns=self.header)
+            self._frame = pd.concat([self._frame, new_part], ignore_index=True)
+        self._frame_rows = len(self.rows)
+        return self._frame
@@ -0,0 +1,96 @@
+# Encoding of invoice line items stored in the invoice table.
+# New invoices store each line-item column as a compact JSON array. Readers also
+# accept the older str(list) rows and rows written before mrps/discounts were kept,
+# without ever calling eval.
+import re
+import ast
+import json
+import math
+import numpy as np
+import pandas as pd
+
+LINE_ITEM_COLUMNS = ['products', 'quantities', 'mrps', 'discount_percentages', 'prices']
+LINE_ITEM_FIELDS = {
+    'products': 'product_name',
+    'quantities': 'quantity',
+    'mrps': 'mrp',
+    'discount_percentages': 'discount_percentage',
+    'prices': 'price',
+}
+
+# str() of numpy 2 scalars looks like np.float64(500.0); keep just the number
+_NUMPY_SCALAR = re.compile(r"np\.\w+\(([^()]*)\)")
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+def _is_missing(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return isinstance(value, str) and not value.strip()
+
+# Function to encode one line-item column (e.g. all product names) as a JSON array
+def encode_list(values):
+    return json.dumps([_plain(v) for v in values], separators=(",", ":"))
+
+# Function to encode the line-item columns of an invoice from its LineItems
+def encode_line_items(line_items):
+    return {
+        column: encode_list(getattr(item, field) for item in line_items)
+        for column, field in LINE_ITEM_FIELDS.items()
+    }
+
+# Function to decode one stored column value; returns None when the value is missing
+def decode_list(text):
+    if isinstance(text, list):
+        return text
+    if _is_missing(text):
+        return None
+    text = str(text).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Legacy str(list) rows: Python literals, parsed safely
+    return list(ast.literal_eval(_NUMPY_SCALAR.sub(r"\1", text)))
+
+# Function to decode a whole column of stored values at once
+def decode_column(values):
+    values = list(values)
+    texts = ["null" if _is_missing(v) else str(v).strip() for v in values]
+    try:
+        # One JSON parse for the whole column when every row is JSON
+        decoded = json.loads("[" + ",".join(texts) + "]")
+        if len(decoded) == len(values) and all(d is None or isinstance(d, list) for d in decoded):
+            return decoded
+    except ValueError:
+        pass
+    return [decode_list(v) for v in values]
+
+# Function to flatten the line items of many invoices into a child table keyed by invoice_id.
+# mrp, discount_percentage and price are NaN for invoices stored before those columns existed.
+def line_items_frame(invoice_frame):
+    decoded = {
+        column: decode_column(invoice_frame[column]) if column in invoice_frame else [None] * len(invoice_frame)
+        for column in LINE_ITEM_COLUMNS
+    }
+    products = [p or [] for p in decoded['products']]
+    counts = np.fromiter((len(p) for p in products), dtype=np.int64, count=len(products))
+
+    def flatten(column, dtype):
+        out = []
+        for values, count in zip(decoded[column], counts):
+            out.extend(values if values is not None and len(values) == count else [np.nan] * count)
+        return np.asarray(out, dtype=dtype)
+
+    return pd.DataFrame({
+        'invoice_id': np.repeat(np.asarray(invoice_frame['invoice_id'], dtype=object), counts),
+        'line_no': np.concatenate([np.arange(c) for c in counts]) if len(counts) else np.array([], dtype=np.int64),
+        'product_name': [name for p in products for name in p],
+        'quantity': flatten('quantities', np.float64),
+        'mrp': flatten('mrps', np.float64),
+        'discount_percentage': flatten('discount_percentages', np.float64),
+        'price': flatten('prices', np.float64),
+    })
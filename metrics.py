@@ -0,0 +1,150 @@
+# Opt-in timing spans for the slow paths (Sheets I/O, ledger writes, PDF rendering).
+# Disabled unless INVOICE_METRICS=1 or enable() is called; a disabled span costs one
+# attribute lookup. Durations are aggregated per span name into a cumulative
+# histogram (exported as Prometheus text) and a window of recent samples used for
+# percentiles. Set INVOICE_METRICS_TRACE=<path> to also append every span to a JSONL trace.
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SAMPLE_WINDOW = 2048
+
+_lock = threading.Lock()
+_histograms = {}
+_enabled = os.environ.get("INVOICE_METRICS", "") not in ("", "0")
+_trace_path = os.environ.get("INVOICE_METRICS_TRACE") or None
+
+class Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    # Function to get a percentile (0-100) of the recent samples
+    def percentile(self, q):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return 0.0
+        # Nearest-rank percentile
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+def enable(trace_path=None):
+    global _enabled, _trace_path
+    _enabled = True
+    if trace_path is not None:
+        _trace_path = trace_path
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def trace_path():
+    return _trace_path
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+# Function to record one duration for a span
+def observe(name, seconds, started_at=None):
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(seconds)
+        if _trace_path:
+            with open(_trace_path, "a") as f:
+                f.write(json.dumps({
+                    'span': name,
+                    'start': started_at if started_at is not None else time.time() - seconds,
+                    'seconds': round(seconds, 6),
+                    'thread': threading.current_thread().name,
+                }) + "\n")
+
+@contextmanager
+def _timed_span(name):
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, started_at)
+
+@contextmanager
+def _null_span():
+    yield
+
+# Function to time a block: with metrics.span("save_invoice"): ...
+def span(name):
+    if not _enabled:
+        return _null_span()
+    return _timed_span(name)
+
+# Decorator form of span
+def timed(name):
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _timed_span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Function to summarize every span: count, mean and p50/p95/p99/max in milliseconds
+def summary():
+    with _lock:
+        items = sorted(_histograms.items())
+        return [
+            {
+                'span': name,
+                'count': h.count,
+                'mean_ms': round(h.total / h.count * 1000, 2) if h.count else 0.0,
+                'p50_ms': round(h.percentile(50) * 1000, 2),
+                'p95_ms': round(h.percentile(95) * 1000, 2),
+                'p99_ms': round(h.percentile(99) * 1000, 2),
+                'max_ms': round(h.max * 1000, 2),
+            }
+            for name, h in items
+        ]
+
+# Function to export the histograms in the Prometheus text exposition format
+def prometheus_text(metric="invoice_span_seconds"):
+    lines = [
+        f"# HELP {metric} Duration of instrumented invoice operations.",
+        f"# TYPE {metric} histogram",
+    ]
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, h.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{span="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{span="{label}",le="+Inf"}} {h.count}')
+            lines.append(f'{metric}_sum{{span="{label}"}} {h.total:.6f}')
+            lines.append(f'{metric}_count{{span="{label}"}} {h.count}')
+    return "\n".join(lines) + "\n"
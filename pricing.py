@@ -0,0 +1,89 @@
+# Vectorised invoice pricing engine.
+# All arithmetic is done in integer paise (and hundredths of a percent for discount
+# and tax rates) with round-half-up, so one invoice and a bulk recomputation over
+# the whole ledger give exactly the same figures.
+import numpy as np
+import pandas as pd
+
+# Function to convert rupee amounts to integer paise, rounding half up
+def to_paise(rupees):
+    values = np.asarray(rupees, dtype=np.float64)
+    return np.floor(values * 100 + 0.5 + 1e-7).astype(np.int64)
+
+# Function to convert percentages to integer basis points (1% = 100), rounding half up
+def to_basis_points(percent):
+    values = np.asarray(percent, dtype=np.float64)
+    return np.floor(values * 100 + 0.5 + 1e-7).astype(np.int64)
+
+# Function to divide integer numerators by 10000 with round-half-up
+def _div_bp(numerator):
+    return (2 * numerator + 10000) // 20000
+
+def from_paise(paise):
+    return np.asarray(paise, dtype=np.int64) / 100
+
+# Function to price line items given as arrays; returns paise arrays for price, amount and tax.
+# price (rupees) may be given to keep the unit price stored on an invoice instead of recomputing it.
+def price_lines(mrp, discount_percentage, quantity, tax_rate, price=None):
+    quantity = np.asarray(quantity, dtype=np.int64)
+    if price is None:
+        price_paise = _div_bp(to_paise(mrp) * (10000 - to_basis_points(discount_percentage)))
+    else:
+        price_paise = to_paise(price)
+    amount_paise = price_paise * quantity
+    tax_paise = _div_bp(amount_paise * to_basis_points(tax_rate))
+    return {'price': price_paise, 'amount': amount_paise, 'tax_amount': tax_paise}
+
+# Function to total priced lines of a single invoice; returns rupee floats
+def summarize(lines):
+    subtotal = int(lines['amount'].sum())
+    tax = int(lines['tax_amount'].sum())
+    return {'subtotal': subtotal / 100, 'tax': tax / 100, 'total': (subtotal + tax) / 100}
+
+# Function to total many invoices at once from flat line arrays and their invoice ids
+def summarize_by_invoice(invoice_ids, lines):
+    codes, uniques = pd.factorize(np.asarray(invoice_ids, dtype=object), sort=False)
+    subtotal = np.zeros(len(uniques), dtype=np.int64)
+    tax = np.zeros(len(uniques), dtype=np.int64)
+    np.add.at(subtotal, codes, lines['amount'])
+    np.add.at(tax, codes, lines['tax_amount'])
+    return pd.DataFrame({
+        'invoice_id': uniques,
+        'subtotal': subtotal / 100,
+        'tax': tax / 100,
+        'total': (subtotal + tax) / 100,
+    })
+
+# Function to calculate price based on MRP and discount
+def calculate_price(mrp, discount_percentage):
+    return float(from_paise(price_lines([mrp], [discount_percentage], [1], [0])['price'])[0])
+
+# Function to calculate tax amount based on price (already multiplied with quantity) and tax rate
+def calculate_tax(price, tax_rate):
+    return float(from_paise(_div_bp(to_paise([price]) * to_basis_points([tax_rate])))[0])
+
+# Function to recompute subtotal / tax / total for every invoice in a frame of stored invoices.
+# Stored unit prices are used where present; older rows fall back to catalogue MRP and default discount.
+# Returns (totals, failures): invoices naming a product missing from the catalogue cannot be priced,
+# as for a single invoice, and are left out of totals and reported as (invoice_id, error).
+def recompute_invoice_totals(invoice_frame, catalogue):
+    from line_items import line_items_frame
+    items = line_items_frame(invoice_frame)
+    positions = catalogue.positions(items['product_name'].tolist())
+    unknown = items.loc[positions < 0].drop_duplicates('invoice_id')
+    failures = [(invoice_id, f"Product not found in catalogue: {product_name}")
+                for invoice_id, product_name in zip(unknown['invoice_id'], unknown['product_name'])]
+    priced = ~items['invoice_id'].isin(unknown['invoice_id']).to_numpy()
+    items, positions = items[priced], positions[priced]
+
+    tax_rate = catalogue.tax_rates[positions]
+    legacy = items['mrp'].isna().to_numpy()
+    mrp = np.where(legacy, catalogue.mrps[positions], items['mrp'].to_numpy())
+    discount = np.where(legacy, catalogue.default_discounts[positions], items['discount_percentage'].to_numpy())
+    price_paise = np.where(
+        legacy,
+        _div_bp(to_paise(mrp) * (10000 - to_basis_points(discount))),
+        to_paise(np.nan_to_num(items['price'].to_numpy()))
+    )
+    lines = price_lines(mrp, discount, items['quantity'].to_numpy(), tax_rate, from_paise(price_paise))
+    return summarize_by_invoice(items['invoice_id'], lines), failures
@@ -0,0 +1,122 @@
+# Typeahead search over the product catalogue, so the product picker only receives a
+# few dozen candidates per keystroke instead of the whole catalogue.
+# Product names and ids are split into lower-cased tokens. Each query token must match a
+# token of the product, exactly, as a prefix, or (when nothing matches as a prefix) within
+# a small edit distance. Results are ranked and cut to the top k.
+import re
+import heapq
+from bisect import bisect_left
+
+DEFAULT_LIMIT = 25
+EXACT, PREFIX, FUZZY = 0, 1, 2
+MIN_FUZZY_LENGTH = 3
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+# Function to split text into lower-cased alphanumeric tokens
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+def _bigrams(token):
+    return {token[i:i + 2] for i in range(len(token) - 1)}
+
+# Function to compute the Levenshtein distance, giving up once it exceeds max_distance
+def edit_distance(a, b, max_distance):
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+class ProductSearchIndex:
+    def __init__(self, product_ids, product_names):
+        self.product_ids = list(product_ids)
+        self.product_names = list(product_names)
+        self._name_keys = [name.lower() for name in self.product_names]
+
+        postings = {}
+        for pos, (product_id, name) in enumerate(zip(self.product_ids, self.product_names)):
+            for token in set(tokenize(name)) | set(tokenize(product_id)):
+                postings.setdefault(token, []).append(pos)
+        # Sorted vocabulary so every token with a given prefix is one contiguous range
+        self._tokens = sorted(postings)
+        self._postings = [postings[token] for token in self._tokens]
+        self._bigrams = {}  # bigram -> vocabulary positions, for fuzzy candidates
+        for token_pos, token in enumerate(self._tokens):
+            for gram in _bigrams(token):
+                self._bigrams.setdefault(gram, []).append(token_pos)
+
+    def __len__(self):
+        return len(self.product_names)
+
+    # Function to list vocabulary positions of tokens starting with prefix
+    def _prefix_range(self, prefix):
+        start = bisect_left(self._tokens, prefix)
+        end = start
+        while end < len(self._tokens) and self._tokens[end].startswith(prefix):
+            end += 1
+        return range(start, end)
+
+    # Function to list vocabulary positions of tokens within a small edit distance of token.
+    # A token longer than the query is also compared on its first len(token) characters, so
+    # a typo in a word that is still being typed matches.
+    def _fuzzy_tokens(self, token):
+        max_distance = 1 if len(token) <= 5 else 2
+        grams = _bigrams(token)
+        shared = {}
+        for gram in grams:
+            for token_pos in self._bigrams.get(gram, ()):
+                shared[token_pos] = shared.get(token_pos, 0) + 1
+        # Each edit destroys at most two bigrams
+        needed = max(1, len(grams) - 2 * max_distance)
+        matches = []
+        for token_pos, count in shared.items():
+            if count < needed:
+                continue
+            candidate = self._tokens[token_pos]
+            if min(edit_distance(token, candidate, max_distance),
+                   edit_distance(token, candidate[:len(token)], max_distance)) <= max_distance:
+                matches.append(token_pos)
+        return matches
+
+    # Function to map product positions to the best match kind for one query token
+    def _match(self, token):
+        kinds = {}
+        for token_pos in self._prefix_range(token):
+            kind = EXACT if self._tokens[token_pos] == token else PREFIX
+            for pos in self._postings[token_pos]:
+                if kinds.get(pos, FUZZY) > kind:
+                    kinds[pos] = kind
+        if not kinds and len(token) >= MIN_FUZZY_LENGTH:
+            for token_pos in self._fuzzy_tokens(token):
+                for pos in self._postings[token_pos]:
+                    kinds[pos] = FUZZY
+        return kinds
+
+    # Function to return catalogue positions of the best matches for a query, best first.
+    # An empty query returns the first products in catalogue order.
+    def search(self, query, limit=DEFAULT_LIMIT):
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return list(range(min(limit, len(self.product_names))))
+        matches = sorted((self._match(token) for token in tokens), key=len)
+        scores = dict(matches[0])
+        for kinds in matches[1:]:
+            scores = {pos: score + kinds[pos] for pos, score in scores.items() if pos in kinds}
+            if not scores:
+                return []
+        # Exact and prefix matches first, then names starting with the query, then shorter names
+        query_key = query.strip().lower()
+        return heapq.nsmallest(limit, scores, key=lambda pos: (
+            scores[pos], not self._name_keys[pos].startswith(query_key), len(self._name_keys[pos]), pos
+        ))
+
+    # Function to return product names of the best matches for a query
+    def search_names(self, query, limit=DEFAULT_LIMIT):
+        return [self.product_names[pos] for pos in self.search(query, limit)]
@@ -0,0 +1,121 @@
+# Lazy, process-wide Google Sheets connection.
+# Credentials are authorized once per process and the spreadsheet / worksheet handles
+# are cached, so Streamlit reruns do not repeat the authorize and open round trips.
+import os
+import time
+import tomllib
+import threading
+
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET_NAME = "Inglo_Invoice"
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+REQUEST_TIMEOUT = 15  # seconds per Sheets/Drive request
+RETRY_AFTER = 30  # seconds to fail fast after the connection was found unreachable
+
+# Raised without touching the network while Sheets is known to be unreachable
+class SheetsUnavailable(ConnectionError):
+    pass
+
+_lock = threading.RLock()
+_client = None
+_spreadsheet = None
+_worksheets = {}
+_info_provider = None
+_client_factory = None
+_unavailable_until = 0.0
+last_error = None
+
+# Seconds spent in each connection stage, e.g. {"authorize": 0.41, "open": 0.62, "worksheet:Invoices": 0.2}
+connect_timings = {}
+
+# Function to read the service account from the Streamlit secrets file without importing Streamlit
+def load_service_account_info(secrets_path=SECRETS_PATH):
+    with open(secrets_path, "rb") as f:
+        return dict(tomllib.load(f)["gcp_service_account"])
+
+# Function to authorize a gspread client from a service account dict
+def _default_client_factory(service_account_info):
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(service_account_info), SCOPE)
+    client = gspread.authorize(creds)
+    client.set_timeout(REQUEST_TIMEOUT)
+    return client
+
+# Function to set where credentials come from and how clients are built.
+# Safe to call on every Streamlit rerun: cached handles are kept until reset() is called.
+def configure(info_provider=None, client_factory=None):
+    global _info_provider, _client_factory
+    with _lock:
+        _info_provider = info_provider
+        _client_factory = client_factory
+
+# Function to drop cached handles so the next access reconnects
+def reset():
+    global _client, _spreadsheet, _unavailable_until
+    with _lock:
+        _client = None
+        _unavailable_until = 0.0
+        _spreadsheet = None
+        _worksheets.clear()
+        connect_timings.clear()
+
+def _timed(stage, fn, *args):
+    start = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception as e:
+        mark_unavailable(e)
+        raise
+    connect_timings[stage] = time.perf_counter() - start
+    return result
+
+# Function to record that Sheets could not be reached; calls fail fast for RETRY_AFTER seconds
+def mark_unavailable(error):
+    global _unavailable_until, last_error
+    with _lock:
+        if isinstance(error, SheetsUnavailable):
+            return
+        _unavailable_until = time.time() + RETRY_AFTER
+        last_error = error
+
+def is_available():
+    return time.time() >= _unavailable_until
+
+def _check_available():
+    if not is_available():
+        raise SheetsUnavailable(f"Google Sheets unreachable, retrying in {_unavailable_until - time.time():.0f}s: {last_error}")
+
+# Function to get the authorized client, connecting on first use. The client's authorized
+# session refreshes an expired access token by itself on the next request.
+def get_client():
+    global _client
+    with _lock:
+        _check_available()
+        if _client is None:
+            provider = _info_provider or load_service_account_info
+            factory = _client_factory or _default_client_factory
+            _client = _timed("authorize", factory, provider())
+        return _client
+
+# Function to get the cached spreadsheet handle
+def get_spreadsheet():
+    global _spreadsheet
+    with _lock:
+        client = get_client()
+        if _spreadsheet is None:
+            _spreadsheet = _timed("open", client.open, SPREADSHEET_NAME)
+        return _spreadsheet
+
+# Function to get a cached worksheet handle by tab name
+def get_worksheet(title):
+    with _lock:
+        if title not in _worksheets:
+            spreadsheet = get_spreadsheet()
+            _worksheets[title] = _timed(f"worksheet:{title}", spreadsheet.worksheet, title)
+        else:
+            get_client()
+        return _worksheets[title]
+
+def is_connected():
+    return _client is not None
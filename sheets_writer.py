@@ -0,0 +1,158 @@
+# Background writer that batches invoice rows into the Google Sheet.
+# Rows are first written to a local SQLite spool so they survive a restart, then
+# flushed with a single append_rows call per interval or once enough rows are queued.
+import json
+import time
+import random
+import sqlite3
+import threading
+import metrics
+from file_store import file_lock
+
+SPOOL_PATH = "inglo_delhi_sheets_spool.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    row_json TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+class SheetsWriter:
+    def __init__(self, worksheet_provider, spool_path=SPOOL_PATH, batch_size=50,
+                 flush_interval=2.0, base_backoff=1.0, max_backoff=60.0):
+        # worksheet_provider is called lazily so the writer can start before Sheets is reachable
+        self.worksheet_provider = worksheet_provider
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.last_error = None
+        self.rows_flushed = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        conn = self._connect()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.spool_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    # Persist a row to the spool and wake the writer if a full batch is waiting
+    def enqueue(self, row):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO outbox (row_json, created_at) VALUES (?, ?)",
+                    (json.dumps(list(row), default=str), time.time())
+                )
+        finally:
+            conn.close()
+        if self.pending_count() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    # Persist many rows to the spool in one transaction
+    def enqueue_many(self, rows):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO outbox (row_json, created_at) VALUES (?, ?)",
+                    [(json.dumps(list(row), default=str), now) for row in rows]
+                )
+        finally:
+            conn.close()
+        self._wakeup.set()
+        return True
+
+    def pending_count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        finally:
+            conn.close()
+
+    def pending_rows(self):
+        conn = self._connect()
+        try:
+            return [json.loads(r[0]) for r in conn.execute("SELECT row_json FROM outbox ORDER BY id")]
+        finally:
+            conn.close()
+
+    # Send one batch from the spool; returns the number of rows written
+    def flush_batch(self):
+        # Every app worker runs its own writer over the shared spool; the file lock keeps two
+        # of them from sending the same batch before either has deleted it
+        with self._lock, file_lock(self.spool_path):
+            conn = self._connect()
+            try:
+                batch = conn.execute(
+                    "SELECT id, row_json FROM outbox ORDER BY id LIMIT ?", (self.batch_size,)
+                ).fetchall()
+                if not batch:
+                    return 0
+                rows = [json.loads(row_json) for _, row_json in batch]
+                with metrics.span("sheets.append_rows"):
+                    self.worksheet_provider().append_rows(rows)
+                with conn:
+                    conn.execute("DELETE FROM outbox WHERE id <= ?", (batch[-1][0],))
+                self.rows_flushed += len(rows)
+                return len(rows)
+            finally:
+                conn.close()
+
+    # Drain the whole spool synchronously, raising on the first failed batch
+    def flush(self):
+        total = 0
+        while True:
+            written = self.flush_batch()
+            if not written:
+                return total
+            total += written
+
+    def _backoff_delay(self):
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (self.failures - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                self.failures = 0
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                print(f"Sheets flush failed ({self.failures}): {e}")
+                self._stopping.wait(self._backoff_delay())
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, flush=True, timeout=10):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if flush:
+            try:
+                self.flush()
+            except Exception as e:
+                self.last_error = e
+                print(f"Sheets flush on shutdown failed, rows remain spooled: {e}")
@@ -0,0 +1,55 @@
+# Invoice numbers are taken in the ledger transaction that stores the invoice: concurrent
+# writers never share or skip a number, and a save the ledger rejects gives its number back.
+import threading
+import pytest
+import invoice_core
+import invoice_ledger
+from invoice_models import LineItem, new_invoice
+
+SERIES = "INV"
+
+def make_invoice(date="2025-06-01 10:00:00"):
+    line = LineItem("1", "Handwash 5L", 1000.0, 0.0, 1000.0, 1, 18.0, 180.0, 1000.0)
+    return new_invoice(None, date, [line], customer_name="Acme Traders")
+
+def ledger_ids(db_path):
+    return sorted(invoice_ledger.load_invoices(db_path)['invoice_id'])
+
+def test_two_concurrent_writers_leave_no_gaps(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "ledger.db")
+    errors = []
+    def write(count, batch):
+        try:
+            for _ in range(count):
+                if batch:
+                    invoice_core.save_invoices([make_invoice(), make_invoice()], None, db_path, SERIES)
+                else:
+                    invoice_core.save_invoice(make_invoice(), None, db_path, SERIES)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=write, args=(40, False)), threading.Thread(target=write, args=(20, True))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert ledger_ids(db_path) == [f"INV-2526-{number:06d}" for number in range(1, 81)]
+
+def test_rejected_save_does_not_use_a_number(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / "ledger.db")
+    first = make_invoice()
+    invoice_core.save_invoice(first, None, db_path, SERIES)
+    assert first.invoice_id == "INV-2526-000001"
+
+    rejected = make_invoice()
+    rejected.total = "not a number"
+    with pytest.raises(ValueError):
+        invoice_core.save_invoice(rejected, None, db_path, SERIES)
+
+    invoice_core.save_invoice(make_invoice(), None, db_path, SERIES)
+    # A new financial year starts again at 1
+    invoice_core.save_invoice(make_invoice("2026-04-01 09:00:00"), None, db_path, SERIES)
+    assert ledger_ids(db_path) == ["INV-2526-000001", "INV-2526-000002", "INV-2627-000001"]
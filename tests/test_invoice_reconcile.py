@@ -0,0 +1,152 @@
+# InvoiceReconciler against FakeSpreadsheet standing in for gspread: invoices saved while the
+# sheet is down are uploaded once it is back, sheet-only invoices are imported, differing
+# invoice ids are recorded as conflicts, and malformed sheet rows do not block the import.
+import pytest
+import invoice_core
+import invoice_ledger
+from fake_sheets import FakeWorksheet, FakeSpreadsheet
+from invoice_ledger import INVOICE_COLUMNS
+from invoice_models import LineItem, new_invoice
+from invoice_reconcile import InvoiceReconciler
+from invoice_sync import InvoiceSheetCache
+from sheets_writer import SheetsWriter
+
+DB_PATH = "ledger.db"
+
+# Stands in for the Drive connection; set online = False to make every call fail
+class Drive:
+    def __init__(self):
+        self.online = True
+        self.spreadsheet = FakeSpreadsheet([FakeWorksheet("Invoices", rows=[INVOICE_COLUMNS])])
+
+    def worksheet(self):
+        if not self.online:
+            raise ConnectionError("Sheets unreachable")
+        return self.spreadsheet.worksheet("Invoices")
+
+    def rows(self):
+        return self.spreadsheet.worksheet("Invoices").rows
+
+    def invoice_ids(self):
+        return [row[0] for row in self.rows()[1:]]
+
+@pytest.fixture
+def drive(tmp_path, monkeypatch):
+    # The ledger looks for the legacy workbook in the working directory
+    monkeypatch.chdir(tmp_path)
+    return Drive()
+
+@pytest.fixture
+def writer(drive):
+    return SheetsWriter(drive.worksheet, spool_path="spool.db")
+
+@pytest.fixture
+def reconciler(drive, writer):
+    return InvoiceReconciler(drive.worksheet, InvoiceSheetCache(min_interval=0.0), writer, DB_PATH)
+
+def make_invoice(invoice_id):
+    line = LineItem("1", "Handwash 5L", 1000.0, 0.0, 1000.0, 1, 18.0, 180.0, 1000.0)
+    return new_invoice(invoice_id, "2025-06-01 10:00:00", [line], customer_gst="07AAGCI0069N1ZA",
+                       customer_name="Acme Traders")
+
+# Function to build a row as another instance or a person would leave it in the sheet
+def sheet_only_row(invoice_id, subtotal="500.0", quantities="[2]"):
+    return [invoice_id, "2025-06-02 11:00:00", "07AAGCI0070N1ZA", "Other Instance", "o@example.com",
+            "9800000000", "Mumbai", '["Soap 10gms"]', quantities, "[250.0]", "[0.0]", "[250.0]",
+            subtotal, "0", subtotal]
+
+def ledger_invoices():
+    return invoice_ledger.load_invoices(DB_PATH).set_index('invoice_id')
+
+def test_invoice_saved_while_sheet_is_down_is_uploaded_when_it_is_back(drive, writer, reconciler):
+    drive.online = False
+    invoice_core.save_invoice(make_invoice("INV-1"), writer, DB_PATH)
+    with pytest.raises(ConnectionError):
+        writer.flush()
+    with pytest.raises(ConnectionError):
+        reconciler.reconcile()
+    assert list(ledger_invoices().index) == ["INV-1"]
+
+    drive.online = True
+    # Still spooled, so the reconciler leaves it to the writer instead of queuing it again
+    assert reconciler.reconcile()['uploaded'] == 0
+    writer.flush()
+    assert drive.invoice_ids() == ["INV-1"]
+    assert reconciler.reconcile() == {'uploaded': 0, 'imported': 0, 'skipped': 0, 'conflicts': 0}
+
+def test_ledger_invoice_missing_from_sheet_and_spool_is_uploaded_once(drive, writer, reconciler):
+    # e.g. saved by the CLI with --no-sheets
+    invoice_core.save_invoice(make_invoice("INV-1"), None, DB_PATH)
+
+    # The first run may be racing the save that is about to spool it, so it waits one more run
+    assert reconciler.reconcile()['uploaded'] == 0
+    assert reconciler.reconcile()['uploaded'] == 1
+    assert reconciler.reconcile()['uploaded'] == 0
+    writer.flush()
+    assert drive.invoice_ids() == ["INV-1"]
+    assert reconciler.reconcile()['conflicts'] == 0
+
+def test_invoice_the_ledger_rejects_is_not_queued_for_the_sheet(drive, writer):
+    invoice_core.save_invoice(make_invoice("INV-1"), writer, DB_PATH)
+    with pytest.raises(Exception):
+        invoice_core.save_invoice(make_invoice("INV-1"), writer, DB_PATH)
+
+    assert writer.pending_count() == 1
+    writer.flush()
+    assert drive.invoice_ids() == ["INV-1"]
+
+def test_sheet_only_invoices_are_imported_into_the_ledger(drive, reconciler):
+    invoice_core.save_invoice(make_invoice("INV-1"), None, DB_PATH)
+    drive.rows().append(sheet_only_row("INV-9"))
+
+    result = reconciler.reconcile()
+
+    assert result['imported'] == 1
+    invoices = ledger_invoices()
+    assert sorted(invoices.index) == ["INV-1", "INV-9"]
+    assert invoices.loc["INV-9", 'subtotal'] == 500.0
+    assert invoice_ledger.load_rollup('customer', DB_PATH).set_index('key').loc["07AAGCI0070N1ZA", 'revenue'] == 500.0
+    assert reconciler.reconcile()['imported'] == 0
+
+def test_invoice_ids_that_differ_between_ledger_and_sheet_are_conflicts(drive, writer, reconciler):
+    invoice_core.save_invoice(make_invoice("INV-1"), writer, DB_PATH)
+    writer.flush()
+    row = drive.rows()[1]
+
+    # Formatting alone is not a conflict
+    row[INVOICE_COLUMNS.index('subtotal')] = "1,000.00"
+    assert reconciler.reconcile()['conflicts'] == 0
+
+    row[INVOICE_COLUMNS.index('total')] = "999.00"
+    assert reconciler.reconcile()['conflicts'] == 1
+    assert invoice_ledger.load_conflicts(DB_PATH)['invoice_id'].tolist() == ["INV-1"]
+
+def test_edit_to_an_earlier_sheet_row_is_a_conflict(drive, writer, reconciler):
+    for invoice_id in ["INV-1", "INV-2"]:
+        invoice_core.save_invoice(make_invoice(invoice_id), writer, DB_PATH)
+    writer.flush()
+    assert reconciler.reconcile()['conflicts'] == 0
+
+    # Not the last row, so only a full read of the sheet notices it
+    drive.rows()[1][INVOICE_COLUMNS.index('total')] = "999.00"
+    assert reconciler.reconcile()['conflicts'] == 1
+    assert invoice_ledger.load_conflicts(DB_PATH)['invoice_id'].tolist() == ["INV-1"]
+
+def test_malformed_sheet_rows_do_not_block_the_import(drive, reconciler):
+    drive.rows().extend([
+        sheet_only_row("INV-BLANK", subtotal=""),
+        sheet_only_row("INV-COMMA", subtotal="1,234.00"),
+        sheet_only_row("INV-BAD", quantities='["two"]'),
+        sheet_only_row("INV-GOOD"),
+    ])
+
+    result = reconciler.reconcile()
+
+    assert result['imported'] == 3
+    assert result['skipped'] == 1
+    invoices = ledger_invoices()
+    assert sorted(invoices.index) == ["INV-BLANK", "INV-COMMA", "INV-GOOD"]
+    assert invoices['subtotal'].isna()["INV-BLANK"]
+    assert invoices.loc["INV-COMMA", 'subtotal'] == 1234.0
+    # The bad row is skipped again on the next run instead of failing the whole import
+    assert reconciler.reconcile() == {'uploaded': 0, 'imported': 0, 'skipped': 1, 'conflicts': 0}
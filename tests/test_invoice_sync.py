@@ -0,0 +1,40 @@
+# InvoiceSheetCache against FakeWorksheet: appended rows are fetched incrementally, while an
+# edit to an earlier row is picked up by a forced sync and by the periodic verification.
+from fake_sheets import FakeWorksheet
+from invoice_sync import InvoiceSheetCache
+
+HEADER = ["invoice_id", "customer_name", "total"]
+
+def make_worksheet():
+    return FakeWorksheet(rows=[HEADER, ["INV-1", "Acme", "100"], ["INV-2", "Beta", "200"]])
+
+def test_appended_rows_are_fetched_incrementally():
+    worksheet = make_worksheet()
+    cache = InvoiceSheetCache(min_interval=0.0)
+    cache.sync(worksheet)
+    worksheet.append_row(["INV-3", "Gamma", "300"])
+
+    assert cache.sync(worksheet)['invoice_id'].tolist() == ["INV-1", "INV-2", "INV-3"]
+    assert (cache.full_refreshes, cache.incremental_fetches) == (1, 1)
+
+def test_forced_sync_reloads_an_edited_earlier_row():
+    worksheet = make_worksheet()
+    cache = InvoiceSheetCache(min_interval=0.0)
+    cache.sync(worksheet)
+    worksheet.rows[1][2] = "999"
+
+    # Only the tail is compared on an ordinary sync
+    assert cache.sync(worksheet)['total'].tolist() == ["100", "200"]
+    assert cache.sync(worksheet, force=True)['total'].tolist() == ["999", "200"]
+
+def test_verification_compares_whole_rows():
+    worksheet = make_worksheet()
+    cache = InvoiceSheetCache(min_interval=0.0, verify_interval=0.0)
+    cache.sync(worksheet)
+    frame = cache.sync(worksheet)
+    # An unchanged sheet keeps the cached frame
+    assert cache.sync(worksheet) is frame
+
+    # Same invoice ids, different contents
+    worksheet.rows[1][1] = "Acme Traders"
+    assert cache.sync(worksheet)['customer_name'].tolist() == ["Acme Traders", "Beta"]
@@ -0,0 +1,51 @@
+# The bulk recomputation over a frame of stored invoices gives the same totals as pricing each
+# invoice on its own, and reports invoices that name a product missing from the catalogue.
+import pandas as pd
+from catalogue import Catalogue
+from invoice_models import build_selected_products, price_line_items
+from pricing import recompute_invoice_totals
+
+CATALOGUE = Catalogue(pd.DataFrame({
+    'product_id': ["1", "2", "3"],
+    'product_name': ["Handwash 5L", "Soap 10gms", "Floor Cleaner 1L"],
+    'product_tax_rate': [18.0, 5.0, 12.0],
+    'product_mrp': [500.0, 4.6, 199.99],
+    'product_default_discount': [50.0, 10.0, 7.5],
+}))
+
+INVOICES = pd.DataFrame([
+    # Stored unit prices
+    {'invoice_id': "INV-1", 'products': '["Handwash 5L", "Soap 10gms"]', 'quantities': '[3, 7]',
+     'mrps': '[500.0, 4.6]', 'discount_percentages': '[12.5, 0.0]', 'prices': '[437.5, 4.6]'},
+    # Legacy row: catalogue MRP and default discount
+    {'invoice_id': "INV-2", 'products': "['Floor Cleaner 1L', 'Soap 10gms']", 'quantities': '[1, 3]',
+     'mrps': None, 'discount_percentages': None, 'prices': None},
+    # Not in the catalogue (renamed or deleted since)
+    {'invoice_id': "INV-3", 'products': '["Soap 10gms", "Old Product"]', 'quantities': '[2, 1]',
+     'mrps': '[4.6, 100.0]', 'discount_percentages': '[0.0, 0.0]', 'prices': '[4.6, 100.0]'},
+    {'invoice_id': "INV-4", 'products': "['Old Product']", 'quantities': '[5]',
+     'mrps': None, 'discount_percentages': None, 'prices': None},
+])
+
+def test_bulk_totals_match_per_invoice_totals():
+    totals, failures = recompute_invoice_totals(INVOICES, CATALOGUE)
+
+    expected, expected_failures = {}, []
+    for record in INVOICES.to_dict('records'):
+        try:
+            _, summary = price_line_items(build_selected_products(record, CATALOGUE))
+        except KeyError as e:
+            expected_failures.append((record['invoice_id'], e.args[0]))
+            continue
+        expected[record['invoice_id']] = summary
+
+    assert totals.set_index('invoice_id').to_dict('index') == expected
+    assert failures == expected_failures
+    assert [invoice_id for invoice_id, _ in failures] == ["INV-3", "INV-4"]
+
+def test_totals_are_rounded_per_line_in_paise():
+    totals, failures = recompute_invoice_totals(INVOICES.head(1), CATALOGUE)
+
+    assert failures == []
+    # 3 x 437.50 at 18% and 7 x 4.60 at 5%
+    assert totals.iloc[0].to_dict() == {'invoice_id': "INV-1", 'subtotal': 1344.7, 'tax': 237.86, 'total': 1582.56}
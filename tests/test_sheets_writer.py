@@ -0,0 +1,106 @@
+# SheetsWriter against the in-memory FakeWorksheet: batching, retry with backoff, rows
+# surviving a restart in the spool, and two workers sharing one spool without sending twice.
+import time
+import threading
+import pytest
+from fake_sheets import FakeWorksheet
+from sheets_writer import SheetsWriter
+
+def make_row(i):
+    return [f"INV-{i:04d}", "2025-01-01 10:00:00", f"Customer {i}"]
+
+def make_writer(tmp_path, worksheet, **kwargs):
+    return SheetsWriter(lambda: worksheet, spool_path=str(tmp_path / "spool.db"), **kwargs)
+
+# Function to wait until condition() holds, failing the test after timeout seconds
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_flush_sends_rows_in_batches_of_batch_size(tmp_path):
+    worksheet = FakeWorksheet()
+    writer = make_writer(tmp_path, worksheet, batch_size=50)
+    writer.enqueue_many([make_row(i) for i in range(120)])
+
+    assert writer.flush() == 120
+    assert worksheet.calls == ["append_rows"] * 3
+    assert worksheet.rows == [make_row(i) for i in range(120)]
+    assert writer.pending_count() == 0
+
+def test_failed_batch_stays_spooled_and_is_sent_once_on_retry(tmp_path):
+    worksheet = FakeWorksheet(fail_times=1)
+    writer = make_writer(tmp_path, worksheet)
+    writer.enqueue(make_row(1))
+
+    with pytest.raises(ConnectionError):
+        writer.flush_batch()
+    assert writer.pending_count() == 1
+    assert worksheet.rows == []
+
+    assert writer.flush_batch() == 1
+    assert worksheet.rows == [make_row(1)]
+    assert writer.pending_count() == 0
+
+def test_background_writer_backs_off_and_recovers(tmp_path):
+    worksheet = FakeWorksheet(fail_times=2)
+    writer = make_writer(tmp_path, worksheet, flush_interval=0.01, base_backoff=0.01, max_backoff=0.05)
+    writer.enqueue(make_row(1))
+    writer.start()
+    try:
+        wait_for(lambda: worksheet.rows)
+    finally:
+        writer.stop()
+
+    assert worksheet.rows == [make_row(1)]
+    assert worksheet.calls.count("append_rows") == 3
+    assert writer.failures == 0
+    assert writer.last_error is None
+
+def test_backoff_delay_doubles_up_to_the_cap(tmp_path):
+    writer = make_writer(tmp_path, FakeWorksheet(), base_backoff=1.0, max_backoff=8.0)
+    for failures, ceiling in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)]:
+        writer.failures = failures
+        delays = [writer._backoff_delay() for _ in range(50)]
+        assert all(ceiling / 2 <= delay <= ceiling for delay in delays)
+
+def test_spooled_rows_survive_a_restart(tmp_path):
+    offline = FakeWorksheet(fail_times=10)
+    writer = make_writer(tmp_path, offline)
+    writer.enqueue_many([make_row(i) for i in range(3)])
+    writer.stop()  # shutdown flush fails; the rows stay on disk
+
+    worksheet = FakeWorksheet()
+    restarted = make_writer(tmp_path, worksheet)
+    assert restarted.pending_count() == 3
+    assert restarted.flush() == 3
+    assert worksheet.rows == [make_row(i) for i in range(3)]
+
+# Stands in for a slow Sheets call so two workers flushing at once overlap
+class SlowWorksheet(FakeWorksheet):
+    def append_rows(self, values, **kwargs):
+        time.sleep(0.02)
+        super().append_rows(values, **kwargs)
+
+def test_two_workers_sharing_a_spool_never_send_a_row_twice(tmp_path):
+    worksheet = SlowWorksheet()
+    # Each worker process has its own writer over the same spool file
+    workers = [make_writer(tmp_path, worksheet, batch_size=5) for _ in range(2)]
+    workers[0].enqueue_many([make_row(i) for i in range(100)])
+
+    errors = []
+    def drain(writer):
+        try:
+            writer.flush()
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=drain, args=(writer,)) for writer in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(worksheet.rows) == [make_row(i) for i in range(100)]
+    assert workers[0].pending_count() == 0